@@ -2,15 +2,34 @@
 EcoMarket RAG Application Package
 """
 
+import importlib
+
 __version__ = "1.0.0"
 __author__ = "EcoMarket Team"
 
-from app.rag.embeddings import EmbeddingService
-from app.rag.retriever import DocumentRetriever
-from app.rag.generator import ResponseGenerator
+# Los nombres públicos se importan al primer acceso: importar el paquete (o app.config.settings)
+# no debe cargar torch, sentence-transformers, chromadb ni el SDK de Azure
+_LAZY_IMPORTS = {
+    "EmbeddingService": "app.rag.embeddings",
+    "DocumentRetriever": "app.rag.retriever",
+    "ResponseGenerator": "app.rag.generator",
+}
 
 __all__ = [
     "EmbeddingService",
     "DocumentRetriever",
     "ResponseGenerator",
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,283 @@
+"""
+Admission Control Module
+Bounds how many LLM-bound requests run at once, queues the rest by priority
+(order and return questions ahead of open-ended RAG questions) and sheds load
+fast with 429/503 and Retry-After when the queue is full, a request waited
+too long, or Azure OpenAI is throttling. The global limit adapts to observed
+LLM latency and 429s (additive increase, multiplicative decrease)
+"""
+
+import asyncio
+import bisect
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from app.config.settings import get_settings
+from app.langchain.router import ORDER_ID_PATTERN
+from app.rag.resilience import retry_after_of, status_code_of
+from utils.metrics import REGISTRY, metrics_enabled
+
+# Menor valor = más prioridad
+PRIORITY_ORDERS = 0
+PRIORITY_CHAT = 1
+PRIORITY_RAG = 2
+
+ADMISSION_DECISIONS = REGISTRY.counter(
+    "ecomarket_admission_total", "Admission decisions by endpoint and outcome", ("endpoint", "outcome")
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "ecomarket_admission_queue_seconds", "Time admitted requests waited in the admission queue", ("endpoint",)
+)
+
+
+class AdmissionRejected(Exception):
+    """A request was shed; carries the HTTP status and the seconds to wait before retrying"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def request_priority(text: str, default: int) -> int:
+    """Questions about a specific order or return go first"""
+    return PRIORITY_ORDERS if ORDER_ID_PATTERN.search(text or "") else default
+
+
+def is_throttled(error: BaseException) -> bool:
+    return status_code_of(error) == 429
+
+
+class AdmissionController:
+    """
+    Per-process admission control for the LLM-bound endpoints.
+
+    A request runs when its endpoint is under its own limit and the process
+    is under the global LLM limit; otherwise it waits in one bounded queue
+    ordered by (priority, arrival). Freed slots go to the best waiter whose
+    endpoint has room. When the queue is full a newcomer displaces the worst
+    waiter only if it has strictly higher priority.
+
+    The global limit starts at ``max_limit``. It drops by ``decrease_factor``
+    on a 429 from Azure (or by 10% on a call slower than ``target_latency``),
+    at most once per cooldown, and grows by about one slot per ``limit``
+    successful calls. While Azure's Retry-After is running, non-order
+    requests are rejected at once with 429.
+    """
+
+    def __init__(self, endpoint_limits: Dict[str, int], max_limit: int, min_limit: int = 1,
+                 max_queue: int = 32, queue_timeout: float = 10.0, target_latency: float = 8.0,
+                 decrease_factor: float = 0.5, throttle_backoff: float = 5.0):
+        """
+        Args:
+            endpoint_limits: Maximum concurrent requests per endpoint
+            max_limit: Ceiling (and starting value) of the adaptive global limit
+            min_limit: Floor of the adaptive global limit
+            max_queue: Waiters beyond this are rejected with 429
+            queue_timeout: Seconds a request may wait before it is rejected with 503
+            target_latency: LLM call latency above which the global limit shrinks
+            decrease_factor: Multiplier applied to the global limit on a 429
+            throttle_backoff: Seconds to shed non-order requests after a 429 without Retry-After
+        """
+        self.endpoint_limits = dict(endpoint_limits)
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.throttle_backoff = throttle_backoff
+        self.limit = float(max_limit)
+        self._active: Dict[str, int] = {endpoint: 0 for endpoint in endpoint_limits}
+        # (prioridad, orden de llegada, endpoint, future)
+        self._queue: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self._latency = target_latency / 2
+        self._next_decrease = 0.0
+        self._throttled_until = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Las llamadas al LLM pueden reportarse desde hilos; la cola solo se toca en el event loop
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+            "rejected_throttled": 0, "displaced": 0, "llm_calls": 0, "llm_throttled": 0,
+        }
+
+    @asynccontextmanager
+    async def admit(self, endpoint: str, priority: int):
+        """Hold a slot of the endpoint for the enclosed block, or raise AdmissionRejected"""
+        await self.acquire(endpoint, priority)
+        try:
+            yield
+        finally:
+            self.release(endpoint)
+
+    async def acquire(self, endpoint: str, priority: int):
+        self._loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        if priority > PRIORITY_ORDERS and now < self._throttled_until:
+            self._reject(endpoint, "rejected_throttled")
+            raise AdmissionRejected(429, "llm_throttled", math.ceil(self._throttled_until - now))
+        if not self._queue and self._has_room(endpoint):
+            self._grant(endpoint)
+            self._record(endpoint, "admitted", 0.0)
+            return
+        if len(self._queue) >= self.max_queue:
+            if priority >= self._queue[-1][0]:
+                self._reject(endpoint, "rejected_queue_full")
+                raise AdmissionRejected(429, "queue_full", self._retry_after())
+            displaced = self._queue.pop()
+            displaced[3].set_exception(AdmissionRejected(429, "queue_full", self._retry_after()))
+            self._reject(displaced[2], "displaced")
+
+        waiter = self._loop.create_future()
+        entry = (priority, next(self._arrivals), endpoint, waiter)
+        bisect.insort(self._queue, entry)
+        with self._lock:
+            self.stats["queued"] += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._leave_queue(entry)
+                self._reject(endpoint, "rejected_timeout")
+                raise AdmissionRejected(503, "queue_timeout", self._retry_after())
+        except asyncio.CancelledError:
+            if not waiter.done():
+                self._leave_queue(entry)
+            elif waiter.exception() is None:
+                # El cupo se concedió justo cuando se canceló la espera: se devuelve
+                self.release(endpoint)
+            raise
+        if waiter.exception() is not None:
+            raise waiter.exception()
+        self._record(endpoint, "admitted", time.monotonic() - now)
+
+    def _leave_queue(self, entry):
+        self._queue.remove(entry)
+        entry[3].cancel()
+
+    def release(self, endpoint: str):
+        self._active[endpoint] -= 1
+        self._dispatch()
+
+    def _has_room(self, endpoint: str) -> bool:
+        return (self._active[endpoint] < self.endpoint_limits[endpoint]
+                and sum(self._active.values()) < max(self.min_limit, int(self.limit)))
+
+    def _grant(self, endpoint: str):
+        self._active[endpoint] += 1
+
+    def _dispatch(self):
+        """Hand free slots to the best waiters whose endpoint has room"""
+        for entry in list(self._queue):
+            if sum(self._active.values()) >= max(self.min_limit, int(self.limit)):
+                break
+            endpoint, waiter = entry[2], entry[3]
+            if self._has_room(endpoint):
+                self._queue.remove(entry)
+                self._grant(endpoint)
+                waiter.set_result(None)
+
+    def _retry_after(self) -> int:
+        """Estimated seconds until a new request would be served"""
+        now = time.monotonic()
+        if now < self._throttled_until:
+            return math.ceil(self._throttled_until - now)
+        waves = (len(self._queue) + 1) / max(self.min_limit, int(self.limit))
+        return max(1, min(60, math.ceil(waves * self._latency)))
+
+    def _reject(self, endpoint: str, outcome: str):
+        with self._lock:
+            self.stats[outcome] += 1
+        logger.warning(f"Admission {outcome} on /{endpoint} (limit {self.limit:.1f}, queue {len(self._queue)})")
+        if metrics_enabled():
+            ADMISSION_DECISIONS.inc(endpoint=endpoint, outcome=outcome)
+
+    def _record(self, endpoint: str, outcome: str, waited: float):
+        with self._lock:
+            self.stats[outcome] += 1
+        if metrics_enabled():
+            ADMISSION_DECISIONS.inc(endpoint=endpoint, outcome=outcome)
+            ADMISSION_WAIT_SECONDS.observe(waited, endpoint=endpoint)
+
+    def record_llm_call(self, latency: Optional[float] = None, error: Optional[BaseException] = None):
+        """
+        Feed the outcome of one LLM call into the adaptive limit (safe from any thread)
+
+        Args:
+            latency: Seconds the call took, for successful calls
+            error: Exception raised by the call; only 429s change the limit
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.stats["llm_calls"] += 1
+            if error is not None:
+                if not is_throttled(error):
+                    return
+                self.stats["llm_throttled"] += 1
+                backoff = retry_after_of(error) or self.throttle_backoff
+                self._throttled_until = max(self._throttled_until, now + backoff)
+                self._decrease(now, self.decrease_factor)
+                return
+            if latency is None:
+                return
+            self._latency = 0.8 * self._latency + 0.2 * latency
+            if latency > self.target_latency:
+                self._decrease(now, 0.9)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / max(self.limit, 1.0))
+        if self._loop is not None and not self._loop.is_closed():
+            # Un límite mayor puede admitir a quien espera
+            self._loop.call_soon_threadsafe(self._dispatch)
+
+    def _decrease(self, now: float, factor: float):
+        # Una sola reducción por ventana: una ráfaga de 429 no lleva el límite al mínimo
+        if now < self._next_decrease:
+            return
+        previous = self.limit
+        self.limit = max(float(self.min_limit), self.limit * factor)
+        self._next_decrease = now + max(self._latency, 1.0)
+        logger.warning(f"LLM concurrency limit lowered from {previous:.1f} to {self.limit:.1f}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus the current limits, active requests and queue length"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.stats)
+        stats.update({
+            "llm_limit": round(self.limit, 2),
+            "endpoint_limits": dict(self.endpoint_limits),
+            "active": dict(self._active),
+            "queue_length": len(self._queue),
+            "llm_latency_ewma": round(self._latency, 3),
+            "throttled_for": max(0.0, round(self._throttled_until - time.monotonic(), 1)),
+        })
+        return stats
+
+
+@lru_cache()
+def get_admission_controller() -> AdmissionController:
+    """Get the process-wide admission controller"""
+    settings = get_settings()
+    return AdmissionController(
+        endpoint_limits={"query": settings.admission_query_limit, "chat": settings.admission_chat_limit},
+        max_limit=settings.admission_llm_limit,
+        min_limit=settings.admission_min_llm_limit,
+        max_queue=settings.admission_queue_size,
+        queue_timeout=settings.admission_queue_timeout,
+        target_latency=settings.admission_target_latency,
+        throttle_backoff=settings.admission_throttle_backoff,
+    )
+
+
+def observe_llm_call(latency: Optional[float] = None, error: Optional[BaseException] = None):
+    """Report an LLM call to the admission controller, when admission control is on"""
+    if get_settings().admission_enabled:
+        get_admission_controller().record_llm_call(latency, error)
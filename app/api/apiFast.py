@@ -11,17 +11,28 @@ EcoMarket RAG Solution - FastAPI API
 
 from fastapi import FastAPI, HTTPException, Depends, Query as FastAPIQuery
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
 from loguru import logger
 from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Union
+import asyncio
 import httpx
+import math
 import os
 
-from app.rag.embeddings import EmbeddingService
-from app.rag.retriever import DocumentRetriever
-from app.rag.generator import ResponseGenerator
+from app.rag import services as rag_services
+from app.rag.resilience import CircuitOpenError, llm_stats as resilient_llm_stats, retry_after_of, status_code_of
+from app.api.admission import (PRIORITY_CHAT, PRIORITY_RAG, AdmissionRejected, get_admission_controller,
+                                request_priority)
 from app.api.devoluciones import DevolutionsGenerator
+from app.api.orders import get_order_row, get_order_table, get_orders_dataset as orders_dataset, is_valid_order_id, load_orders
+from app.api.single_flight import get_query_flight, make_key as make_query_key
+from app.langchain.router import ORDER_ID_PATTERN, RETURN_CODE_PATTERN
+from app.langchain.sessions import ChatSessionManager
 from app.config.settings import get_settings
+from utils.logging_config import LoggingConfig, log_payload
+from utils.metrics import REGISTRY, RETURN_REGISTRATIONS, metrics_enabled, stage_timer
 
 logger.info("Logging initialized")
 
@@ -29,16 +40,29 @@ embedding_service = None
 retriever = None
 generator = None
 devolutions = None	
+chat_sessions = None
+warm_up_task = None
+corpus_watcher = None
 
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=500)
     top_k: int = Field(default=3, ge=1, le=10)
     temperature: float = Field(default=0.7, ge=0.0, le=1.0)
+    # Filtros de metadatos aplicados dentro de la búsqueda, p. ej. {"doc_type": ["policy", "faq"]}
+    filters: Optional[Dict[str, Union[str, int, List[str]]]] = None
+    # Sin filtros explícitos, dejar que el clasificador de preguntas los elija (por defecto según settings)
+    auto_filter: Optional[bool] = None
 
 class QueryResponse(BaseModel):
     answer: str
     sources: list[dict]
     confidence: float
+    index_status: Optional[dict] = None
+    filters: Optional[dict] = None
+    # Despliegue usado ("small" o "large"); None sin enrutador de modelos
+    model_route: Optional[str] = None
+    # Pregunta canónica cuya respuesta pre-generada se sirvió; None si la respuesta se generó ahora
+    faq: Optional[str] = None
 
 class OrderResponse(BaseModel):
     tracking_number: int
@@ -70,35 +94,124 @@ class VerifyEligibilityRequest(BaseModel):
 class VerifyEligibilityResponse(BaseModel):
     elegible: bool
     motivo: str
+
+class ChatRequest(BaseModel):
+    message: str = Field(..., min_length=1, max_length=2000)
+    session_id: Optional[str] = Field(default=None, max_length=64)
+
+class ChatResponse(BaseModel):
+    session_id: str
+    answer: str
+
+async def retrieve_chat_context(query: str) -> str:
+    if retriever is None or not retriever.has_documents:
+        # Mientras no haya documentos indexados el chat responde sin contexto
+        return ""
+    docs, _ = await retriever.search(query, top_k=3)
+    return " --- ".join(doc['content'] for doc in docs)
+
+@asynccontextmanager
+async def admitted(endpoint: str, priority: int):
+    """
+    Ocupa un cupo del control de admisión mientras dura el bloque.
+    Si la cola está llena, la espera vence o Azure está limitando, responde 429/503 con Retry-After.
+    """
+    if not get_settings().admission_enabled:
+        yield
+        return
+    controller = get_admission_controller()
+    try:
+        await controller.acquire(endpoint, priority)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={"status": e.reason, "message": "El servicio está saturado, intenta de nuevo en unos segundos"},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    try:
+        yield
+    finally:
+        controller.release(endpoint)
+
+def llm_unavailable(error: Exception) -> Optional[HTTPException]:
+    """503 (circuito abierto) o 429 (Azure limitando tras los reintentos) con Retry-After; None para otros errores"""
+    if isinstance(error, CircuitOpenError):
+        status_code, status, retry_after = 503, "llm_unavailable", error.retry_after
+    elif status_code_of(error) == 429:
+        status_code, status, retry_after = 429, "llm_throttled", retry_after_of(error) or get_settings().admission_throttle_backoff
+    else:
+        return None
+    return HTTPException(
+        status_code=status_code,
+        detail={"status": status, "message": "El modelo de lenguaje no está disponible, intenta de nuevo en unos segundos"},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+async def warm_up_rag():
+    """
+    Construye los servicios RAG e indexa los documentos sin bloquear el arranque.
+    Los globales se asignan antes de indexar: /query sirve el índice parcial mientras crece.
+    """
+    global embedding_service, retriever, generator, corpus_watcher
+    try:
+        embedding_service = await asyncio.to_thread(rag_services.get_embedding_service)
+        generator = await asyncio.to_thread(rag_services.get_generator)
+        retriever = await asyncio.to_thread(rag_services.get_retriever)
+        await asyncio.to_thread(rag_services.warm_up)
+        logger.info(f"Índice de documentos listo: {retriever.get_index_status()}")
+        # Las respuestas de la FAQ desactualizadas se regeneran en este loop, dueño del generador
+        await rag_services.refresh_faq_store()
+        # Recarga en caliente: los PDFs nuevos o modificados se re-indexan sin reiniciar.
+        # Un solo watcher por proceso: si Gradio (main.py) ya lo inició, aquí se recibe None
+        corpus_watcher = rag_services.create_corpus_watcher()
+        if corpus_watcher is not None:
+            corpus_watcher.start()
+    except Exception as e:
+        logger.error(f"Error al inicializar los servicios RAG: {e}")
+
+def index_status() -> dict:
+    return retriever.get_index_status() if retriever is not None else rag_services.retrieval_status()
     
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global embedding_service, retriever, generator, devolutions
+    global devolutions, chat_sessions, warm_up_task
+    LoggingConfig.setup_logging()
     logger.info("Initializing EcoMarket RAG application...")
     settings = get_settings()
-    embedding_service = EmbeddingService()
-    retriever = DocumentRetriever(embedding_service)
-    generator = ResponseGenerator()
     devolutions = DevolutionsGenerator()
+    chat_sessions = ChatSessionManager(context_provider=retrieve_chat_context,
+                                       faq_provider=rag_services.faq_chat_answer)
 
-    # Descargar dataset de órdenes y guardarlo en settings.rows_dataset
-    import asyncio
-    import httpx
+    # Primero las órdenes: /get_order y la elegibilidad quedan disponibles de inmediato
+    # Descargar dataset de órdenes y cargarlo en la tabla columnar compartida (app/api/orders.py)
     async def fetch_orders_dataset():
         async with httpx.AsyncClient() as client:
             response = await client.get(settings.endpointdataset)
             data = response.json()
             return data.get("rows", [])
-    try:
-        settings.rows_dataset = await fetch_orders_dataset()
-        logger.info(f"Dataset de órdenes cargado: {len(settings.rows_dataset)} filas")
-    except Exception as e:
-        logger.error(f"Error al cargar dataset de órdenes: {e}")
-        settings.rows_dataset = []
+    if get_order_table() is not None:
+        # Precargado por el master en modo pre-fork (gunicorn.conf.py)
+        logger.info(f"Dataset de órdenes precargado: {len(get_order_table())} filas")
+    else:
+        try:
+            table = load_orders(await fetch_orders_dataset())
+            logger.info(f"Dataset de órdenes cargado: {len(table)} filas")
+        except Exception as e:
+            logger.error(f"Error al cargar dataset de órdenes: {e}")
+            load_orders([])
 
+    # La indexación de documentos sigue en segundo plano (ver /ready); en modo pre-fork
+    # el índice ya viene del master y la tarea solo crea el generador del worker
+    warm_up_task = asyncio.create_task(warm_up_rag())
     logger.info("Application initialized successfully")
     yield
     logger.info("Shutting down application...")
+    warm_up_task.cancel()
+    if corpus_watcher is not None:
+        await corpus_watcher.stop()
+    await chat_sessions.close()
+    # Vaciar la cola de los sinks asíncronos antes de salir
+    await logger.complete()
 
 app = FastAPI(
     title="EcoMarket RAG API",
@@ -124,33 +237,85 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    # El watcher puede ser de Gradio (main.py ejecuta ambos en el mismo proceso)
+    watcher = rag_services.get_corpus_watcher()
     return {
         "status": "healthy",
         "embedding_service": embedding_service is not None,
         "retriever": retriever is not None,
         "generator": generator is not None,
-        "devolutions": devolutions is not None
+        "devolutions": devolutions is not None,
+        "index": index_status(),
+        "corpus_reload": watcher.last_changes if watcher is not None else None
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 503 hasta que el modelo esté cargado y los documentos indexados"""
+    status = index_status()
+    if retriever is None or generator is None or not retriever.is_ready:
+        raise HTTPException(status_code=503, detail={"status": "warming_up", "index": status})
+    return {"status": "ready", "index": status}
+
+@app.get("/router_stats")
+async def router_stats():
+    from app.langchain.router import get_intent_router
+    return get_intent_router().stats.snapshot()
+
+@app.get("/cache_stats")
+async def cache_stats():
+    from app.rag.llm_cache import get_completion_cache
+    stats = get_completion_cache().snapshot()
+    if retriever is not None:
+        stats["retrieval"] = dict(retriever.retrieval_cache_stats)
+    return stats
+
+@app.get("/coalescing_stats")
+async def coalescing_stats():
+    return get_query_flight().snapshot()
+
+@app.get("/admission_stats")
+async def admission_stats():
+    return get_admission_controller().snapshot()
+
+@app.get("/llm_stats")
+async def llm_stats():
+    return resilient_llm_stats()
+
+@app.get("/model_router_stats")
+async def model_router_stats():
+    from app.rag.model_router import get_model_router
+    router = get_model_router()
+    if router is None:
+        raise HTTPException(status_code=404, detail="Enrutador de modelos desactivado (AZURE_OPENAI_SMALL_DEPLOYMENT_NAME vacío)")
+    return router.stats.snapshot()
+
+@app.get("/faq_stats")
+async def faq_stats():
+    from app.rag.faq_store import get_faq_store
+    store = get_faq_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Respuestas pre-generadas desactivadas (FAQ_STORE_PATH vacío)")
+    return store.snapshot()
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de texto Prometheus"""
+    if not metrics_enabled():
+        raise HTTPException(status_code=404, detail="Métricas desactivadas")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/get_orders_dataset")
 async def get_orders_dataset():
-    settings = get_settings()
-    if settings.rows_dataset is not None:
-        return settings.rows_dataset
-    else:
-        return []
+    return orders_dataset()
 
 @app.get("/get_order", response_model=OrderResponse)
 async def get_order(orden_servicio: str = FastAPIQuery(..., min_length=14, max_length=15)):
-    import re
-    if not orden_servicio or not re.match(r"^[A-Z]{3}-\d{4}-\d{5}$", orden_servicio):
+    if not is_valid_order_id(orden_servicio):
         raise HTTPException(status_code=400, detail="El parámetro 'orden_servicio' es obligatorio y debe tener el formato correcto (ECO-2509-20001)")
 
-    settings = get_settings()
-    rows = settings.rows_dataset if settings.rows_dataset is not None else []
-
     # Buscar la orden por order_id
-    order = next((row for row in rows if row['row']['order_id'] == orden_servicio), None)
+    order = get_order_row(orden_servicio)
     if not order:
         return OrderResponse(
             tracking_number=0,
@@ -170,69 +335,148 @@ async def get_order(orden_servicio: str = FastAPIQuery(..., min_length=14, max_l
 
     # Retornar objeto OrderResponse con los datos encontrados
     return OrderResponse(
-        tracking_number=order['row'].get('tracking_number', 0),
-        order_id=order['row'].get('order_id', orden_servicio),
-        customer_name=order['row'].get("customer_name", ""),
-        city=order['row'].get("city", ""),
-        product=order['row'].get("product", ""),
-        category=order['row'].get("category", ""),
-        status=order['row'].get("status", ""),
-        carrier=order['row'].get("carrier", ""),
-        track_url=order['row'].get("track_url", ""),
-        notes=order['row'].get("notes", ""),
-        delayed=order['row'].get("delayed", False),
-        eta=order['row'].get("eta", ""),
-        last_update=order['row'].get("last_update", "")
+        tracking_number=order.get('tracking_number', 0),
+        order_id=order.get('order_id', orden_servicio),
+        customer_name=order.get("customer_name", ""),
+        city=order.get("city", ""),
+        product=order.get("product", ""),
+        category=order.get("category", ""),
+        status=order.get("status", ""),
+        carrier=order.get("carrier", ""),
+        track_url=order.get("track_url", ""),
+        notes=order.get("notes", ""),
+        delayed=order.get("delayed", False),
+        eta=order.get("eta", ""),
+        last_update=order.get("last_update", "")
     )
 
 @app.post("/query", response_model=QueryResponse)
 async def query_rag(request: QueryRequest):
-    import re
-    try:
-        logger.info(f"Processing query: {request.query}")
-        # Buscar el patrón en cualquier parte del texto
-        match = re.search(r"[A-Z]{3}-\d{4}-\d{5}", request.query)
-        orden_servicio = match.group(0) if match else None
-        logger.info(f"Orden de servicio detectada: {orden_servicio}")
-     
-        if orden_servicio:
-            info_order = await get_order(orden_servicio)
-            new_query = f"{request.query}\nDetalles de la orden de servicio:" \
-                        f"ID: {info_order.order_id} " \
-                        f"Cliente: {info_order.customer_name} " \
-                        f"Ciudad: {info_order.city} " \
-                        f"Producto: {info_order.category} {info_order.product} " \
-                        f"Tipo de producto: {info_order.category} " \
-                        f"Estado: {info_order.status} " \
-                        f"Transportista: {info_order.carrier} " \
-                        f"URL de seguimiento: {info_order.track_url} " \
-                        f"Notas: {info_order.notes} " \
-                        f"Retraso: {info_order.delayed} " \
-                        f"ETA: {info_order.eta} " \
-                        f"Última actualización: {info_order.last_update} "
-        else:
-            new_query = request.query
-   
-        logger.info(f"Información de la orden: {new_query}")
-        documents = await retriever.retrieve(
-            new_query,
-            top_k=request.top_k
-        )
-  
-        response = await generator.generate(
-            query=new_query,
-            documents=documents,
-            temperature=request.temperature
+    if retriever is None or generator is None or not retriever.has_documents:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "status": "warming_up",
+                "message": "Los documentos se están indexando, intenta de nuevo en unos momentos",
+                "index": index_status(),
+            },
+            headers={"Retry-After": "5"},
         )
+    priority = request_priority(request.query, PRIORITY_RAG)
+
+    async def admitted_answer():
+        async with admitted("query", priority):
+            return await answer_query(request)
+
+    if not get_settings().query_coalescing_enabled:
+        return await admitted_answer()
+    # Las preguntas idénticas que llegan mientras otra se procesa comparten su respuesta (y su cupo de admisión)
+    key = make_query_key(request.query, top_k=request.top_k, temperature=request.temperature,
+                         filters=request.filters, auto_filter=request.auto_filter)
+    return await get_query_flight().do(key, admitted_answer)
+
+async def order_details(orden_servicio: Optional[str]) -> Optional[str]:
+    """
+    Detalles de la orden mencionada, con su devolución registrada y su elegibilidad, para el prompt.
+    El registro de devoluciones se lee en un hilo, en paralelo con la búsqueda de documentos.
+    """
+    if not orden_servicio:
+        return None
+    with stage_timer("query", "order_lookup"):
+        order = get_order_row(orden_servicio)
+        if not order:
+            return f"No se encontró la orden de servicio: {orden_servicio}"
+        details = f"ID: {order.get('order_id', orden_servicio)} " \
+                  f"Cliente: {order.get('customer_name', '')} " \
+                  f"Ciudad: {order.get('city', '')} " \
+                  f"Producto: {order.get('category', '')} {order.get('product', '')} " \
+                  f"Tipo de producto: {order.get('category', '')} " \
+                  f"Estado: {order.get('status', '')} " \
+                  f"Transportista: {order.get('carrier', '')} " \
+                  f"URL de seguimiento: {order.get('track_url', '')} " \
+                  f"Notas: {order.get('notes', '')} " \
+                  f"Retraso: {order.get('delayed', False)} " \
+                  f"ETA: {order.get('eta', '')} " \
+                  f"Última actualización: {order.get('last_update', '')} "
+        if devolutions is not None:
+            registered, (elegible, motivo) = await asyncio.gather(
+                asyncio.to_thread(devolutions.buscar_devolucion, orden_servicio),
+                devolutions.is_eligible_for_return(order),
+            )
+            details += f"Devolución registrada: {'Sí' if registered else 'No'} " \
+                       f"Elegible para devolución: {'Sí' if elegible else 'No'} ({motivo}) "
+    return details
+
+async def answer_query(request: QueryRequest) -> QueryResponse:
+    """
+    Grafo de etapas de /query: la búsqueda de documentos sobre la pregunta del usuario corre en paralelo
+    con la consulta de la orden y del registro de devoluciones; ambas ramas se unen en la generación.
+    Los datos de la orden van al prompt y no al embedding, así la caché de búsquedas también acierta
+    en preguntas sobre órdenes.
+    """
+    # Con el índice aún parcial se responde igual, indicando el progreso
+    partial_status = None if retriever.is_ready else index_status()
+    try:
+        logger.debug("Processing query: {}", request.query[:80])
+        with stage_timer("query", "order_detection"):
+            match = ORDER_ID_PATTERN.search(request.query)
+            orden_servicio = match.group(0) if match else None
+            # El código de la orden no aporta al embedding y haría única cada búsqueda
+            without_codes = ORDER_ID_PATTERN.sub(" ", RETURN_CODE_PATTERN.sub(" ", request.query))
+            retrieval_query = " ".join(without_codes.split()) or request.query
+        logger.debug("Orden de servicio detectada: {}", orden_servicio)
+
+        query_embedding = None
+        if request.filters is None:
+            # Pregunta frecuente: respuesta pre-generada, sin búsqueda ni LLM. El embedding de la
+            # pregunta se calcula una sola vez (en un hilo) y la búsqueda lo reutiliza si no hay acierto
+            with stage_timer("query", "faq_lookup"):
+                entry, query_embedding = await asyncio.to_thread(
+                    rag_services.faq_lookup, request.query, "query", retrieval_query
+                )
+            if entry is not None:
+                return QueryResponse(
+                    answer=entry.answer,
+                    sources=entry.sources,
+                    confidence=entry.confidence,
+                    index_status=partial_status,
+                    faq=entry.question
+                )
+
+        async def retrieval():
+            with stage_timer("query", "retrieval"):
+                return await retriever.search(
+                    retrieval_query,
+                    top_k=request.top_k,
+                    filters=request.filters,
+                    auto_filter=request.auto_filter,
+                    classify_text=request.query,
+                    query_embedding=query_embedding
+                )
+
+        (documents, filters), details = await asyncio.gather(retrieval(), order_details(orden_servicio))
+        log_payload("query_rag.stages", query=request.query, retrieval_query=retrieval_query,
+                    orden_servicio=orden_servicio, order_details=details)
+
+        with stage_timer("query", "generation"):
+            response = await generator.generate(
+                query=request.query,
+                documents=documents,
+                temperature=request.temperature,
+                order_details=details
+            )
 
         return QueryResponse(
             answer=response["answer"],
             sources=response["sources"],
-            confidence=response["confidence"]
+            confidence=response["confidence"],
+            index_status=partial_status,
+            filters=filters,
+            model_route=response.get("model_route")
         )
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise llm_unavailable(e) or HTTPException(status_code=500, detail=str(e))
 
 @app.post("/register_return_order", response_model=RegistrarDevolucionResponse)
 async def registrar_orden_devolucion(request: RegistrarDevolucionRequest = Body(...)):
@@ -257,18 +501,23 @@ async def registrar_orden_devolucion(request: RegistrarDevolucionRequest = Body(
     if not orden_servicio:
         return False
 
-    await devolutions.registrar_devolucion_en_json(orden_devolucion)
+    with stage_timer("return", "registration"):
+        registered = await devolutions.registrar_devolucion_en_json(orden_devolucion)
+    if metrics_enabled():
+        RETURN_REGISTRATIONS.inc(source="api", outcome="ok" if registered else "error")
+    if not registered:
+        return RegistrarDevolucionResponse(
+            success=False,
+            message=f"No se pudo registrar la devolución {orden_devolucion}: orden no encontrada o error al guardarla"
+        )
     return RegistrarDevolucionResponse(success=True, message=f"Devolución registrada correctamente: {orden_devolucion}")
 
 @app.post("/verify_eligibility_order", response_model=VerifyEligibilityResponse)
 async def verify_eligibility_order(request: VerifyEligibilityRequest):
-    import re
     orden_servicio = request.orden_servicio
-    if not orden_servicio or not re.match(r"^[A-Z]{3}-\d{4}-\d{5}$", orden_servicio):
+    if not is_valid_order_id(orden_servicio):
         return VerifyEligibilityResponse(elegible=False, motivo="Formato de orden de servicio inválido.")
-    settings = get_settings()
-    rows = settings.rows_dataset if settings.rows_dataset is not None else []
-    order = next((row['row'] for row in rows if row['row']['order_id'] == orden_servicio), None)
+    order = get_order_row(orden_servicio)
     if not order:
         return VerifyEligibilityResponse(elegible=False, motivo="Orden de servicio no encontrada.")
     elegible, motivo = await devolutions.is_eligible_for_return(order)
@@ -287,4 +536,21 @@ async def verify_eligibility_order_response(request: VerifyEligibilityRequest):
     if not orden_servicio or not re.match(r"^[A-Z]{3}-\d{4}-\d{5}$", orden_servicio):
         return VerifyEligibilityResponse(elegible=False, motivo="Formato de orden de servicio inválido.")
 
-    return VerifyEligibilityResponse(elegible=True, motivo="Elegible para devolución")
\ No newline at end of file
+    return VerifyEligibilityResponse(elegible=True, motivo="Elegible para devolución")
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """Chat turn on a server-side session: send only the new message and the session_id"""
+    settings = get_settings()
+    async with admitted("chat", request_priority(request.message, PRIORITY_CHAT)):
+        try:
+            session_id, answer = await asyncio.wait_for(
+                chat_sessions.chat(request.message.strip(), request.session_id),
+                timeout=settings.chat_turn_timeout
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="La consulta excedió el tiempo máximo de respuesta")
+        except Exception as e:
+            logger.error(f"Error processing chat turn: {str(e)}")
+            raise llm_unavailable(e) or HTTPException(status_code=500, detail=str(e))
+    return ChatResponse(session_id=session_id, answer=answer)
@@ -1,101 +1,119 @@
 from langchain.tools import BaseTool
 from typing import Optional
-import requests
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _get_devolutions():
+    """Return the DevolutionsGenerator shared with the API, creating one if the API has not started"""
+    from app.api import apiFast
+    from app.api.devoluciones import DevolutionsGenerator
+    if apiFast.devolutions is None:
+        apiFast.devolutions = DevolutionsGenerator()
+    return apiFast.devolutions
+
+
+def _run_sync(coro):
+    """Run a tool coroutine from synchronous code, even if this thread already runs an event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
 
 class GetOrdersDatasetTool(BaseTool):
     name: str = "get_orders_dataset"
     description: str = "Obtiene el dataset de órdenes de servicio registradas. No requiere parámetros."
 
     def _run(self) -> list:
-        from app.config.settings import get_settings
-        settings = get_settings()
-        return settings.rows_dataset or []
+        from app.api.orders import get_orders_dataset
+        return get_orders_dataset()
 
     async def _arun(self) -> list:
-        raise NotImplementedError("Async not implemented")
+        # El dataset ya está en memoria: no hay I/O que esperar
+        return self._run()
 
 class GetOrderTool(BaseTool):
     name: str = "get_order"
     description: str = "Obtiene los detalles de una orden de servicio por su código. Input: orden_servicio (str)"
 
     def _run(self, orden_servicio: str) -> dict:
-        import re
-        from app.config.settings import get_settings
-        from app.api.devoluciones import DevolutionsGenerator
-        settings = get_settings()
-        rows = settings.rows_dataset or []
-        if not orden_servicio or not re.match(r"^[A-Z]{3}-\d{4}-\d{5}$", orden_servicio):
+        return _run_sync(self._arun(orden_servicio))
+
+    async def _arun(self, orden_servicio: str) -> dict:
+        from app.api.orders import get_order_row, is_valid_order_id
+        if not is_valid_order_id(orden_servicio):
             return {"error": "Formato de orden de servicio inválido."}
-        order = next((row['row'] for row in rows if row['row']['order_id'] == orden_servicio), None)
+        order = get_order_row(orden_servicio)
         if not order:
             return {"error": f"No se encontró la orden de servicio: {orden_servicio}"}
 
-        devolucion = DevolutionsGenerator().buscar_devolucion(orden_servicio)
+        # La búsqueda en el registro de devoluciones lee un archivo: fuera del event loop
+        devolucion = await asyncio.to_thread(_get_devolutions().buscar_devolucion, orden_servicio)
         if devolucion:
             return {"error": f"La orden de servicio {orden_servicio} tiene una devolución registrada."}
         return order
 
-    async def _arun(self, orden_servicio: str) -> dict:
-        raise NotImplementedError("Async not implemented")
-
 class QueryRAGTool(BaseTool):
     name: str = "query_rag"
     description: str = "Realiza una consulta RAG y devuelve la respuesta generada. Input: query (str), top_k (int, opcional), temperature (float, opcional)"
 
     def _run(self, query: str, top_k: Optional[int] = 3, temperature: Optional[float] = 0.7) -> dict:
-        from app.api.apiFast import retriever, generator
+        return _run_sync(self._arun(query, top_k=top_k, temperature=temperature))
+
+    async def _arun(self, query: str, top_k: Optional[int] = 3, temperature: Optional[float] = 0.7) -> dict:
+        from app.rag import services as rag_services
+        if not rag_services.has_searchable_index():
+            return {"error": "El servicio RAG aún no está inicializado."}
         try:
-            documents = retriever.retrieve(query, top_k=top_k)
-            response = generator.generate(query=query, documents=documents, temperature=temperature)
-            return response
+            documents, _ = await rag_services.get_retriever().search(query, top_k=top_k)
+            return await rag_services.get_generator().generate(query=query, documents=documents, temperature=temperature)
         except Exception as e:
             return {"error": str(e)}
 
-    async def _arun(self, query: str, top_k: Optional[int] = 3, temperature: Optional[float] = 0.7) -> dict:
-        raise NotImplementedError("Async not implemented")
-
 class RegisterReturnOrderTool(BaseTool):
     name: str = "register_return_order"
     description: str = "Registra una devolución para una orden. Input: codigo_devolucion (str)"
 
     def _run(self, codigo_devolucion: str) -> dict:
-        from app.api.apiFast import devolutions
+        from utils.metrics import RETURN_REGISTRATIONS, metrics_enabled, stage_timer
         try:
-            result: str = devolutions.registrar_devolucion(codigo_devolucion)
+            with stage_timer("return", "registration"):
+                result: str = _get_devolutions().registrar_devolucion(codigo_devolucion)
+            # registrar_devolucion devuelve False o un mensaje de error cuando no registra
+            failed = result is False or str(result).startswith("Error")
+            if metrics_enabled():
+                RETURN_REGISTRATIONS.inc(source="agent", outcome="error" if failed else "ok")
+            if failed:
+                error = "Código de devolución inválido." if result is False else str(result)
+                return {"success": False, "error": error}
             return {"success": True, "message": f"Devolución registrada: {result}"}
         except Exception as e:
+            if metrics_enabled():
+                RETURN_REGISTRATIONS.inc(source="agent", outcome="error")
             return {"success": False, "error": str(e)}
 
     async def _arun(self, codigo_devolucion: str) -> dict:
-        raise NotImplementedError("Async not implemented")
+        # La orden se busca en el índice en memoria; la escritura de los JSON es I/O bloqueante
+        return await asyncio.to_thread(self._run, codigo_devolucion)
 
 class VerifyEligibilityOrderTool(BaseTool):
     name: str = "verify_eligibility_order"
     description: str = "Verifica si una orden es elegible para devolución. Input: orden_servicio (str)"
 
     def _run(self, orden_servicio: str) -> dict:
-        from app.api.apiFast import devolutions
-        from app.config.settings import get_settings
-        import re
-        settings = get_settings()
-        rows = settings.rows_dataset or []
-        if not orden_servicio or not re.match(r"^[A-Z]{3}-\d{4}-\d{5}$", orden_servicio):
+        return _run_sync(self._arun(orden_servicio))
+
+    async def _arun(self, orden_servicio: str) -> dict:
+        from app.api.orders import get_order_row, is_valid_order_id
+        if not is_valid_order_id(orden_servicio):
             return {"elegible": False, "motivo": "Formato de orden de servicio inválido."}
-        order = next((row['row'] for row in rows if row['row']['order_id'] == orden_servicio), None)
+        order = get_order_row(orden_servicio)
         if not order:
             return {"elegible": False, "motivo": "Orden de servicio no encontrada."}
-        
-        # Regla 5: Productos no elegibles por tipo
-        tipo = order.get("category", "").lower()
-        if any(palabra in tipo for palabra in ["higiene", "cosméticos", "alimentos", "bebidas"]):
-            return {"elegible": False, "motivo": "Productos de higiene personal, cosméticos, alimentos o bebidas no pueden ser devueltos."}
-        # Regla 6: Status debe ser 'Entregado'
-        status = order.get("status", "")
-        if status.strip().lower() != "entregado":
-            return {"elegible": False, "motivo": "Solo productos con status 'Entregado' pueden ser devueltos."}
-        return {"elegible": True, "motivo": "Elegible para devolución."}
-
-       
 
-    async def _arun(self, orden_servicio: str) -> dict:
-        raise NotImplementedError("Async not implemented")
+        # Reglas 5 y 6: categoría no elegible y status 'Entregado'
+        elegible, motivo = await _get_devolutions().is_eligible_for_return(order)
+        return {"elegible": elegible, "motivo": motivo}
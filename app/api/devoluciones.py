@@ -3,11 +3,15 @@ import json
 import re
 from pathlib import Path
 from glob import glob
+import threading
 from loguru import logger
-import httpx
 from app.config.settings import get_settings
+from utils.metrics import stage_timer
 from pydantic import BaseModel, Field
 
+# Los registros corren en hilos: la lectura y reescritura de los JSON se hace de a uno
+_registro_lock = threading.Lock()
+
 class OrderResponse(BaseModel):
     tracking_number: int = Field(..., description="Número de seguimiento del pedido")
     order_id: str = Field(..., description="ID de la orden de servicio")
@@ -45,7 +49,7 @@ class DevolutionsGenerator:
     Notes
     -----
     - Devolutions are stored in JSON files located in the 'docs' directory of the project.
-    - The class relies on external configuration and remote datasets for order validation.
+    - Orders are validated against the shared orders index (app/api/orders.py), loaded at startup.
     """
     def __init__(self):
         """Initialize the DevolutionsGenerator"""
@@ -121,21 +125,18 @@ class DevolutionsGenerator:
     async def registrar_devolucion_en_json(self, codigo_devolucion: str) -> bool:
         """
         Registra una devolución en los archivos JSON correspondientes dado un código de devolución.
-        Este método valida el formato del código de devolución, busca la orden asociada en un dataset remoto,
-        y si la encuentra, agrega la información de la devolución en todos los archivos JSON ubicados en la carpeta 'docs'.
+        Este método valida el formato del código de devolución, busca la orden asociada en el índice de órdenes
+        cargado al arrancar, y si la encuentra, agrega la información de la devolución en todos los archivos JSON
+        ubicados en la carpeta 'docs'. La escritura se hace en un hilo, fuera del event loop.
         Args:
             codigo_devolucion (str): Código de devolución a registrar. Debe tener el formato 'AAA-0000-00000-000000'.
         Returns:
             bool: True si la devolución fue registrada exitosamente en los archivos JSON, False en caso contrario.
         """
+        import asyncio
         import re
-        import json
-        import httpx
-        import os
-        from pathlib import Path
-        from glob import glob
-        from app.config.settings import get_settings
-        
+        from app.api.orders import get_order_row
+
         codigo = codigo_devolucion
                 
         match = re.search(r"[A-Z]{3}-\d{4}-\d{5}-\d{6}", codigo)
@@ -143,79 +144,34 @@ class DevolutionsGenerator:
         if not etiqueta_devolucion:
             return False
 
-        # Obtener dataset de órdenes
-        with httpx.Client() as client:
-            settings = get_settings()
-            response = client.get(settings.endpointdataset)
-            data = response.json()
-            rows = data.get("rows", [])
-
         match_orden_servicio = re.search(r"[A-Z]{3}-\d{4}-\d{5}", etiqueta_devolucion)
         orden_servicio = match_orden_servicio.group(0) if match_orden_servicio else None
         if not orden_servicio:
             return False
         # Buscar la orden por order_id
-        order = next((row for row in rows if row['row']['order_id'] == orden_servicio), None)
+        with stage_timer("return", "order_lookup"):
+            order = get_order_row(orden_servicio)
 
         if order:
-            order_response = OrderResponse(
-                tracking_number=order['row'].get('tracking_number', 0),
-                order_id=order['row'].get('order_id', orden_servicio),
-                customer_name=order['row'].get("customer_name", ""),
-                city=order['row'].get("city", ""),
-                product=order['row'].get("product", ""),
-                category=order['row'].get("category", ""),
-                status=order['row'].get("status", ""),
-                carrier=order['row'].get("carrier", ""),
-                track_url=order['row'].get("track_url", ""),
-                notes=order['row'].get("notes", "") + f" Devolución registrada con código: {etiqueta_devolucion}",
-                delayed=order['row'].get("delayed", False),
-                eta=order['row'].get("eta", ""),
-                last_update=order['row'].get("last_update", ""),
-                devolution_code=etiqueta_devolucion
-            )
-
-            docs_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "docs")
-            json_files = glob(os.path.join(docs_folder, "*.json"))
-            try:
-                for json_path in json_files:
-                    try:
-                        with open(json_path, "r", encoding="utf-8") as f:
-                            content = f.read().strip()
-                            if not content:
-                                json_data = []
-                            else:
-                                json_data = json.loads(content)
-                        json_data.append(order_response.dict())
-                        with open(json_path, "w", encoding="utf-8") as f:
-                            json.dump(json_data, f, ensure_ascii=False, indent=2)
-                    except Exception:
-                        return False
-            except Exception:
-                logger.error(f"Error al registrar la devolución en los archivos JSON.")
-                return False
-            return True
+            order_response = self._order_response(order, orden_servicio, etiqueta_devolucion)
+            return await asyncio.to_thread(self._guardar_devolucion, order_response)
         else:
             return False
     
     def registrar_devolucion(self, codigo_devolucion: str) -> str:
         """
         Registra una devolución en los archivos JSON correspondientes dado un código de devolución.
-        Este método valida el formato del código de devolución, busca la orden asociada en un dataset remoto,
-        y si la encuentra, agrega la información de la devolución en todos los archivos JSON ubicados en la carpeta 'docs'.
+        Este método valida el formato del código de devolución, busca la orden asociada en el índice de órdenes
+        cargado al arrancar, y si la encuentra, agrega la información de la devolución en todos los archivos JSON
+        ubicados en la carpeta 'docs'. Es bloqueante: desde código async, llamarlo con asyncio.to_thread.
         Args:
             codigo_devolucion (str): Código de devolución a registrar. Debe tener el formato 'AAA-0000-00000'.
         Returns:
-            bool: True si la devolución fue registrada exitosamente en los archivos JSON, False en caso contrario.
+            str: La devolución registrada, o un mensaje de error (False si el código no es válido).
         """
         import re
-        import json
-        import httpx
-        import os
-        from pathlib import Path
-        from glob import glob
-        from app.config.settings import get_settings
         import random
+        from app.api.orders import get_order_row
 
         codigo = codigo_devolucion
 
@@ -235,37 +191,47 @@ class DevolutionsGenerator:
         if not orden_servicio:
             return False
 
-        # Obtener dataset de órdenes
-        with httpx.Client() as client:
-            settings = get_settings()
-            response = client.get(settings.endpointdataset)
-            data = response.json()
-            rows = data.get("rows", [])
-
         # Buscar la orden por order_id
-        order = next((row for row in rows if row['row']['order_id'] == orden_servicio), None)
+        with stage_timer("return", "order_lookup"):
+            order = get_order_row(orden_servicio)
 
         if order:
-            order_response = OrderResponse(
-                tracking_number=order['row'].get('tracking_number', 0),
-                order_id=order['row'].get('order_id', orden_servicio),
-                customer_name=order['row'].get("customer_name", ""),
-                city=order['row'].get("city", ""),
-                product=order['row'].get("product", ""),
-                category=order['row'].get("category", ""),
-                status=order['row'].get("status", ""),
-                carrier=order['row'].get("carrier", ""),
-                track_url=order['row'].get("track_url", ""),
-                notes=order['row'].get("notes", "") + f" Devolución registrada con código: {orden_devolucion}",
-                delayed=order['row'].get("delayed", False),
-                eta=order['row'].get("eta", ""),
-                last_update=order['row'].get("last_update", ""),
-                devolution_code=orden_devolucion
-            )
+            order_response = self._order_response(order, orden_servicio, orden_devolucion)
+            if not self._guardar_devolucion(order_response):
+                return f"Error al registrar la devolución en los archivos JSON."
+            return str(order_response)
+        else:
+            return f"Error al registrar la devolución en los archivos JSON."
 
-            docs_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "docs")
-            json_files = glob(os.path.join(docs_folder, "*.json"))
-            try:
+    @staticmethod
+    def _order_response(order: dict, orden_servicio: str, codigo_devolucion: str) -> OrderResponse:
+        """Registro de la devolución: los campos de la orden más el código de devolución"""
+        return OrderResponse(
+            tracking_number=order.get('tracking_number', 0),
+            order_id=order.get('order_id', orden_servicio),
+            customer_name=order.get("customer_name", ""),
+            city=order.get("city", ""),
+            product=order.get("product", ""),
+            category=order.get("category", ""),
+            status=order.get("status", ""),
+            carrier=order.get("carrier", ""),
+            track_url=order.get("track_url", ""),
+            notes=order.get("notes", "") + f" Devolución registrada con código: {codigo_devolucion}",
+            delayed=order.get("delayed", False),
+            eta=order.get("eta", ""),
+            last_update=order.get("last_update", ""),
+            devolution_code=codigo_devolucion
+        )
+
+    def _guardar_devolucion(self, order_response: OrderResponse) -> bool:
+        """
+        Agrega la devolución a todos los archivos JSON de la carpeta 'docs' (bloqueante).
+        Las escrituras se serializan: dos registros simultáneos leerían el mismo archivo y uno perdería su entrada.
+        """
+        docs_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "docs")
+        json_files = glob(os.path.join(docs_folder, "*.json"))
+        try:
+            with stage_timer("return", "persist"), _registro_lock:
                 for json_path in json_files:
                     try:
                         with open(json_path, "r", encoding="utf-8") as f:
@@ -279,12 +245,10 @@ class DevolutionsGenerator:
                             json.dump(json_data, f, ensure_ascii=False, indent=2)
                     except Exception:
                         return False
-            except Exception:
-                logger.error(f"Error al registrar la devolución en los archivos JSON.")
-                return f"Error al registrar la devolución en los archivos JSON."
-            return str(order_response)
-        else:
-            return f"Error al registrar la devolución en los archivos JSON."
+        except Exception:
+            logger.error(f"Error al registrar la devolución en los archivos JSON.")
+            return False
+        return True
     
     async def is_eligible_for_return(self, order_row: dict) -> tuple[bool, str]:
         """
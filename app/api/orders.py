@@ -0,0 +1,182 @@
+"""
+Orders Index Module
+Shared, columnar in-memory table of the orders dataset loaded at startup
+"""
+
+import re
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+ORDER_ID_PATTERN = re.compile(r"^[A-Z]{3}-\d{4}-\d{5}$")
+
+
+def is_valid_order_id(orden_servicio: str) -> bool:
+    """Check that a service order code has the expected format (ECO-2509-20001)"""
+    return bool(orden_servicio) and ORDER_ID_PATTERN.match(orden_servicio) is not None
+
+
+class CategoricalColumn:
+    """Dictionary-encoded column: one small integer code per row into the list of distinct values"""
+
+    __slots__ = ("codes", "values", "_index")
+
+    def __init__(self):
+        self.codes = array("H")
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def append(self, value: str):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+            if code > 0xFFFF and self.codes.typecode == "H":
+                self.codes = array("I", self.codes)
+        self.codes.append(code)
+
+    def __getitem__(self, position: int) -> str:
+        return self.values[self.codes[position]]
+
+    def nbytes(self) -> int:
+        return (sys.getsizeof(self.codes) + sys.getsizeof(self.values) + sys.getsizeof(self._index)
+                + sum(sys.getsizeof(value) for value in self.values))
+
+
+class TextColumn:
+    """Variable-length strings packed as one UTF-8 buffer plus an offsets array"""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+
+    def append(self, value: str):
+        self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def __getitem__(self, position: int) -> str:
+        return self.data[self.offsets[position]:self.offsets[position + 1]].decode("utf-8")
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.data) + sys.getsizeof(self.offsets)
+
+
+class OrderTable:
+    """
+    Column-oriented store of the orders dataset.
+
+    Low-cardinality fields (status, city, carrier, category and the eta /
+    last_update dates) are dictionary-encoded as small integer codes,
+    ``tracking_number`` and ``delayed`` are typed arrays, and the remaining
+    text fields are packed UTF-8 buffers, so a row costs a few bytes per field
+    instead of a dict holding its own keys and string objects. Rows are
+    materialized into dicts only when looked up.
+    """
+
+    CATEGORICAL_COLUMNS = ("status", "city", "carrier", "category", "eta", "last_update")
+    TEXT_COLUMNS = ("order_id", "customer_name", "product", "track_url", "notes")
+
+    def __init__(self):
+        self.tracking_number = array("q")
+        self.delayed = array("b")
+        self.columns: Dict[str, object] = {column: CategoricalColumn() for column in self.CATEGORICAL_COLUMNS}
+        self.columns.update({column: TextColumn() for column in self.TEXT_COLUMNS})
+        self._positions: Dict[str, int] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "OrderTable":
+        """
+        Build a table from datasets-server rows (``[{'row': {...}}]``) or plain order dicts
+        """
+        table = cls()
+        for row in rows:
+            table.append(row.get("row", row))
+        return table
+
+    def append(self, order: dict):
+        """Add one order; a repeated order_id points the index at the newest row"""
+        position = len(self.tracking_number)
+        self.tracking_number.append(int(order.get("tracking_number") or 0))
+        self.delayed.append(1 if order.get("delayed") else 0)
+        for column, values in self.columns.items():
+            values.append(str(order.get(column) or ""))
+        self._positions[str(order.get("order_id") or "")] = position
+
+    def __len__(self) -> int:
+        return len(self.tracking_number)
+
+    def row(self, position: int) -> dict:
+        """Materialize the order at a position as a dict with the dataset's field names"""
+        columns = self.columns
+        return {
+            "tracking_number": self.tracking_number[position],
+            "order_id": columns["order_id"][position],
+            "customer_name": columns["customer_name"][position],
+            "city": columns["city"][position],
+            "product": columns["product"][position],
+            "category": columns["category"][position],
+            "status": columns["status"][position],
+            "carrier": columns["carrier"][position],
+            "track_url": columns["track_url"][position],
+            "notes": columns["notes"][position],
+            "delayed": bool(self.delayed[position]),
+            "eta": columns["eta"][position],
+            "last_update": columns["last_update"][position],
+        }
+
+    def get(self, order_id: str) -> Optional[dict]:
+        """Look an order up by its service order code"""
+        position = self._positions.get(order_id)
+        return self.row(position) if position is not None else None
+
+    def __iter__(self) -> Iterator[dict]:
+        for position in range(len(self)):
+            yield self.row(position)
+
+    def to_rows(self) -> List[dict]:
+        """Rebuild the datasets-server shape (``[{'row': {...}}]``)"""
+        return [{"row": order} for order in self]
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the table, including the order_id lookup index"""
+        total = sys.getsizeof(self.tracking_number) + sys.getsizeof(self.delayed)
+        total += sys.getsizeof(self._positions) + sum(sys.getsizeof(key) for key in self._positions)
+        return total + sum(column.nbytes() for column in self.columns.values())
+
+
+_table: Optional[OrderTable] = None
+
+
+def load_orders(rows: Iterable[dict]) -> OrderTable:
+    """Replace the shared order table with one built from the downloaded dataset"""
+    global _table
+    _table = OrderTable.from_rows(rows)
+    return _table
+
+
+def get_order_table() -> Optional[OrderTable]:
+    """The shared order table, or None before the dataset is loaded"""
+    return _table
+
+
+def get_order_row(orden_servicio: str) -> Optional[dict]:
+    """
+    Look up an order by its service order code
+
+    Every caller (API endpoints and agent tools) shares one O(1) lookup over
+    the columnar table instead of scanning the dataset on each request.
+
+    Args:
+        orden_servicio: Service order code
+
+    Returns:
+        The order fields (the ``row`` payload of the dataset) or None if not found
+    """
+    return _table.get(orden_servicio) if _table is not None else None
+
+
+def get_orders_dataset() -> List[dict]:
+    """The whole dataset in its original ``[{'row': {...}}]`` shape, materialized on demand"""
+    return _table.to_rows() if _table is not None else []
@@ -0,0 +1,70 @@
+"""
+Pre-fork Module
+Loads the read-only assets once in the pre-fork server's master process, so
+forked workers share them copy-on-write instead of each loading its own copy
+"""
+
+import gc
+import os
+import sys
+import time
+from loguru import logger
+from app.config.settings import get_settings
+
+
+def fetch_orders_dataset() -> list:
+    """Download the orders dataset synchronously (the master has no event loop)"""
+    import httpx
+    settings = get_settings()
+    with httpx.Client(timeout=60.0) as client:
+        response = client.get(settings.endpointdataset)
+        return response.json().get("rows", [])
+
+
+def preload_shared_assets():
+    """
+    Load the embedding model, build the vector index and the orders index in the
+    current process, then freeze the GC so the workers do not dirty the shared pages.
+
+    Only fork-safe state is built here: the ChromaDB client (SQLite plus
+    background threads) is replaced by the numpy vector store, and per-process
+    resources such as the LLM client, the completion cache and the chat sessions
+    database are still created by each worker.
+    """
+    from app.api.orders import load_orders
+    from app.rag import services as rag_services
+
+    settings = get_settings()
+    started = time.perf_counter()
+    if settings.vector_store_backend != "numpy":
+        logger.warning("Pre-fork: ChromaDB no es seguro tras un fork, se usa el índice numpy")
+        settings.vector_store_backend = "numpy"
+
+    try:
+        # La tabla columnar y su índice por order_id se construyen una sola vez, antes del fork
+        table = load_orders(fetch_orders_dataset())
+        logger.info(f"Pre-fork: dataset de órdenes cargado ({len(table)} filas)")
+    except Exception as e:
+        # Cada worker lo reintentará en su lifespan
+        logger.error(f"Pre-fork: error al cargar el dataset de órdenes: {e}")
+
+    retriever = rag_services.build_index()
+    logger.info(f"Pre-fork: índice listo {retriever.get_index_status()}")
+
+    # Los objetos precargados pasan a la generación permanente: el GC de los
+    # workers no los recorre y sus páginas siguen compartidas
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Pre-fork: activos compartidos cargados en {time.perf_counter() - started:.1f}s "
+                f"({gc.get_freeze_count()} objetos congelados)")
+
+
+def post_fork():
+    """Per-worker reset after the fork"""
+    threads = os.environ.get("WORKER_TORCH_THREADS")
+    try:
+        if "torch" in sys.modules and threads:
+            # Los pools de hilos de torch no sobreviven al fork; se limitan por worker
+            sys.modules["torch"].set_num_threads(int(threads))
+    except Exception as e:
+        logger.warning(f"No se pudo ajustar los hilos de torch: {e}")
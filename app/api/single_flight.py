@@ -0,0 +1,97 @@
+"""
+Single-Flight Module
+Coalesces identical concurrent requests: the first caller for a key runs the
+computation and every caller that arrives while it is in flight awaits the
+same result instead of repeating the embedding, retrieval and LLM call
+"""
+
+import asyncio
+import json
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional
+from utils.metrics import REGISTRY, metrics_enabled
+
+ORDER_ID_PATTERN = re.compile(r"([A-Z]{3}-\d{4}-\d{5}(?:-\d{6})?)")
+
+COALESCED_REQUESTS = REGISTRY.counter(
+    "ecomarket_coalesced_requests_total",
+    "Requests by single-flight role: leader (computed) or follower (shared an in-flight result)",
+    ("pipeline", "role"),
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a question for coalescing
+
+    Unicode form, case, repeated whitespace and surrounding ``¿?¡!.`` are
+    ignored. Order and return codes keep their case, because only the
+    upper-case form is detected as an order.
+    """
+    query = unicodedata.normalize("NFKC", query)
+    parts = ORDER_ID_PATTERN.split(query)
+    # split() con grupo de captura: las posiciones impares son los códigos de orden
+    text = "".join(part if i % 2 else part.lower() for i, part in enumerate(parts))
+    return " ".join(text.split()).strip("¿?¡!. ")
+
+
+def make_key(query: str, **params) -> str:
+    """Key of a request: normalized query plus every parameter that changes the answer"""
+    return json.dumps({"query": normalize_query(query), **params}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class SingleFlight:
+    """
+    Per-key in-flight deduplication on one event loop.
+
+    Only requests that overlap in time share a result; nothing is kept once
+    the computation finishes (that is the completion cache's job). The
+    computation runs as its own task, so a caller that disconnects or is
+    cancelled does not cancel it for the others. An exception is raised to
+    every caller that shared it.
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"leaders": 0, "followers": 0}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``compute()`` for the key, or join the run already in flight"""
+        task = self._in_flight.get(key)
+        role = "followers" if task is not None else "leaders"
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _, key=key: self._forget(key, task))
+        with self._lock:
+            self.stats[role] += 1
+        if metrics_enabled():
+            COALESCED_REQUESTS.inc(pipeline=self.pipeline, role=role[:-1])
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Sin esperas pendientes (todos cancelados) la excepción no se recupera: se marca como vista
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus the share of requests served by another request's computation"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.stats)
+        total = stats["leaders"] + stats["followers"]
+        stats["coalesced_ratio"] = stats["followers"] / total if total else 0.0
+        stats["in_flight"] = len(self._in_flight)
+        return stats
+
+
+@lru_cache()
+def get_query_flight() -> SingleFlight:
+    """Single-flight group of the /query endpoint"""
+    return SingleFlight("query")
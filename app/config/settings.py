@@ -22,8 +22,23 @@ class Settings(BaseSettings):
     host: str = "127.0.0.1"
     port: int = 8000
     
+    # Índice vectorial en memoria: "chroma" o "numpy" (matriz contigua, segura para pre-fork)
+    vector_store_backend: str = "chroma"
+    # Clasificar la pregunta para buscar solo en los tipos de documento relevantes (policy, manual, faq)
+    retrieval_auto_filter: bool = True
+    # Descartar fragmentos casi duplicados al indexar (SimHash: distancia de Hamming máxima sobre 64 bits)
+    dedup_enabled: bool = True
+    dedup_max_distance: int = 6
+    # Diversificar resultados con MMR: 1.0 = solo relevancia; se evalúan top_k * factor candidatos
+    retrieval_mmr_lambda: float = 0.7
+    retrieval_mmr_fetch_factor: int = 3
+    # Búsquedas recientes (pregunta normalizada, top_k, filtros) servidas sin embedding; se vacía con cada cambio del índice; 0 = desactivada
+    retrieval_cache_size: int = 512
+
     # OpenAI
     embedding_model: str = "all-MiniLM-L6-v2"
+    # "sentence-transformers" (por defecto) o "hashing": determinista y sin modelo, para benchmarks offline
+    embedding_backend: str = "sentence-transformers"
 
     # Azure OpenAI
     azure_openai_key: Optional[str] = Field(None, env="AZURE_OPENAI_KEY")
@@ -31,6 +46,8 @@ class Settings(BaseSettings):
     azure_openai_endpoint: Optional[str] = Field(None, env="AZURE_OPENAI_ENDPOINT")
     azure_openai_deployment_name: Optional[str] = Field(None, env="AZURE_OPENAI_DEPLOYMENT_NAME")
     azure_openai_api_version: Optional[str] = Field(None, env="AZURE_OPENAI_API_VERSION")
+    # Despliegue pequeño para preguntas fáciles con recuperación confiable; vacío = todo va a azure_openai_deployment_name
+    azure_openai_small_deployment_name: Optional[str] = Field(None, env="AZURE_OPENAI_SMALL_DEPLOYMENT_NAME")
     
 
     # Pinecone
@@ -43,6 +60,16 @@ class Settings(BaseSettings):
     blob_container_name: Optional[str] = Field(None, env="BLOB_CONTAINER_NAME")
     blob_storage_connection_key: Optional[str] = Field(None, env="BLOB_STORAGE_CONNECTION_KEY")
     blob_url: Optional[str] = Field(None, env="BLOB_URL")
+    # Origen de los PDFs a indexar: "local" (carpeta docs/) o "blob" (contenedor de Azure Blob Storage / Azurite)
+    docs_source: str = "local"
+    # Descargas simultáneas al sincronizar el contenedor
+    blob_ingestion_concurrency: int = 4
+    # Manifiesto de ETags ya indexados; vacío = solo en memoria (el índice en memoria no sobrevive a un reinicio)
+    blob_manifest_path: Optional[str] = None
+    # Cada cuántos segundos revisar docs/ (o el contenedor) y re-indexar solo los PDFs nuevos, cambiados o borrados; 0 = desactivado
+    docs_watch_interval: float = 30.0
+    # Carpeta de snapshots del índice (matriz mmap + textos indexados por offset); vacío = re-indexar en cada arranque
+    index_snapshot_path: Optional[str] = None
     
     # Vector Store
     vector_store_path: str = "./data/vectorstore"
@@ -53,15 +80,93 @@ class Settings(BaseSettings):
     max_context_length: int = 4000
     temperature: float = 0.7
     
+    # Gradio chat concurrency
+    chat_concurrency_limit: int = 32
+    chat_queue_max_size: int = 256
+    chat_max_inflight_per_session: int = 1
+    chat_turn_timeout: float = 60.0
+
+    # Conversation memory
+    chat_memory_turns: int = 4
+    chat_summary_max_chars: int = 800
+
+    # Chat sessions (SQLite checkpoints)
+    chat_sessions_db_path: str = "./data/chat_sessions.sqlite"
+    chat_session_ttl: float = 86400.0
+    chat_session_compact_after: float = 1800.0
+    chat_session_maintenance_interval: float = 300.0
+
+    # Intent router (fast path before the agent)
+    intent_router_enabled: bool = True
+    intent_router_llm_phrasing: bool = False
+    agent_llm_calls_estimate: float = 2.0
+
+    # LLM completion cache
+    llm_cache_enabled: bool = True
+    llm_cache_path: Optional[str] = "./data/llm_cache.sqlite"
+    llm_cache_memory_entries: int = 1024
+    llm_cache_ttl: Optional[float] = 7 * 24 * 3600
+    llm_cache_allow_nonzero_temperature: bool = False
+
+    # /query: las preguntas idénticas (normalizadas, mismos parámetros) en curso comparten un solo cálculo
+    query_coalescing_enabled: bool = True
+
+    # Llamadas a Azure OpenAI (generador y agente): reintentos con backoff y jitter, timeout por intento,
+    # circuit breaker por despliegue y hedging opcional pasado un percentil de latencia
+    llm_max_attempts: int = 3
+    llm_backoff_base: float = 0.5
+    llm_backoff_max: float = 8.0
+    llm_attempt_timeout: float = 30.0
+    llm_max_retry_after: float = 20.0
+    llm_circuit_failure_threshold: int = 5
+    llm_circuit_reset_timeout: float = 30.0
+    llm_hedge_enabled: bool = False
+    llm_hedge_quantile: float = 0.95
+    # Hilos del pool propio de las llamadas síncronas al SDK de OpenAI (generador y FAQ), fuera del executor por defecto
+    llm_executor_workers: int = 32
+
+    # Enrutador de modelos de /query: confianza mínima de la recuperación y largo máximo de una pregunta "simple";
+    # precios en USD por millón de tokens (entrada, salida) para estimar el coste por ruta
+    model_router_confidence_threshold: float = 0.6
+    model_router_simple_max_words: int = 25
+    llm_small_input_price: float = 0.10
+    llm_small_output_price: float = 0.40
+    llm_large_input_price: float = 0.40
+    llm_large_output_price: float = 1.60
+
+    # Respuestas pre-generadas a preguntas frecuentes (python -m app.rag.faq_store); vacío = desactivadas.
+    # Una pregunta con similitud coseno >= umbral a una pregunta canónica se responde sin búsqueda ni LLM
+    faq_store_path: Optional[str] = None
+    faq_match_threshold: float = 0.9
+
+    # Control de admisión de /query y /chat: límites de concurrencia, cola con prioridad y rechazo rápido
+    admission_enabled: bool = True
+    admission_query_limit: int = 8
+    admission_chat_limit: int = 8
+    # Techo (y valor inicial) del límite global de llamadas al LLM; baja ante 429 o latencia alta y se recupera solo
+    admission_llm_limit: int = 12
+    admission_min_llm_limit: int = 1
+    admission_queue_size: int = 32
+    admission_queue_timeout: float = 10.0
+    admission_target_latency: float = 8.0
+    admission_throttle_backoff: float = 5.0
+
+    # Métricas Prometheus (GET /metrics); desactivadas, la instrumentación no hace nada
+    metrics_enabled: bool = True
+
     # Logging
     log_level: str = "INFO"
     log_file: Optional[str] = "logs/ecomarket_rag.log"
+    # Los sinks escriben desde una cola en segundo plano, fuera del camino de la petición
+    log_enqueue: bool = True
+    # Payloads completos (consulta enriquecida, contexto, prompt) en JSON lines, muestreados
+    log_payload_file: Optional[str] = "logs/payloads.jsonl"
+    log_payload_sample_rate: float = 0.01
     
     endpointdataset: str = "https://datasets-server.huggingface.co/rows?dataset=cam2149%2FEcoMarket&config=default&split=train&offset=0&length=100"
 
-    # Orders dataset (populated at app startup)
-    rows_dataset: Optional[list] = None
-    
+    # El dataset de órdenes se carga al arrancar en app/api/orders.py (OrderTable)
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
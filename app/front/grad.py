@@ -103,87 +103,124 @@ h2 {
     box-shadow: var(--button-primary-shadow);
 }
 """
+import asyncio
 import gradio as gr
-from typing import List
-from app.rag.retriever import DocumentRetriever
-from app.rag.embeddings_hugging_face import EmbeddingHuggingFaceService
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from app.langchain.sessions import ChatSessionManager
+from app.rag import services as rag_services
 from app.config.settings import get_settings
 
-# Instanciar el retriever globalmente para reusar la colección
+# El retriever es compartido con la API y se construye en segundo plano (ver launch_gradio)
 settings = get_settings()
-embedding_service = EmbeddingHuggingFaceService()
-retriever = DocumentRetriever(embedding_service)
 
-async def get_response(question: str, agent_executor) -> str:
+
+class SessionLimiter:
+    """
+    Limits how many chat turns a single Gradio session can have in flight
     """
-    Asynchronously processes a user's question by retrieving relevant context, constructing a prompt, and invoking an agent to generate a response.
+
+    def __init__(self, max_inflight: int):
+        self.max_inflight = max_inflight
+        self._inflight: Dict[str, int] = {}
+
+    def try_acquire(self, session_id: str) -> bool:
+        """Reserve a slot for the session; False if it already has max_inflight turns running"""
+        current = self._inflight.get(session_id, 0)
+        if current >= self.max_inflight:
+            return False
+        self._inflight[session_id] = current + 1
+        return True
+
+    def release(self, session_id: str):
+        """Free a slot, forgetting idle sessions so the table does not grow unbounded"""
+        current = self._inflight.get(session_id, 0) - 1
+        if current > 0:
+            self._inflight[session_id] = current
+        else:
+            self._inflight.pop(session_id, None)
+
+
+session_limiter = SessionLimiter(settings.chat_max_inflight_per_session)
+
+
+async def retrieve_context(query: str) -> str:
+    """Retrieve the document context for a chat turn"""
+    if not rag_services.has_searchable_index():
+        # Mientras se indexan los documentos el agente responde sin contexto
+        return ""
+    docs, _ = await rag_services.get_retriever().search(query, 3)
+    return " --- ".join([doc['content'] for doc in docs]) if docs else ""
+
+
+async def get_response(question: str, session_manager: ChatSessionManager,
+                       session_id: Optional[str] = None) -> Tuple[Optional[str], str]:
+    """
+    Asynchronously processes a user's question through the server-side chat session, which retrieves relevant context and invokes the agent.
     Args:
-        question (str): The user's question to be answered.
-        agent_executor: An agent capable of processing the constructed prompt and returning a response.
+        question (str): The user's latest message; previous turns live in the session checkpoint.
+        session_manager (ChatSessionManager): Manager of the checkpointed chat sessions.
+        session_id (str, optional): Session to continue; a new one is created when None.
     Returns:
-        str: The agent's answer to the question, or an error message if the input is invalid or processing fails.
+        tuple: (session_id, answer); the answer is an error message if the input is invalid or the turn times out.
     """
 
     if not question or not question.strip():
-        return "Por favor ingresa una pregunta válida."
+        return session_id, "Por favor ingresa una pregunta válida."
     else:
         query = question.strip()
 
-    # Recuperar contexto relevante
-    docs = await retriever.retrieve(query, 3)
-    context = " --- ".join([doc['content'] for doc in docs]) if docs else ""
-
-    # 2. Construir el prompt para el agente
-    prompt = (
-        "--- Contexto:\n{contexto}\n\n--- Pregunta:\n{pregunta}"
-        .format(contexto=context, pregunta=question)
-    )
-
-    # 3. Ejecutar el agente
-    agent_input = {"input": prompt, "context": context}
-    response = agent_executor.invoke(agent_input)
-
-    # 4. Extraer y retornar la respuesta
-    output = response.get("output")
-    if output:
-        return output.strip()
-    return str(response)
-
-    # except Exception as e:
-    #     return f"Error al procesar la consulta: {str(e)}"
- 
+    try:
+        session_id, answer = await asyncio.wait_for(
+            session_manager.chat(query, session_id),
+            timeout=settings.chat_turn_timeout
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Agent turn exceeded {settings.chat_turn_timeout}s timeout")
+        return session_id, "Lo siento, tu consulta está tardando demasiado. Por favor intenta de nuevo en unos momentos."
 
+    return session_id, answer.strip()
 
 
-def create_chat_interface(agent_executor):
+def create_chat_interface(session_manager: ChatSessionManager):
     """
     Crea la interfaz de chat Gradio para EcoMarket RAG.
-    - agent_executor: agente LangChain/LangGraph
+    - session_manager: sesiones de chat persistidas del agente LangGraph
     Returns: gr.Blocks demo
     """
 
-    async def chat_function(message: str, history: List[dict[str, str]]) -> List[dict[str, str]]:
+    async def chat_function(message: str, session_id: Optional[str], history: List[dict[str, str]],
+                            request: gr.Request):
         """
         Procesa el mensaje del usuario y actualiza el historial de la conversación.
+        El cliente solo envía el mensaje nuevo: el identificador de sesión y el historial
+        mostrado viven en el estado del servidor y la memoria del agente en el checkpoint.
         """
+        history = history or []
         if not message or not message.strip():
             history.append({"role": "assistant", "content": "Por favor ingresa un mensaje válido."})
-            return history
+            return history, session_id, history
+        # El límite va por sesión del navegador: el session_id del chat aparece recién tras el primer turno,
+        # y usarlo como clave dejaría dos turnos en curso justo en ese cambio
+        limiter_key = getattr(request, "session_hash", None) or "anonymous"
+        if not session_limiter.try_acquire(limiter_key):
+            history.append({"role": "assistant", "content": "Aún estoy procesando tu mensaje anterior, por favor espera la respuesta."})
+            return history, session_id, history
         try:
             # Añadir mensaje del usuario
             history.append({"role": "user", "content": message.strip()})
 
-            # Construir historial para contexto
-            history_str = "\n".join([f"{msg['role']}:{msg['content']}" for msg in history])
-            response = await get_response(history_str, agent_executor)
+            session_id, response = await get_response(message.strip(), session_manager, session_id)
 
             # Añadir respuesta del asistente
             history.append({"role": "assistant", "content": response})
-            return history
+            return history, session_id, history
         except Exception as e:
             error_msg = f"Error al procesar tu consulta: {str(e)}"
             history.append({"role": "assistant", "content": error_msg})
-            return history
+            return history, session_id, history
+        finally:
+            session_limiter.release(limiter_key)
 
     with gr.Blocks(theme=gr.themes.Default(primary_hue=gr.themes.colors.green, secondary_hue=gr.themes.colors.lime),title="EcoMarket RAG Chat", css=custom_css) as demo:
         gr.Markdown(
@@ -197,6 +234,10 @@ def create_chat_interface(agent_executor):
             """
         )
 
+        # Estado del lado del servidor: no viaja en cada petición
+        session_state = gr.State(None)
+        history_state = gr.State([])
+
         chatbot = gr.Chatbot(
             label="EcoMarket Chatbot",
             height="80%",
@@ -216,26 +257,40 @@ def create_chat_interface(agent_executor):
             submit_btn = gr.Button("Enviar", variant="primary")
             clear_btn = gr.Button("Limpiar", variant="secondary")
 
+        # Enter y botón comparten el mismo límite global de turnos concurrentes
+        chat_limits = {
+            "concurrency_limit": settings.chat_concurrency_limit,
+            "concurrency_id": "chat_turn",
+        }
+        chat_inputs = [msg, session_state, history_state]
+        chat_outputs = [chatbot, session_state, history_state]
         # Enviar mensaje con Enter
-        msg.submit(chat_function, inputs=[msg, chatbot], outputs=chatbot).then(
+        msg.submit(chat_function, inputs=chat_inputs, outputs=chat_outputs, **chat_limits).then(
             lambda: gr.update(value=""), outputs=msg
         )
         # Enviar mensaje con botón
-        submit_btn.click(chat_function, inputs=[msg, chatbot], outputs=chatbot).then(
+        submit_btn.click(chat_function, inputs=chat_inputs, outputs=chat_outputs, **chat_limits).then(
             lambda: "", outputs=msg
         )
-        # Limpiar historial
-        clear_btn.click(lambda: [], None, chatbot, queue=False)
+        # Limpiar historial: la sesión anterior expira en el servidor
+        clear_btn.click(lambda: ([], None, []), None, chat_outputs, queue=False)
 
     return demo
 
 
-def launch_gradio(agent_executor, share: bool = False, server_port: int = 7000):
+def launch_gradio(session_manager: Optional[ChatSessionManager] = None, share: bool = False, server_port: int = 7000):
     
-    demo = create_chat_interface(agent_executor)
+    rag_services.start_background_warm_up()
+    session_manager = session_manager or ChatSessionManager(context_provider=retrieve_context,
+                                                           faq_provider=rag_services.faq_chat_answer)
+    demo = create_chat_interface(session_manager)
+    demo.queue(
+        default_concurrency_limit=settings.chat_concurrency_limit,
+        max_size=settings.chat_queue_max_size,
+    )
 
     demo.launch(
         share=share, server_port=server_port, server_name="127.0.0.1", show_error=True
     )
 
-    return demo
\ No newline at end of file
+    return demo
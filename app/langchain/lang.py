@@ -1,8 +1,9 @@
 
 import os
+import asyncio
+import json
+import time
 
-from sqlalchemy import text
-from typer import prompt
 from app.api.apiFast_tools import (
     GetOrdersDatasetTool,
     GetOrderTool,
@@ -11,16 +12,62 @@ from app.api.apiFast_tools import (
     VerifyEligibilityOrderTool
 )
 from langchain_openai import AzureChatOpenAI
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
 from app.config import settings
-from langchain.agents import initialize_agent, AgentType
 from langgraph.graph import StateGraph, END
+from langgraph.graph.message import REMOVE_ALL_MESSAGES, add_messages
+from app.langchain.memory import ConversationMemory
+from app.rag.llm_cache import build_langchain_cache, get_completion_cache
+from loguru import logger
+from utils.metrics import TOOL_CALLS, TOOL_SECONDS, metrics_enabled
 
-from typing import TypedDict, List, Any
+from typing import Annotated, TypedDict, List, Any, Dict
 
-# Minimal state schema for LangGraph agent
-class AgentState(TypedDict):
+def turn_timings(current: List[Dict[str, Any]], update: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reducer of 'timings': the 'ingest' node starts each turn with a fresh list and later nodes append to it,
+    so the checkpointed session keeps only the timings of its last turn"""
+    if update and update[0].get("node") == "ingest":
+        return list(update)
+    return (current or []) + list(update or [])
+
+
+# State schema for the LangGraph agent
+class AgentState(TypedDict, total=False):
     input: str
-    intermediate_steps: List[Any]
+    context: str
+    messages: Annotated[List[BaseMessage], add_messages]
+    iterations: int
+    # Memoria acotada de la conversación (ver ConversationMemory.to_state)
+    turns: List[List[str]]
+    summary_lines: List[str]
+    entities: List[str]
+    output: str
+    # Tiempos de los nodos y herramientas del turno actual (se reinician en 'ingest')
+    timings: Annotated[List[Dict[str, Any]], turn_timings]
+
+
+class ResilientAzureChatOpenAI(AzureChatOpenAI):
+    """AzureChatOpenAI whose async calls go through the shared resilient LLM caller (retries, breaker, hedging)"""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        from app.rag.resilience import get_llm_caller
+        generate = super()._agenerate
+        return await get_llm_caller("agent").call(
+            lambda: generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+
+def _timed(node_name: str, node):
+    """Wrap an async graph node so its wall time is appended to state['timings']"""
+    async def wrapper(state: AgentState) -> dict:
+        start = time.perf_counter()
+        update = await node(state)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Agent node '{node_name}' took {elapsed * 1000:.1f} ms")
+        update["timings"] = update.get("timings", []) + [{"node": node_name, "seconds": elapsed}]
+        return update
+    return wrapper
+
 
 class LangAgent:
 
@@ -40,44 +87,143 @@ class LangAgent:
         self.allSettings = settings.get_settings()
         
     
-    def load_agent(self): 
+    def load_agent(self, max_iterations: int = 5, checkpointer=None):
         """
-        Initializes and configures a language model agent with predefined tools and settings.
-        This method sets up an agent using the AzureChatOpenAI language model and a list of custom tools
-        for handling order-related tasks. The agent is configured with a specific prompt, verbosity, 
-        error handling, and iteration limits.
+        Builds the agent as a LangGraph state graph with native tool calling.
+        The graph alternates an 'agent' node (the AzureChatOpenAI model bound to the order tools) and a
+        'tools' node that executes every tool call of a model turn concurrently, so independent calls such
+        as get_order and verify_eligibility_order for the same order run in parallel. Each node and each
+        tool call records its wall time in the 'timings' field of the state, which only holds the current turn.
+        The 'messages' channel only holds the current turn: 'finalize' folds the turn into a bounded
+        ConversationMemory (recent turns plus rolling summary) and clears it, so a checkpointed session
+        never grows with the conversation length.
+        Args:
+            max_iterations (int): Maximum model turns with tools before the agent must give a final answer.
+            checkpointer: Optional LangGraph checkpointer; with one, invoke with
+                config={"configurable": {"thread_id": session_id}} and send only the new message.
         Returns:
-            An initialized agent node ready to process structured chat interactions using the specified tools and model.
+            A compiled graph invoked asynchronously with {"input": ..., "context": ...}; the answer is in "output".
         """
         Tools = [
             self.get_order_tool,
             self.register_return_order_tool,
             self.verify_eligibility_order_tool
         ]
+        tools_by_name = {tool.name: tool for tool in Tools}
+
+        llm_model = self.load_llm()
+        llm_with_tools = llm_model.bind_tools(Tools)
+        system_prompt = self.get_prompt("PROMPTBASE")
+        memory_kwargs = {
+            "max_turns": self.allSettings.chat_memory_turns,
+            "max_summary_chars": self.allSettings.chat_summary_max_chars,
+        }
+
+        async def ingest(state: AgentState) -> dict:
+            # Descarta restos de un turno interrumpido, agrega el mensaje del usuario y reinicia las iteraciones
+            return {
+                "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), HumanMessage(content=state.get("input", ""))],
+                "iterations": 0,
+            }
+
+        async def agent(state: AgentState) -> dict:
+            memory = ConversationMemory.from_state(state, **memory_kwargs)
+            system_content = system_prompt.format(context=state.get("context", ""))
+            history = memory.history_prompt()
+            if history:
+                system_content = f"{system_content}\n\n{history}"
+            recent = [
+                HumanMessage(content=content) if role == "user" else AIMessage(content=content)
+                for role, content in memory.messages
+            ]
+            messages = [SystemMessage(content=system_content)] + recent + list(state["messages"])
+            # Al agotar las iteraciones se fuerza una respuesta final sin herramientas
+            model = llm_with_tools if state.get("iterations", 0) < max_iterations else llm_model
+            response = await model.ainvoke(messages)
+            return {"messages": [response], "iterations": state.get("iterations", 0) + 1}
 
-        llm_model = AzureChatOpenAI(
+        async def run_tool(tool_call: dict):
+            start = time.perf_counter()
+            tool = tools_by_name.get(tool_call["name"])
+            try:
+                if tool is None:
+                    result = {"error": f"Herramienta desconocida: {tool_call['name']}"}
+                else:
+                    result = await tool.ainvoke(tool_call["args"])
+            except Exception as e:
+                logger.error(f"Error running tool {tool_call['name']}: {str(e)}")
+                result = {"error": str(e)}
+            elapsed = time.perf_counter() - start
+            if metrics_enabled():
+                outcome = "error" if isinstance(result, dict) and "error" in result else "ok"
+                TOOL_SECONDS.observe(elapsed, tool=tool_call["name"])
+                TOOL_CALLS.inc(tool=tool_call["name"], outcome=outcome)
+            message = ToolMessage(
+                content=result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str),
+                tool_call_id=tool_call["id"],
+                name=tool_call["name"],
+            )
+            return message, {"node": f"tool:{tool_call['name']}", "seconds": elapsed}
+
+        async def tools(state: AgentState) -> dict:
+            last_message: AIMessage = state["messages"][-1]
+            results = await asyncio.gather(*(run_tool(call) for call in last_message.tool_calls))
+            return {
+                "messages": [message for message, _ in results],
+                "timings": [timing for _, timing in results],
+            }
+
+        async def finalize(state: AgentState) -> dict:
+            output = state["messages"][-1].content or ""
+            memory = ConversationMemory.from_state(state, **memory_kwargs)
+            memory.add_message("user", state.get("input", ""))
+            memory.add_message("assistant", output)
+            return {
+                "output": output,
+                "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES)],
+                **memory.to_state(),
+            }
+
+        def next_step(state: AgentState) -> str:
+            last_message = state["messages"][-1]
+            return "tools" if getattr(last_message, "tool_calls", None) else "finalize"
+
+        graph = StateGraph(AgentState)
+        graph.add_node("ingest", _timed("ingest", ingest))
+        graph.add_node("agent", _timed("agent", agent))
+        graph.add_node("tools", _timed("tools", tools))
+        graph.add_node("finalize", _timed("finalize", finalize))
+        graph.set_entry_point("ingest")
+        graph.add_edge("ingest", "agent")
+        graph.add_conditional_edges("agent", next_step, {"tools": "tools", "finalize": "finalize"})
+        graph.add_edge("tools", "agent")
+        graph.add_edge("finalize", END)
+
+        return graph.compile(checkpointer=checkpointer)
+
+    def load_llm(self) -> AzureChatOpenAI:
+        """
+        Creates the AzureChatOpenAI chat model shared by the agent and the intent router fast path.
+        Returns:
+            AzureChatOpenAI: Chat model configured from the application settings with temperature 0,
+                backed by the shared completion cache when llm_cache_enabled is set, whose calls are
+                retried, timed out, hedged and circuit-broken by the resilient "agent" caller.
+        """
+        cache = None
+        if self.allSettings.llm_cache_enabled:
+            cache = build_langchain_cache(get_completion_cache(), temperature=0)
+        return ResilientAzureChatOpenAI(
             azure_deployment=self.allSettings.azure_openai_deployment_name,
             temperature=0,
             azure_endpoint=self.allSettings.azure_openai_endpoint,
             api_key=self.allSettings.azure_openai_key,
-            api_version=self.allSettings.azure_openai_api_version
+            api_version=self.allSettings.azure_openai_api_version,
+            cache=cache,
+            # Reintentos y timeouts por intento los aplica get_llm_caller("agent")
+            max_retries=0,
+            timeout=self.allSettings.llm_attempt_timeout
         )
 
-        # Configurar el agente con las herramientas
-        agent_node = initialize_agent(
-            tools=Tools,
-            llm=llm_model,
-            agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
-            verbose=True,
-            handle_parsing_errors=True,   
-            max_iterations=5,   
-            agent_kwargs={
-                "prefix": self.get_prompt("PROMPTBASE")
-            },
-        )
-        
-        return agent_node
-
     def get_prompt(self, name):
         """
         Retrieves the text of a prompt from the 'app/rag/prompts.txt' file given its name.
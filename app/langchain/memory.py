@@ -0,0 +1,137 @@
+"""
+Conversation Memory Module
+Bounded chat memory: recent turns verbatim plus a rolling summary of older turns
+"""
+
+import re
+from collections import OrderedDict, deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+# Códigos de orden de servicio (ECO-2509-20001) y de devolución (ECO-2509-20001-123456)
+ENTITY_PATTERN = re.compile(r"[A-Z]{3}-\d{4}-\d{5}(?:-\d{6})?")
+
+ROLE_LABELS = {"user": "Usuario", "assistant": "Asistente"}
+
+
+def extract_entities(text: str) -> List[str]:
+    """Extract order and return codes mentioned in a text, in order of appearance"""
+    return list(dict.fromkeys(ENTITY_PATTERN.findall(text or "")))
+
+
+def summarize_message(role: str, content: str, max_chars: int = 160) -> str:
+    """
+    Default extractive summarizer: keeps the first sentence of a message, truncated
+
+    Args:
+        role: Message role ("user" or "assistant")
+        content: Message text
+        max_chars: Maximum characters kept from the message
+
+    Returns:
+        One summary line for the message
+    """
+    text = " ".join((content or "").split())
+    first_sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    if len(first_sentence) > max_chars:
+        first_sentence = first_sentence[:max_chars].rstrip() + "…"
+    return f"{ROLE_LABELS.get(role, role)}: {first_sentence}"
+
+
+class ConversationMemory:
+    """
+    Keeps the last ``max_turns`` turns verbatim and folds older messages into a
+    compact rolling summary, so the prompt size stays roughly constant over a
+    long session. Order and return codes seen in the conversation are kept as
+    entities to enrich retrieval queries.
+    """
+
+    def __init__(self, max_turns: int = 4, max_summary_chars: int = 800,
+                 max_entities: int = 5,
+                 summarizer: Optional[Callable[[str, str], str]] = None):
+        """
+        Initialize the conversation memory
+
+        Args:
+            max_turns: Number of recent user/assistant turns kept verbatim
+            max_summary_chars: Upper bound for the rolling summary length
+            max_entities: Number of most recent entities remembered
+            summarizer: Callable (role, content) -> summary line; extractive by default
+        """
+        self.max_turns = max_turns
+        self.max_summary_chars = max_summary_chars
+        self.max_entities = max_entities
+        self.summarizer = summarizer or summarize_message
+        self.messages: Deque[Tuple[str, str]] = deque()
+        self.summary_lines: Deque[str] = deque()
+        self.entities: "OrderedDict[str, None]" = OrderedDict()
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self.summary_lines)
+
+    def add_message(self, role: str, content: str):
+        """Append a message, folding the oldest ones into the summary when over budget"""
+        self.messages.append((role, content))
+        for entity in extract_entities(content):
+            self.entities.pop(entity, None)
+            self.entities[entity] = None
+        while len(self.entities) > self.max_entities:
+            self.entities.popitem(last=False)
+
+        while len(self.messages) > self.max_turns * 2:
+            old_role, old_content = self.messages.popleft()
+            self.summary_lines.append(self.summarizer(old_role, old_content))
+        while self.summary_lines and len(self.summary) > self.max_summary_chars:
+            self.summary_lines.popleft()
+
+    def compact(self):
+        """Fold every verbatim message into the summary (used for idle sessions)"""
+        while self.messages:
+            old_role, old_content = self.messages.popleft()
+            self.summary_lines.append(self.summarizer(old_role, old_content))
+        while self.summary_lines and len(self.summary) > self.max_summary_chars:
+            self.summary_lines.popleft()
+
+    def to_state(self) -> dict:
+        """Serialize the memory into plain lists for a graph state / checkpoint"""
+        return {
+            "turns": [[role, content] for role, content in self.messages],
+            "summary_lines": list(self.summary_lines),
+            "entities": list(self.entities),
+        }
+
+    @classmethod
+    def from_state(cls, state: Optional[dict], **kwargs) -> "ConversationMemory":
+        """Rebuild a memory from the fields written by ``to_state``"""
+        memory = cls(**kwargs)
+        state = state or {}
+        memory.messages.extend((role, content) for role, content in state.get("turns") or [])
+        memory.summary_lines.extend(state.get("summary_lines") or [])
+        for entity in state.get("entities") or []:
+            memory.entities[entity] = None
+        return memory
+
+    def clear(self):
+        """Forget the whole conversation"""
+        self.messages.clear()
+        self.summary_lines.clear()
+        self.entities.clear()
+
+    def retrieval_query(self, question: str) -> str:
+        """
+        Build the retrieval query: the latest user message plus remembered entities
+        that the message does not already mention
+        """
+        missing = [entity for entity in self.entities if entity not in question]
+        if not missing:
+            return question
+        return f"{question} {' '.join(missing)}"
+
+    def history_prompt(self) -> str:
+        """Render the rolling summary and remembered entities for the system prompt"""
+        sections = []
+        if self.summary_lines:
+            sections.append(f"--- Resumen de la conversación:\n{self.summary}")
+        if self.entities:
+            sections.append(f"--- Órdenes mencionadas:\n{', '.join(self.entities)}")
+        return "\n\n".join(sections)
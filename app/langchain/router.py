@@ -0,0 +1,198 @@
+"""
+Intent Router Module
+Deterministic fast path in front of the ReAct agent for order lookups and eligibility checks
+"""
+
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from app.config.settings import get_settings
+
+ROUTE_ORDER_STATUS = "order_status"
+ROUTE_ELIGIBILITY = "eligibility"
+ROUTE_AGENT = "agent"
+
+ORDER_ID_PATTERN = re.compile(r"[A-Z]{3}-\d{4}-\d{5}")
+RETURN_CODE_PATTERN = re.compile(r"[A-Z]{3}-\d{4}-\d{5}-\d{6}")
+
+# Las palabras clave son comienzos de palabra: "estado" también encuentra "estados", pero no "contestado"
+ELIGIBILITY_KEYWORDS = ("devolver", "devuelvo", "devolución", "devolucion", "elegible",
+                        "reembolso", "retornar", "return")
+STATUS_KEYWORDS = ("estado", "status", "dónde", "donde", "seguimiento", "rastre", "llega",
+                   "envío", "envio", "entrega", "detalle")
+# Operaciones con efectos (registrar devolución, generar etiqueta) siempre pasan por el agente.
+# Son expresiones de palabras completas: "genera" no debe encontrar "general" ni "crea", "creado"
+AGENT_KEYWORDS = (r"registr\w*", r"etiquetas?", r"gener(?:a|ar|e|en)(?:me|la|lo|nos)?",
+                  r"crea(?:r|me|la|lo)?", r"cancel\w*")
+
+
+def keyword_pattern(keywords, whole_words: bool = False) -> "re.Pattern":
+    """Case-insensitive pattern matching any keyword at the start of a word (or as a whole word)"""
+    return re.compile(r"\b(?:" + "|".join(keywords) + (r")\b" if whole_words else ")"), re.IGNORECASE)
+
+
+ELIGIBILITY_PATTERN = keyword_pattern(ELIGIBILITY_KEYWORDS)
+STATUS_PATTERN = keyword_pattern(STATUS_KEYWORDS)
+AGENT_PATTERN = keyword_pattern(AGENT_KEYWORDS, whole_words=True)
+
+CLOSING = ("Fue un gusto proporcionarle la información solicitada, no dude en volver a usar "
+           "nuestros servicios de Chat Autómatizado. Cordialmente: Servicio al Cliente")
+
+
+class RouterStats:
+    """
+    Thread-safe counters of routing decisions and the LLM calls they avoided
+    """
+
+    def __init__(self, agent_llm_calls_estimate: float):
+        self.agent_llm_calls_estimate = agent_llm_calls_estimate
+        self._lock = threading.Lock()
+        self.routes: Dict[str, int] = {ROUTE_ORDER_STATUS: 0, ROUTE_ELIGIBILITY: 0, ROUTE_AGENT: 0}
+        self.llm_calls_made = 0
+
+    def record(self, route: str, llm_calls: int = 0):
+        with self._lock:
+            self.routes[route] = self.routes.get(route, 0) + 1
+            if route != ROUTE_AGENT:
+                self.llm_calls_made += llm_calls
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the counters plus the estimated number of agent LLM calls avoided"""
+        with self._lock:
+            fast_path = sum(count for route, count in self.routes.items() if route != ROUTE_AGENT)
+            total = fast_path + self.routes.get(ROUTE_AGENT, 0)
+            return {
+                "routes": dict(self.routes),
+                "fast_path_ratio": fast_path / total if total else 0.0,
+                "fast_path_llm_calls": self.llm_calls_made,
+                "llm_calls_avoided": fast_path * self.agent_llm_calls_estimate - self.llm_calls_made,
+            }
+
+
+class IntentRouter:
+    """
+    Routes unambiguous order questions straight to the tool logic, bypassing the
+    multi-step ReAct loop. Anything ambiguous returns None and goes to the agent.
+    """
+
+    def __init__(self, llm=None, agent_llm_calls_estimate: float = 2.0):
+        """
+        Initialize the intent router
+
+        Args:
+            llm: Optional LangChain chat model; when given, fast-path answers are
+                phrased with a single LLM call instead of a fixed template
+            agent_llm_calls_estimate: LLM calls an agent run needs at least
+                (tool selection + final answer), used to estimate calls avoided
+        """
+        from app.api.apiFast_tools import GetOrderTool, VerifyEligibilityOrderTool
+        self.llm = llm
+        self.get_order_tool = GetOrderTool()
+        self.verify_eligibility_order_tool = VerifyEligibilityOrderTool()
+        self.stats = RouterStats(agent_llm_calls_estimate)
+
+    def classify(self, message: str) -> Tuple[str, Optional[str]]:
+        """
+        Classify a user message
+
+        Returns:
+            Tuple (route, order_id); order_id is None for the agent route
+        """
+        text = message or ""
+        order_ids = list(dict.fromkeys(ORDER_ID_PATTERN.findall(text)))
+        if len(order_ids) != 1 or RETURN_CODE_PATTERN.search(text):
+            return ROUTE_AGENT, None
+        if AGENT_PATTERN.search(text):
+            return ROUTE_AGENT, None
+        wants_return = ELIGIBILITY_PATTERN.search(text) is not None
+        wants_status = STATUS_PATTERN.search(text) is not None
+        # Varias intenciones (estado y devolución) en un mensaje: una sola ruta respondería a medias
+        if wants_return and wants_status:
+            return ROUTE_AGENT, None
+        if wants_return:
+            return ROUTE_ELIGIBILITY, order_ids[0]
+        # Al estado solo con una intención explícita o el código solo; "mi pedido ... llegó roto" es ambiguo
+        remainder = ORDER_ID_PATTERN.sub("", text).strip(" ?¿!¡.,:")
+        if wants_status or not remainder:
+            return ROUTE_ORDER_STATUS, order_ids[0]
+        return ROUTE_AGENT, None
+
+    async def route(self, message: str) -> Optional[str]:
+        """
+        Answer a message through the fast path when possible
+
+        Returns:
+            The answer, or None when the message must go to the agent
+        """
+        route, order_id = self.classify(message)
+        if route == ROUTE_AGENT:
+            self.stats.record(route)
+            logger.info("Intent router: agent")
+            return None
+
+        if route == ROUTE_ORDER_STATUS:
+            result = await self.get_order_tool._arun(order_id)
+            answer = self._format_order(order_id, result)
+        else:
+            result = await self.verify_eligibility_order_tool._arun(order_id)
+            answer = self._format_eligibility(order_id, result)
+
+        llm_calls = 0
+        if self.llm is not None:
+            answer = await self._phrase(message, answer)
+            llm_calls = 1
+        self.stats.record(route, llm_calls)
+        logger.info(f"Intent router: {route} for {order_id} ({llm_calls} LLM calls)")
+        return answer
+
+    def _format_order(self, order_id: str, order: dict) -> str:
+        if "error" in order:
+            return f"{order['error']}\n\n{CLOSING}"
+        lines: List[str] = [
+            f"Estos son los detalles de tu orden de servicio {order_id}:",
+            f"- Producto: {order.get('product', '')} ({order.get('category', '')})",
+            f"- Estado: {order.get('status', '')}",
+            f"- Transportista: {order.get('carrier', '')}",
+            f"- URL de seguimiento: {order.get('track_url', '')}",
+            f"- Fecha estimada de entrega: {order.get('eta', '')}",
+            f"- Retraso: {'Sí' if order.get('delayed') else 'No'}",
+            f"- Última actualización: {order.get('last_update', '')}",
+        ]
+        if order.get("notes"):
+            lines.append(f"- Notas: {order['notes']}")
+        return "\n".join(lines) + f"\n\n{CLOSING}"
+
+    def _format_eligibility(self, order_id: str, result: dict) -> str:
+        if result.get("elegible"):
+            text = (f"Tu orden de servicio {order_id} es elegible para devolución. "
+                    "Si deseas, puedo registrar la devolución y generar la etiqueta.")
+        else:
+            text = f"Tu orden de servicio {order_id} no es elegible para devolución: {result.get('motivo', '')}"
+        return f"{text}\n\n{CLOSING}"
+
+    async def _phrase(self, message: str, draft: str) -> str:
+        """Rephrase a templated answer with one LLM call, keeping the template on failure"""
+        from langchain_core.messages import HumanMessage, SystemMessage
+        try:
+            response = await self.llm.ainvoke([
+                SystemMessage(content="Eres el Asistente de Servicio al Cliente de EcoMarket. "
+                                      "Redacta una respuesta amable usando únicamente los datos del borrador."),
+                HumanMessage(content=f"Pregunta del cliente: {message}\n\nBorrador:\n{draft}"),
+            ])
+            return response.content or draft
+        except Exception as e:
+            logger.error(f"Error phrasing fast-path answer: {str(e)}")
+            return draft
+
+
+@lru_cache()
+def get_intent_router() -> IntentRouter:
+    """Get the shared intent router instance"""
+    settings = get_settings()
+    llm = None
+    if settings.intent_router_llm_phrasing:
+        from app.langchain.lang import LangAgent
+        llm = LangAgent().load_llm()
+    return IntentRouter(llm=llm, agent_llm_calls_estimate=settings.agent_llm_calls_estimate)
@@ -0,0 +1,219 @@
+"""
+Chat Sessions Module
+Server-side conversation sessions persisted with a local SQLite LangGraph checkpointer
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from loguru import logger
+from app.config.settings import get_settings
+from app.langchain.memory import ConversationMemory
+
+SESSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    turns INTEGER NOT NULL DEFAULT 0,
+    compacted INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class ChatSessionManager:
+    """
+    Runs chat turns against the checkpointed agent graph.
+
+    Each turn only carries the new message and a session ID: the bounded
+    conversation memory lives in the SQLite checkpoint of the session thread.
+    Idle sessions are compacted (turns folded into the summary and superseded
+    checkpoints deleted) and expired sessions are evicted by a background task.
+    The manager binds its SQLite connection to the event loop that first uses
+    it, so create one per event loop (Gradio and FastAPI each own one); both
+    see the same sessions through the shared database file.
+    """
+
+    def __init__(self, context_provider: Optional[Callable[[str], Awaitable[str]]] = None,
+                 db_path: Optional[str] = None,
+                 faq_provider: Optional[Callable[[str], Optional[str]]] = None):
+        """
+        Initialize the session manager
+
+        Args:
+            context_provider: Async callable returning the retrieved context for a query
+            db_path: SQLite database path; defaults to settings.chat_sessions_db_path
+            faq_provider: Callable returning a pre-built answer for a frequent question, or None
+        """
+        settings = get_settings()
+        self.context_provider = context_provider
+        self.faq_provider = faq_provider
+        self.db_path = db_path or settings.chat_sessions_db_path
+        self.session_ttl = settings.chat_session_ttl
+        self.compact_after = settings.chat_session_compact_after
+        self.maintenance_interval = settings.chat_session_maintenance_interval
+        self.memory_kwargs = {
+            "max_turns": settings.chat_memory_turns,
+            "max_summary_chars": settings.chat_summary_max_chars,
+        }
+        self.graph = None
+        self.checkpointer = None
+        self._conn = None
+        self._ready_lock: Optional[asyncio.Lock] = None
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+    async def ensure_ready(self):
+        """Open the SQLite checkpointer and compile the agent graph on first use"""
+        if self.graph is not None:
+            return
+        if self._ready_lock is None:
+            self._ready_lock = asyncio.Lock()
+        async with self._ready_lock:
+            if self.graph is not None:
+                return
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+            from app.langchain.lang import LangAgent
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = await aiosqlite.connect(self.db_path)
+            # WAL permite que Gradio y FastAPI compartan el archivo sin bloquearse
+            await self._conn.execute("PRAGMA journal_mode=WAL")
+            await self._conn.execute(SESSIONS_TABLE)
+            await self._conn.commit()
+            self.checkpointer = AsyncSqliteSaver(self._conn)
+            await self.checkpointer.setup()
+            self.graph = LangAgent().load_agent(checkpointer=self.checkpointer)
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+            logger.info(f"Chat sessions ready on {self.db_path}")
+
+    def _config(self, session_id: str) -> dict:
+        return {"configurable": {"thread_id": session_id}}
+
+    async def chat(self, message: str, session_id: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Run one chat turn
+
+        Args:
+            message: New user message
+            session_id: Existing session ID; a new session is created when None
+
+        Returns:
+            Tuple (session_id, answer)
+        """
+        await self.ensure_ready()
+        session_id = session_id or uuid.uuid4().hex
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            config = self._config(session_id)
+            snapshot = await self.graph.aget_state(config)
+            memory = ConversationMemory.from_state(snapshot.values, **self.memory_kwargs)
+
+            answer = None
+            if get_settings().intent_router_enabled:
+                from app.langchain.router import get_intent_router
+                answer = await get_intent_router().route(message)
+            if answer is None and self.faq_provider is not None:
+                # La búsqueda en la FAQ calcula un embedding: se hace en un hilo, fuera del event loop
+                answer = await asyncio.to_thread(self.faq_provider, message)
+
+            if answer is not None:
+                # La ruta rápida (enrutador o FAQ) no pasa por el grafo: se registra el turno en la memoria del checkpoint
+                memory.add_message("user", message)
+                memory.add_message("assistant", answer)
+                await self.graph.aupdate_state(config, memory.to_state(), as_node="finalize")
+            else:
+                context = ""
+                if self.context_provider is not None:
+                    context = await self.context_provider(memory.retrieval_query(message))
+                result = await self.graph.ainvoke({"input": message, "context": context}, config)
+                answer = result.get("output") or ""
+
+            await self._touch(session_id)
+        return session_id, answer
+
+    async def _touch(self, session_id: str):
+        now = time.time()
+        await self._conn.execute(
+            "INSERT INTO chat_sessions (session_id, created_at, last_seen, turns, compacted) "
+            "VALUES (?, ?, ?, 1, 0) "
+            "ON CONFLICT(session_id) DO UPDATE SET last_seen = excluded.last_seen, "
+            "turns = chat_sessions.turns + 1, compacted = 0",
+            (session_id, now, now),
+        )
+        await self._conn.commit()
+
+    async def compact(self, session_id: str):
+        """Fold a session's recent turns into its summary and drop superseded checkpoints"""
+        await self.ensure_ready()
+        config = self._config(session_id)
+        snapshot = await self.graph.aget_state(config)
+        if not snapshot.values:
+            return
+        memory = ConversationMemory.from_state(snapshot.values, **self.memory_kwargs)
+        memory.compact()
+        await self.graph.aupdate_state(config, memory.to_state(), as_node="finalize")
+
+        latest = (await self.graph.aget_state(config)).config["configurable"]["checkpoint_id"]
+        async with self.checkpointer.lock:
+            await self._conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_id != ?", (session_id, latest)
+            )
+            await self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id != ?", (session_id, latest)
+            )
+            await self._conn.commit()
+
+    async def evict(self, session_id: str):
+        """Delete a session and all its checkpoints"""
+        await self.ensure_ready()
+        await self.checkpointer.adelete_thread(session_id)
+        await self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+        await self._conn.commit()
+        self._session_locks.pop(session_id, None)
+
+    async def maintain(self):
+        """Evict expired sessions and compact idle ones"""
+        now = time.time()
+        async with self._conn.execute(
+            "SELECT session_id FROM chat_sessions WHERE last_seen < ?", (now - self.session_ttl,)
+        ) as cursor:
+            expired = [row[0] for row in await cursor.fetchall()]
+        for session_id in expired:
+            await self.evict(session_id)
+
+        async with self._conn.execute(
+            "SELECT session_id FROM chat_sessions WHERE last_seen < ? AND compacted = 0",
+            (now - self.compact_after,),
+        ) as cursor:
+            idle = [row[0] for row in await cursor.fetchall()]
+        for session_id in idle:
+            lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+            async with lock:
+                await self.compact(session_id)
+                await self._conn.execute(
+                    "UPDATE chat_sessions SET compacted = 1 WHERE session_id = ?", (session_id,)
+                )
+                await self._conn.commit()
+
+        if expired or idle:
+            logger.info(f"Chat sessions maintenance: {len(expired)} evicted, {len(idle)} compacted")
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.error(f"Error in chat sessions maintenance: {str(e)}")
+
+    async def close(self):
+        """Stop maintenance and close the SQLite connection"""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+        if self._conn is not None:
+            await self._conn.close()
+        self.graph = None
@@ -0,0 +1,192 @@
+"""
+Blob Ingestion Module
+Concurrent, in-memory ingestion of PDFs from a blob container (Azure Blob
+Storage, Azurite or a local folder exposed through the same interface), with
+an ETag manifest so unchanged documents are never downloaded or re-embedded
+"""
+
+import asyncio
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
+from loguru import logger
+
+if TYPE_CHECKING:
+    from app.rag.retriever import DocumentRetriever
+
+
+@dataclass
+class BlobEntry:
+    """Name and ETag of a listed blob"""
+    name: str
+    etag: str
+
+
+def local_etag(path: str) -> str:
+    """ETag of a local file: changes whenever its modification time or size changes"""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+class BlobManifest:
+    """
+    ETag and chunk count of every document already in the index.
+
+    Kept in memory by default. Persist it (``path``) only together with an
+    index that survives restarts: a manifest that outlives an in-memory index
+    would make the next start skip documents that are no longer indexed.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+
+    def etag(self, name: str) -> Optional[str]:
+        entry = self._entries.get(name)
+        return entry["etag"] if entry else None
+
+    def chunks(self, name: str) -> int:
+        entry = self._entries.get(name)
+        return entry.get("chunks", 0) if entry else 0
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def record(self, name: str, etag: str, chunks: int):
+        with self._lock:
+            self._entries[name] = {"etag": etag, "chunks": chunks}
+
+    def remove(self, name: str):
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def save(self):
+        """Write the manifest atomically (no-op when it is memory-only)"""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            payload = json.dumps(self._entries, ensure_ascii=False, indent=2)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(temp_path, self.path)
+
+
+class AzureBlobContainer:
+    """PDF blobs of an Azure Blob Storage (or Azurite) container, through the async SDK"""
+
+    def __init__(self, connection_string: str, container_name: str):
+        from azure.storage.blob.aio import ContainerClient
+        self._client = ContainerClient.from_connection_string(connection_string, container_name)
+
+    async def list_pdfs(self) -> AsyncIterator[BlobEntry]:
+        async for blob in self._client.list_blobs():
+            if blob.name.lower().endswith(".pdf"):
+                yield BlobEntry(blob.name, str(blob.etag))
+
+    async def download(self, name: str) -> bytes:
+        downloader = await self._client.download_blob(name)
+        return await downloader.readall()
+
+    async def close(self):
+        await self._client.close()
+
+
+class LocalFolderContainer:
+    """
+    A local folder exposed as a blob container, with ETags derived from each
+    file's modification time and size (docs/ in development, fixtures in tests)
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+
+    async def list_pdfs(self) -> AsyncIterator[BlobEntry]:
+        if not os.path.isdir(self.folder):
+            return
+        for entry in sorted(os.scandir(self.folder), key=lambda e: e.name):
+            if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                yield BlobEntry(entry.name, local_etag(entry.path))
+
+    async def download(self, name: str) -> bytes:
+        with open(os.path.join(self.folder, name), "rb") as f:
+            return f.read()
+
+    async def close(self):
+        pass
+
+
+async def sync_container(retriever: "DocumentRetriever", container, manifest: BlobManifest,
+                         concurrency: int = 4, report_progress: bool = True) -> Dict[str, int]:
+    """
+    Bring the index in line with the container's PDFs
+
+    Blobs whose ETag matches the manifest are skipped without downloading.
+    New and changed blobs are downloaded by up to ``concurrency`` tasks straight
+    into memory and handed through a bounded queue to a single indexing worker
+    that parses and embeds them in a thread, so downloads overlap with
+    embedding. Blobs gone from the container are removed from the index.
+
+    With ``report_progress=False`` (periodic re-syncs of a live index) the
+    retriever's indexing state is left untouched, so readiness never flips.
+
+    Returns:
+        Counts of added, updated, removed, unchanged and failed documents
+    """
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+    listed = [entry async for entry in container.list_pdfs()]
+    pending = [entry for entry in listed if manifest.etag(entry.name) != entry.etag]
+    stats["unchanged"] = len(listed) - len(pending)
+    if report_progress:
+        retriever._update_status(state="indexing", files_total=len(listed), files_done=stats["unchanged"])
+        logger.info(f"Blob sync: {len(listed)} PDFs listed, {len(pending)} new or changed")
+
+    downloads = asyncio.Semaphore(concurrency)
+    buffers: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def download(entry: BlobEntry):
+        async with downloads:
+            try:
+                data = await container.download(entry.name)
+            except Exception as e:
+                logger.error(f"Error downloading blob {entry.name}: {e}")
+                data = None
+        await buffers.put((entry, data))
+
+    async def index_worker():
+        for _ in pending:
+            entry, data = await buffers.get()
+            replace = manifest.etag(entry.name) is not None
+            try:
+                if data is None:
+                    raise ValueError("download failed")
+                chunks = await asyncio.to_thread(retriever.index_pdf_bytes, entry.name, data, replace)
+                manifest.record(entry.name, entry.etag, chunks)
+                stats["updated" if replace else "added"] += 1
+            except Exception as e:
+                logger.error(f"Error indexing blob {entry.name}: {e}")
+                stats["failed"] += 1
+            if report_progress:
+                retriever._update_status(files_indexed=1)
+
+    await asyncio.gather(index_worker(), *(download(entry) for entry in pending))
+
+    listed_names = {entry.name for entry in listed}
+    for name in manifest.names():
+        if name not in listed_names:
+            await asyncio.to_thread(retriever.remove_document, name)
+            manifest.remove(name)
+            stats["removed"] += 1
+    manifest.save()
+    if report_progress:
+        retriever._update_status(state="ready")
+        logger.info(f"Blob sync finished: {stats}")
+    return stats
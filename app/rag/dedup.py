@@ -0,0 +1,137 @@
+"""
+Deduplication Module
+SimHash fingerprints with LSH banding to drop near-duplicate chunks at
+ingestion, and maximal marginal relevance (MMR) to diversify retrieval results
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+FINGERPRINT_BITS = 64
+_WORD = re.compile(r"\w+")
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    64-bit SimHash of a text over its word shingles
+
+    Texts that differ only in whitespace, case, accents or a few words get
+    fingerprints a small Hamming distance apart.
+    """
+    words = _WORD.findall(_normalize(text))
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    """
+    SimHash index of canonical chunks with LSH banding.
+
+    The fingerprint is split into ``max_distance + 1`` bands: two fingerprints
+    within ``max_distance`` bits necessarily agree on at least one whole band,
+    so only chunks sharing a band bucket are compared instead of every chunk.
+    """
+
+    def __init__(self, max_distance: int = 6):
+        """
+        Args:
+            max_distance: Largest Hamming distance (out of 64 bits) treated as a near-duplicate
+        """
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        bounds = [round(i * FINGERPRINT_BITS / bands) for i in range(bands + 1)]
+        self._bands: List[Tuple[int, int]] = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        self._buckets: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in self._bands]
+        self._lock = threading.Lock()
+
+    def _keys(self, fingerprint: int):
+        return [(fingerprint >> start) & mask for start, mask in self._bands]
+
+    def find(self, fingerprint: int, exclude: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """Id of an indexed chunk within max_distance of the fingerprint (skipping ``exclude``d ids), or None"""
+        with self._lock:
+            for buckets, key in zip(self._buckets, self._keys(fingerprint)):
+                for candidate, chunk_id in buckets.get(key, ()):
+                    if hamming_distance(candidate, fingerprint) <= self.max_distance and not (exclude and exclude(chunk_id)):
+                        return chunk_id
+        return None
+
+    def add(self, fingerprint: int, chunk_id: str):
+        """Register a canonical chunk"""
+        with self._lock:
+            for buckets, key in zip(self._buckets, self._keys(fingerprint)):
+                buckets.setdefault(key, []).append((fingerprint, chunk_id))
+
+    def remove(self, chunk_ids: Iterable[str]):
+        """Forget canonical chunks (their document was removed from the index)"""
+        removed = set(chunk_ids)
+        if not removed:
+            return
+        with self._lock:
+            for buckets in self._buckets:
+                for key in list(buckets):
+                    buckets[key] = [entry for entry in buckets[key] if entry[1] not in removed]
+                    if not buckets[key]:
+                        del buckets[key]
+
+
+def mmr_select(query_embedding, candidate_embeddings, k: int, lambda_mult: float = 0.7) -> List[int]:
+    """
+    Pick ``k`` candidates by maximal marginal relevance
+
+    Each step takes the candidate maximizing
+    ``lambda_mult * sim(query, d) - (1 - lambda_mult) * max sim(d, selected)``
+    with cosine similarity, so near-identical passages do not fill the top-k.
+
+    Returns:
+        Positions of the chosen candidates, in selection order
+    """
+    import numpy as np
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.ndim != 2 or len(candidates) == 0:
+        return []
+    query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    selected: List[int] = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+
+def format_source(filename: str, chunk: int) -> str:
+    return f"{filename}#{chunk}"
+
+
+def merge_sources(sources: str, extra: Sequence[str]) -> str:
+    """Append sources to a ``;``-separated list (metadata values must be scalars)"""
+    current = [source for source in sources.split(";") if source] if sources else []
+    current.extend(source for source in extra if source not in current)
+    return ";".join(current)
@@ -0,0 +1,94 @@
+"""
+Document Types Module
+Document tags assigned at ingestion (policy, manual, faq, general), a keyword
+query classifier that picks the tags a question should be searched in, and the
+conversion of simple filters into a vector-store ``where`` clause
+"""
+
+import os
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Union
+
+POLICY = "policy"
+MANUAL = "manual"
+FAQ = "faq"
+GENERAL = "general"
+DOC_TYPES = (POLICY, MANUAL, FAQ, GENERAL)
+
+# Palabras clave sin tildes ni mayúsculas (ver _normalize), por tipo de documento
+_DOCUMENT_KEYWORDS = {
+    FAQ: ("faq", "preguntas frecuentes"),
+    POLICY: ("politica", "devolucion", "reembolso", "garantia", "terminos y condiciones", "condiciones de envio"),
+    MANUAL: ("manual", "guia de usuario", "guia", "instructivo", "user guide"),
+}
+_QUERY_KEYWORDS = {
+    POLICY: ("devolu", "devolver", "reembols", "garantia", "politica", "elegib", "plazo", "envio",
+             "cambio de producto", "categorias no", "no retornable"),
+    MANUAL: ("manual", "como uso", "como usar", "como configur", "instal", "licencia", "paso a paso"),
+}
+# Cuánto texto inicial del documento se inspecciona para etiquetarlo
+_HEAD_CHARS = 5000
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tag_document(filename: str, text: str = "") -> str:
+    """
+    Assign a document type at ingestion time
+
+    The file name decides first (e.g. ``FOR-034-MANUAL-...pdf`` is a manual);
+    otherwise the keyword that appears most in the beginning of the text wins.
+
+    Args:
+        filename: Name of the source file
+        text: Extracted text of the document
+
+    Returns:
+        One of DOC_TYPES
+    """
+    name = _normalize(re.sub(r"[-_.]+", " ", os.path.splitext(os.path.basename(filename))[0]))
+    for doc_type, keywords in _DOCUMENT_KEYWORDS.items():
+        if any(keyword in name for keyword in keywords):
+            return doc_type
+    head = _normalize(text[:_HEAD_CHARS])
+    counts = {
+        doc_type: sum(head.count(keyword) for keyword in keywords)
+        for doc_type, keywords in _DOCUMENT_KEYWORDS.items()
+    }
+    best = max(counts, key=counts.get)
+    return best if counts[best] > 0 else GENERAL
+
+
+def classify_query(query: str) -> Optional[Dict[str, List[str]]]:
+    """
+    Choose the document types a question should be searched in
+
+    Returns:
+        A filter such as ``{"doc_type": ["policy", "faq"]}``, or None when the
+        question does not clearly belong to a type (search everything)
+    """
+    text = _normalize(query)
+    for doc_type, keywords in _QUERY_KEYWORDS.items():
+        if any(keyword in text for keyword in keywords):
+            return {"doc_type": [doc_type, FAQ]}
+    return None
+
+
+def build_where(filters: Optional[Dict[str, Union[Any, List[Any]]]]) -> Optional[Dict[str, Any]]:
+    """
+    Convert ``{field: value | [values]}`` filters into a ChromaDB ``where`` clause
+
+    Lists become ``$in``, several fields are combined with ``$and``; clauses
+    already written with operators (``{"chunk": {"$gte": 2}}``) pass through.
+    """
+    if not filters:
+        return None
+    clauses = [
+        {field: {"$in": list(value)} if isinstance(value, (list, tuple, set)) else value}
+        for field, value in filters.items()
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -4,8 +4,8 @@ Handles document and query embeddings using sentence transformers
 """
 
 import numpy as np
+import threading
 from typing import List
-from sentence_transformers import SentenceTransformer
 from loguru import logger
 
 
@@ -16,15 +16,36 @@ class EmbeddingService:
     
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
         """
-        Initialize the embedding service
+        Initialize the embedding service. The model is loaded on first use
+        (or by warm_up), not here, so constructing the service is cheap.
         
         Args:
             model_name: Name of the sentence transformer model
         """
         logger.info(f"Initializing embedding service with model: {model_name}")
-        self.model = SentenceTransformer(model_name)
-        self.embedding_dim = self.model.get_sentence_embedding_dimension()
-        logger.info(f"Embedding dimension: {self.embedding_dim}")
+        self.model_name = model_name
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Sentence transformer model, loaded on first access"""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    logger.info(f"Loading sentence transformer model: {self.model_name}")
+                    self._model = SentenceTransformer(self.model_name)
+                    logger.info(f"Embedding dimension: {self._model.get_sentence_embedding_dimension()}")
+        return self._model
+
+    @property
+    def embedding_dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def warm_up(self):
+        """Load the model ahead of the first request"""
+        self.model
     
     def embed_text(self, text: str) -> np.ndarray:
         """
@@ -79,3 +100,80 @@ class EmbeddingService:
         return np.dot(embedding1, embedding2) / (
             np.linalg.norm(embedding1) * np.linalg.norm(embedding2)
         )
+
+
+class HashingEmbeddingService:
+    """
+    Deterministic, dependency-free embedding service based on feature hashing of
+    words and word bigrams. Not semantically meaningful: it exists for offline
+    benchmarks and tests, where loading a transformer model is not wanted.
+    Same interface as EmbeddingService.
+    """
+
+    TOKEN_PATTERN = r"\w+"
+
+    def __init__(self, embedding_dim: int = 384):
+        """
+        Initialize the hashing embedding service
+
+        Args:
+            embedding_dim: Size of the embedding vectors
+        """
+        logger.info(f"Initializing hashing embedding service with dimension: {embedding_dim}")
+        self.embedding_dim = embedding_dim
+
+    def warm_up(self):
+        """Nothing to load"""
+
+    def _features(self, text: str) -> List[str]:
+        import re
+        words = re.findall(self.TOKEN_PATTERN, (text or "").lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed_text(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for a single text
+
+        Args:
+            text: Input text string
+
+        Returns:
+            L2-normalized embedding vector as numpy array
+        """
+        import hashlib
+        vector = np.zeros(self.embedding_dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            # El bit alto decide el signo para que las colisiones tiendan a cancelarse
+            vector[value % self.embedding_dim] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for a batch of texts
+
+        Args:
+            texts: List of text strings
+
+        Returns:
+            Array of embeddings
+        """
+        if not texts:
+            return np.zeros((0, self.embedding_dim), dtype=np.float32)
+        return np.vstack([self.embed_text(text) for text in texts])
+
+    def similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+        """
+        Calculate cosine similarity between two embeddings
+
+        Args:
+            embedding1: First embedding vector
+            embedding2: Second embedding vector
+
+        Returns:
+            Cosine similarity score
+        """
+        denominator = np.linalg.norm(embedding1) * np.linalg.norm(embedding2)
+        return float(np.dot(embedding1, embedding2) / denominator) if denominator else 0.0
@@ -5,9 +5,6 @@ Handles document and query embeddings using sentence transformers
 
 import numpy as np
 from typing import List, Union
-from transformers import AutoTokenizer, AutoModel
-import torch
-import torch.nn.functional as F
 from loguru import logger
 
 
@@ -38,6 +35,7 @@ class EmbeddingHuggingFaceService:
         Returns:
             Embedding vector as numpy array
         """
+        import torch
         try:
             inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
             with torch.no_grad():
@@ -63,6 +61,7 @@ class EmbeddingHuggingFaceService:
         Returns:
             Array of embeddings
         """
+        import torch
         try:
             logger.info(f"Generating embeddings for {len(texts)} texts")
             inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, padding=True, max_length=512)
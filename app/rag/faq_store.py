@@ -0,0 +1,374 @@
+"""
+FAQ Store Module
+Pre-built answers to the questions most customers ask (return windows,
+non-returnable categories, shipping and refund times): canonical questions,
+their embeddings, the answers generated from the indexed policy documents and
+the ids of the chunks each answer was built from. A question that closely
+matches a canonical one is answered from the store without retrieval or LLM
+call; an answer whose chunks left the index is not served until it is rebuilt
+
+Usage (build the store offline, after the index):
+    python -m app.rag.faq_store [--generate 10]
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Set
+import numpy as np
+from loguru import logger
+from app.config.settings import get_settings
+from app.rag.llm_cache import ORDER_SPECIFIC_PATTERN, prompt_version
+from utils.metrics import REGISTRY, metrics_enabled
+
+if TYPE_CHECKING:
+    from app.rag.generator import ResponseGenerator
+    from app.rag.retriever import DocumentRetriever
+
+FORMAT_VERSION = 1
+# Documentos recuperados por respuesta, como el top_k por defecto de /query
+FAQ_TOP_K = 3
+
+# Preguntas canónicas: las dudas frecuentes de políticas y las reglas de devolución de los prompts (prompts.txt)
+CANONICAL_QUESTIONS = (
+    "¿Cuál es el plazo para devolver un producto?",
+    "¿Qué productos no se pueden devolver?",
+    "¿Puedo devolver productos de higiene personal, cosméticos, alimentos o bebidas?",
+    "¿Puedo devolver un producto que todavía no me han entregado?",
+    "¿Cómo solicito una devolución?",
+    "¿Quién paga el envío de una devolución?",
+    "¿Cuánto tarda el reembolso de una devolución?",
+    "¿Cuánto tarda en llegar mi pedido?",
+    "¿Cuál es el costo del envío?",
+    "¿Qué garantía tienen los productos?",
+)
+
+# Clave de stats -> etiqueta "outcome" de la métrica
+_OUTCOMES = {"hits": "hit", "misses": "miss", "stale": "stale", "skipped": "skipped"}
+
+FAQ_LOOKUPS = REGISTRY.counter(
+    "ecomarket_faq_lookups_total", "FAQ store lookups by source and outcome", ("source", "outcome")
+)
+
+
+@dataclass
+class FaqEntry:
+    """One canonical question with its pre-built answer and the chunks it was built from"""
+    question: str
+    answer: str
+    sources: List[Dict[str, Any]]
+    confidence: float
+    chunk_ids: List[str]
+    embedding: List[float]
+    built_at: float
+
+
+def chunk_ids_of(documents: Sequence[Dict[str, Any]]) -> List[str]:
+    """Ids of retrieved chunks; they end in a hash of the chunk text, so they fingerprint its content"""
+    return [doc["id"] for doc in documents if doc.get("id")]
+
+
+def store_version(retriever: "DocumentRetriever") -> Dict[str, Any]:
+    """Embedding model and prompt templates the stored embeddings and answers depend on"""
+    return {
+        "format": FORMAT_VERSION,
+        "embedding_model": retriever.snapshot_version()["embedding_model"],
+        "prompt_version": prompt_version(),
+    }
+
+
+async def build_entry(question: str, retriever: "DocumentRetriever", generator: "ResponseGenerator",
+                      embedding: Optional[List[float]] = None,
+                      documents: Optional[List[Dict[str, Any]]] = None) -> FaqEntry:
+    """Retrieve the context of a canonical question and generate its answer at temperature 0"""
+    if documents is None:
+        documents, _ = await retriever.search(question, top_k=FAQ_TOP_K)
+    if embedding is None:
+        embedding = retriever.embedding_service.embed_text(question).tolist()
+    response = await generator.generate(query=question, documents=documents, temperature=0.0)
+    return FaqEntry(
+        question=question,
+        answer=response["answer"],
+        sources=response["sources"],
+        confidence=response["confidence"],
+        chunk_ids=chunk_ids_of(documents),
+        embedding=[float(value) for value in embedding],
+        built_at=time.time(),
+    )
+
+
+class FaqStore:
+    """
+    In-memory FAQ answers, persisted as one JSON file.
+
+    Lookups compare the question's embedding with the canonical questions'
+    (cosine similarity, one matrix product) and serve the best one at or above
+    ``threshold``. Questions about a specific order are never served from the
+    store. Each time the index changes, the entries whose chunks are no longer
+    indexed are marked stale and skipped until ``refresh`` rebuilds them;
+    ``refresh`` also rebuilds the entries whose retrieval now returns other
+    chunks (e.g. a new policy document).
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.9):
+        """
+        Args:
+            path: JSON file the store is loaded from and saved to; None keeps it in memory
+            threshold: Minimum cosine similarity between a question and a canonical question
+        """
+        self.path = path
+        self.threshold = threshold
+        self.version: Optional[Dict[str, Any]] = None
+        self.entries: List[FaqEntry] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._stale: Set[int] = set()
+        self._validated_generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "skipped": 0, "regenerated": 0}
+
+    def set_entries(self, entries: List[FaqEntry], version: Optional[Dict[str, Any]] = None):
+        """Replace every entry at once; staleness is re-checked on the next lookup"""
+        matrix = None
+        if entries:
+            matrix = np.asarray([entry.embedding for entry in entries], dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            self.entries, self._matrix = list(entries), matrix
+            self._stale = set()
+            self._validated_generation = None
+            if version is not None:
+                self.version = version
+
+    def load(self, version: Dict[str, Any]) -> bool:
+        """Load the store file if it was built for this version; False when there is none or it is outdated"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != version:
+            logger.warning(f"FAQ store {self.path} was built for another embedding model or prompts, ignoring it")
+            return False
+        self.set_entries([FaqEntry(**entry) for entry in data.get("entries", [])], version)
+        logger.info(f"Loaded FAQ store {self.path} ({len(self.entries)} questions)")
+        return True
+
+    def save(self) -> str:
+        """Write the store atomically (temporary file swapped with ``os.replace``)"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = {"version": self.version, "created_at": time.time(),
+                    "entries": [asdict(entry) for entry in self.entries]}
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(f"{self.path}.tmp", self.path)
+        logger.info(f"Wrote FAQ store {self.path} ({len(data['entries'])} questions)")
+        return self.path
+
+    def validate(self, retriever: "DocumentRetriever"):
+        """Mark stale the entries built from chunks that are no longer indexed (once per index change)"""
+        generation = retriever.index_generation
+        with self._lock:
+            if generation == self._validated_generation:
+                return
+            entries = self.entries
+        indexed = retriever.existing_chunk_ids([chunk_id for entry in entries for chunk_id in entry.chunk_ids])
+        stale = {i for i, entry in enumerate(entries) if not entry.chunk_ids or not set(entry.chunk_ids) <= indexed}
+        with self._lock:
+            # Si las entradas cambiaron mientras se validaba, la próxima consulta valida de nuevo
+            if entries is self.entries:
+                self._stale = stale
+                self._validated_generation = generation
+        if stale:
+            logger.info(f"{len(stale)} FAQ answers are stale until the store is refreshed")
+
+    def accepts(self, question: str) -> bool:
+        """False when a lookup cannot hit: empty store, or a question about a specific order"""
+        return bool(self.entries) and not ORDER_SPECIFIC_PATTERN.search(question)
+
+    def lookup(self, question: str, retriever: "DocumentRetriever", source: str = "query",
+               embedding: Optional[np.ndarray] = None) -> Optional[FaqEntry]:
+        """
+        Stored entry for a question that closely matches a canonical question (blocking: embeds the question)
+
+        Args:
+            question: The user's question as typed
+            retriever: Retriever whose embedding service and index the store was built with
+            source: Caller, for stats and metrics ("query" or "chat")
+            embedding: Embedding of the question, when the caller already computed it
+
+        Returns:
+            The matching entry, or None (no close match, stale answer or an order-specific question)
+        """
+        if not self.entries:
+            return None
+        if ORDER_SPECIFIC_PATTERN.search(question):
+            # Las respuestas guardadas no conocen los datos de una orden
+            self._count("skipped", source)
+            return None
+        self.validate(retriever)
+        if embedding is None:
+            embedding = retriever.embedding_service.embed_text(question)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            entries, matrix, stale = self.entries, self._matrix, self._stale
+        if matrix is None:
+            return None
+        similarities = matrix @ (embedding / max(float(np.linalg.norm(embedding)), 1e-12))
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self._count("misses", source)
+            return None
+        if best in stale:
+            self._count("stale", source)
+            return None
+        self._count("hits", source)
+        logger.debug("FAQ answer for {!r} (similarity {:.3f})", entries[best].question, float(similarities[best]))
+        return entries[best]
+
+    async def refresh(self, retriever: "DocumentRetriever", generator: "ResponseGenerator") -> Dict[str, int]:
+        """
+        Rebuild the answers whose retrieved chunks changed since they were built
+
+        Every canonical question is retrieved again (cheap: cached embedding
+        model, no LLM); only the entries whose chunk ids differ are sent to
+        the LLM. An entry that fails to rebuild keeps its old answer and stays
+        stale if its chunks are gone. The store is saved when anything changed.
+
+        Returns:
+            Counts of regenerated, unchanged and failed entries
+        """
+        counts = {"regenerated": 0, "unchanged": 0, "failed": 0}
+        entries = []
+        for entry in list(self.entries):
+            documents, _ = await retriever.search(entry.question, top_k=FAQ_TOP_K)
+            if set(chunk_ids_of(documents)) == set(entry.chunk_ids):
+                entries.append(entry)
+                counts["unchanged"] += 1
+                continue
+            try:
+                entries.append(await build_entry(entry.question, retriever, generator,
+                                                 embedding=entry.embedding, documents=documents))
+                counts["regenerated"] += 1
+            except Exception as e:
+                logger.error(f"Error regenerating the FAQ answer to {entry.question!r}: {str(e)}")
+                entries.append(entry)
+                counts["failed"] += 1
+        if counts["regenerated"]:
+            self.set_entries(entries)
+            with self._lock:
+                self.stats["regenerated"] += counts["regenerated"]
+            if self.path:
+                self.save()
+        logger.info(f"FAQ store refreshed: {counts}")
+        return counts
+
+    def _count(self, outcome: str, source: str):
+        with self._lock:
+            self.stats[outcome] += 1
+        if metrics_enabled():
+            FAQ_LOOKUPS.inc(source=source, outcome=_OUTCOMES[outcome])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus the stored questions, the stale ones and the hit rate over lookups"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.stats)
+            questions = [entry.question for entry in self.entries]
+            stale = sorted(self._stale)
+        lookups = stats["hits"] + stats["misses"] + stats["stale"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["questions"] = questions
+        stats["stale_questions"] = [questions[i] for i in stale if i < len(questions)]
+        return stats
+
+
+async def propose_questions(generator: "ResponseGenerator", retriever: "DocumentRetriever", count: int) -> List[str]:
+    """
+    Ask the LLM for frequent customer questions answered by the indexed policy and FAQ documents
+
+    Args:
+        generator: Generator whose client and deployment are used
+        retriever: Retriever holding the indexed documents
+        count: Maximum number of questions
+
+    Returns:
+        The proposed questions, one per line of the answer
+    """
+    from app.rag.doc_types import FAQ, POLICY
+    from app.rag.resilience import get_llm_caller, run_llm_call
+    content = retriever.collection.get(include=["documents", "metadatas"])
+    context, limit = [], get_settings().max_context_length
+    for text, metadata in zip(content["documents"], content["metadatas"]):
+        if (metadata or {}).get("doc_type") not in (POLICY, FAQ):
+            continue
+        if sum(len(part) for part in context) + len(text) > limit:
+            break
+        context.append(text)
+    if not context:
+        return []
+    prompt = generator.get_prompt("FAQQUESTIONS").format(count=count, context="\n\n".join(context))
+    caller = get_llm_caller("faq")
+    response = await caller.call(lambda: run_llm_call(
+        generator.client.chat.completions.create,
+        model=generator.model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.0,
+        timeout=caller.attempt_timeout,
+    ))
+    lines = (line.strip(" -*0123456789.)\t") for line in (response.choices[0].message.content or "").splitlines())
+    return [line for line in lines if line.endswith("?")][:count]
+
+
+async def build_store(store: FaqStore, retriever: "DocumentRetriever", generator: "ResponseGenerator",
+                      generate: int = 0) -> FaqStore:
+    """
+    Build every entry of the store: the canonical questions plus, with ``generate``,
+    up to that many LLM-proposed questions that are not paraphrases of one already kept
+    """
+    questions = list(CANONICAL_QUESTIONS)
+    if generate > 0:
+        questions += await propose_questions(generator, retriever, generate)
+    entries: List[FaqEntry] = []
+    for question in questions:
+        embedding = retriever.embedding_service.embed_text(question)
+        embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        if any(float(np.dot(embedding, entry.embedding)) >= store.threshold for entry in entries):
+            logger.info(f"Skipping FAQ question {question!r}: paraphrase of one already in the store")
+            continue
+        entries.append(await build_entry(question, retriever, generator, embedding=embedding.tolist()))
+    store.set_entries(entries, store_version(retriever))
+    return store
+
+
+@lru_cache()
+def get_faq_store() -> Optional[FaqStore]:
+    """Process-wide FAQ store, or None when FAQ_STORE_PATH is not set"""
+    settings = get_settings()
+    if not settings.faq_store_path:
+        return None
+    return FaqStore(settings.faq_store_path, threshold=settings.faq_match_threshold)
+
+
+def main() -> int:
+    """Index the documents, build the FAQ store and write it to FAQ_STORE_PATH"""
+    import argparse
+    from app.rag import services as rag_services
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generate", type=int, default=0,
+                        help="also ask the LLM for up to N questions from the policy and FAQ documents")
+    args = parser.parse_args()
+    store = get_faq_store()
+    if store is None:
+        raise SystemExit("FAQ_STORE_PATH is not set")
+    retriever = rag_services.build_index()
+    asyncio.run(build_store(store, retriever, rag_services.get_generator(), generate=args.generate))
+    print(store.save())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
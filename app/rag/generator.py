@@ -4,13 +4,18 @@ Generates responses using LLM based on retrieved documents
 """
 
 import os
+import time
 #import openai
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from loguru import logger
 # from streamlit import context
 from app.config import settings
 from app.config.settings import get_settings
-from azure.ai.inference.models import SystemMessage, UserMessage
+from app.rag.llm_cache import CompletionCache, get_completion_cache, prompt_version
+from app.rag.model_router import ROUTE_SMALL, get_model_router
+from app.rag.resilience import get_llm_caller, run_llm_call
+from utils.logging_config import log_payload
+from utils.metrics import record_tokens, stage_timer
 
 class ResponseGenerator:
     """
@@ -23,6 +28,9 @@ class ResponseGenerator:
         settings = get_settings()
         self.client = self.init_client()
         self.model = settings.azure_openai_deployment_name or "gpt-4.1-mini"
+        self.cache = get_completion_cache() if settings.llm_cache_enabled else None
+        # Con AZURE_OPENAI_SMALL_DEPLOYMENT_NAME, las preguntas fáciles van al despliegue pequeño
+        self.model_router = get_model_router()
 
     def init_client(self):
         """Inicializa el cliente de Azure OpenAI."""
@@ -37,6 +45,8 @@ class ResponseGenerator:
             api_version=api_version,
             azure_endpoint=endpoint,
             api_key=subscription_key,
+            # Los reintentos los hace get_llm_caller, respetando Retry-After y el circuit breaker
+            max_retries=0,
         )
     
     def get_prompt(self, name):
@@ -54,7 +64,8 @@ class ResponseGenerator:
    
      
     async def generate(self, query: str, documents: List[Dict[str, Any]], 
-                      temperature: float = 0.7) -> Dict[str, Any]:
+                      temperature: float = 0.7, question: Optional[str] = None,
+                      order_details: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate response using LLM with document context
         
@@ -62,47 +73,83 @@ class ResponseGenerator:
             query: User query
             documents: Retrieved documents
             temperature: LLM temperature parameter
+            question: The user's question as typed, for model routing (defaults to query)
+            order_details: Details of the order the question mentions, added to the prompt context
             
         Returns:
-            Dict containing answer, sources, and confidence
+            Dict containing answer, sources, confidence and the model route (None without a router)
         """
+        from azure.ai.inference.models import SystemMessage, UserMessage
         try:
-            logger.info(f"Generating response for query: {query[:50]}...")
+            logger.debug("Generating response for query: {}...", query[:50])
             # Build context from documents
-            context = self._build_context(documents)
-            logger.info(f"Context from documents: {context[:100]}...")
-            # Create prompt
-            prompt = self._create_prompt_improved(query, context)
-            logger.info(f"Prompt created: {prompt[:100]}...")         
+            with stage_timer("generation", "context_build"):
+                context = self._build_context(documents)
+                if order_details:
+                    context = f"Detalles de la orden de servicio: {order_details}\n\n{context}"
+                # Create prompt
+                prompt = self._create_prompt_improved(query, context)
+            log_payload("generate.prompt", query=query, context=context, prompt=prompt)
             # Prepare messages for chat completion
             messages = [
                         SystemMessage(content=prompt),
                         UserMessage(content=query)
                  ]
             
-            logger.info("Prepare messages for chat completion")
+            logger.debug("Prepare messages for chat completion")
 
-            # Call OpenAI API          
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature
-            )
-            
-            # Extract answer
-            answer = response.choices[0].message['content'] if isinstance(response.choices[0].message, dict) else response.choices[0].message.content
+            # Calculate confidence (simplified); also decides the model route
+            confidence = self._calculate_confidence(documents)
+            decision = self.model_router.choose(question or query, confidence) if self.model_router else None
+            model = decision.deployment if decision else self.model
+
+            # Consultar la caché de respuestas (solo temperatura 0 y prompts sin datos de órdenes)
+            cache_key = None
+            answer = None
+            if self.cache is not None and not self.cache.bypass_reason(prompt + query, temperature):
+                cache_key = CompletionCache.make_key(
+                    model,
+                    [{"role": m.role, "content": m.content} for m in messages],
+                    temperature,
+                    f"PROMPTPBI:{prompt_version()}",
+                )
+                answer = self.cache.get(cache_key)
+                if answer is not None:
+                    logger.info("Completion served from cache")
+
+            if answer is None:
+                # Call OpenAI API
+                # Reintentos, timeout por intento, circuit breaker y hedging (ver app/rag/resilience.py);
+                # el cliente síncrono corre en el pool de hilos propio del LLM para no bloquear el event loop
+                caller = get_llm_caller("generation_small" if decision and decision.route == ROUTE_SMALL else "generation")
+                started = time.perf_counter()
+                with stage_timer("generation", "llm_call"):
+                    response = await caller.call(lambda: run_llm_call(
+                        self.client.chat.completions.create,
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=caller.attempt_timeout
+                    ))
+                record_tokens("generation", getattr(response, "usage", None))
+                if decision:
+                    self.model_router.record_call(decision.route, time.perf_counter() - started,
+                                                  getattr(response, "usage", None))
+
+                # Extract answer
+                answer = response.choices[0].message['content'] if isinstance(response.choices[0].message, dict) else response.choices[0].message.content
+                if cache_key is not None and answer:
+                    self.cache.put(cache_key, answer, time.perf_counter() - started)
 
             # Extract sources
             sources = self._format_sources(documents)
 
-            # Calculate confidence (simplified)
-            confidence = self._calculate_confidence(documents)
-
-            logger.info("Response generated successfully")
+            logger.debug("Response generated successfully")
             return {
                 "answer": answer,
                 "sources": sources,
-                "confidence": confidence
+                "confidence": confidence,
+                "model_route": decision.route if decision else None
             }
             
         except Exception as e:
@@ -0,0 +1,211 @@
+"""
+LLM Completion Cache Module
+Exact-match, content-addressed cache of chat completions with an in-memory LRU tier
+and a persistent SQLite tier that survives restarts
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from app.config.settings import get_settings
+
+# Los prompts con códigos de orden o devolución contienen datos propios de un cliente
+ORDER_SPECIFIC_PATTERN = re.compile(r"[A-Z]{3}-\d{4}-\d{5}")
+
+PROMPTS_PATH = os.path.join(os.path.dirname(__file__), "prompts.txt")
+
+
+@lru_cache()
+def prompt_version() -> str:
+    """Short hash of prompts.txt, so editing a template invalidates its cached completions"""
+    with open(PROMPTS_PATH, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+class CompletionCache:
+    """
+    Two-tier completion cache keyed by (model, messages, temperature, prompt version)
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_memory_entries: int = 1024,
+                 ttl: Optional[float] = None, allow_nonzero_temperature: bool = False):
+        """
+        Initialize the completion cache
+
+        Args:
+            db_path: SQLite file for the persistent tier; None keeps only the memory tier
+            max_memory_entries: Capacity of the in-memory LRU tier
+            ttl: Seconds after which a persisted entry is ignored; None never expires
+            allow_nonzero_temperature: Cache sampled (temperature > 0) completions too
+        """
+        self.max_memory_entries = max_memory_entries
+        self.ttl = ttl
+        self.allow_nonzero_temperature = allow_nonzero_temperature
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, latency REAL NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        self.stats: Dict[str, float] = {
+            "hits_memory": 0, "hits_disk": 0, "misses": 0, "bypassed": 0, "saved_latency_seconds": 0.0,
+        }
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], temperature: float,
+                 version: str = "") -> str:
+        """Content address of a completion request"""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "prompt_version": version},
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def bypass_reason(self, text: str, temperature: float) -> Optional[str]:
+        """
+        Decide whether a request must skip the cache
+
+        Args:
+            text: Full prompt text (all messages)
+            temperature: Sampling temperature of the request
+
+        Returns:
+            The reason to bypass, or None if the request is cacheable
+        """
+        reason = None
+        if temperature > 0 and not self.allow_nonzero_temperature:
+            reason = "temperature"
+        elif ORDER_SPECIFIC_PATTERN.search(text or ""):
+            reason = "order_specific"
+        if reason:
+            with self._lock:
+                self.stats["bypassed"] += 1
+        return reason
+
+    def get(self, key: str) -> Optional[str]:
+        """Look a key up in memory, then on disk (promoting disk hits to memory)"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["hits_memory"] += 1
+                self.stats["saved_latency_seconds"] += entry[1]
+                return entry[0]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, latency, created_at FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                if row and (self.ttl is None or time.time() - row[2] <= self.ttl):
+                    self._remember(key, row[0], row[1])
+                    self.stats["hits_disk"] += 1
+                    self.stats["saved_latency_seconds"] += row[1]
+                    return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: str, latency: float):
+        """Store a completion and the latency it took to produce"""
+        with self._lock:
+            self._remember(key, value, latency)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO completions (key, value, latency, created_at) VALUES (?, ?, ?, ?)",
+                        (key, value, latency, time.time()),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error persisting cached completion: {str(e)}")
+
+    def _remember(self, key: str, value: str, latency: float):
+        self._memory[key] = (value, latency)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached completion from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM completions")
+                self._db.commit()
+
+    def snapshot(self) -> Dict[str, float]:
+        """Counters plus hit rate over cacheable lookups"""
+        with self._lock:
+            stats = dict(self.stats)
+        hits = stats["hits_memory"] + stats["hits_disk"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self._memory)
+        return stats
+
+
+def build_langchain_cache(cache: CompletionCache, temperature: float):
+    """
+    Adapt a CompletionCache to LangChain's BaseCache, for the ``cache=`` argument of chat models
+
+    Args:
+        cache: Shared completion cache
+        temperature: Temperature the chat model was configured with
+    """
+    from langchain_core.caches import BaseCache
+    from langchain_core.load import dumps, loads
+
+    class LangChainCompletionCache(BaseCache):
+        def __init__(self):
+            self._miss_started: Dict[str, float] = {}
+
+        def _key(self, prompt: str, llm_string: str) -> str:
+            return CompletionCache.make_key(llm_string, [{"prompt": prompt}], temperature, prompt_version())
+
+        def lookup(self, prompt: str, llm_string: str):
+            if cache.bypass_reason(prompt, temperature):
+                return None
+            key = self._key(prompt, llm_string)
+            value = cache.get(key)
+            if value is None:
+                if len(self._miss_started) > 1024:
+                    self._miss_started.clear()
+                self._miss_started[key] = time.perf_counter()
+                return None
+            return loads(value)
+
+        def update(self, prompt: str, llm_string: str, return_val) -> None:
+            if ORDER_SPECIFIC_PATTERN.search(prompt or "") or (temperature > 0 and not cache.allow_nonzero_temperature):
+                return
+            key = self._key(prompt, llm_string)
+            started = self._miss_started.pop(key, None)
+            latency = time.perf_counter() - started if started is not None else 0.0
+            cache.put(key, dumps(return_val), latency)
+
+        def clear(self, **kwargs) -> None:
+            cache.clear()
+
+    return LangChainCompletionCache()
+
+
+@lru_cache()
+def get_completion_cache() -> CompletionCache:
+    """Get the shared completion cache instance"""
+    settings = get_settings()
+    return CompletionCache(
+        db_path=settings.llm_cache_path,
+        max_memory_entries=settings.llm_cache_memory_entries,
+        ttl=settings.llm_cache_ttl,
+        allow_nonzero_temperature=settings.llm_cache_allow_nonzero_temperature,
+    )
@@ -0,0 +1,174 @@
+"""
+Model Router Module
+Sends easy questions (a simple intent answered by confident retrieval) to a
+small, cheap deployment and escalates hard or poorly supported ones to the
+large deployment, recording volume, latency and cost per route
+"""
+
+import threading
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from app.config.settings import get_settings
+from app.rag.doc_types import classify_query
+from app.rag.llm_cache import ORDER_SPECIFIC_PATTERN
+from utils.metrics import REGISTRY, metrics_enabled
+
+ROUTE_SMALL = "small"
+ROUTE_LARGE = "large"
+
+# Señales de una pregunta que pide razonar, comparar o resolver varias cosas a la vez (sin tildes, ver _normalize)
+COMPLEX_MARKERS = ("por que", "compar", "diferencia", "explica", "analiza", "ventajas", "desventajas",
+                   "recomienda", "mejor opcion", "paso a paso", "que pasa si", "en caso de que")
+
+ROUTE_DECISIONS = REGISTRY.counter(
+    "ecomarket_model_route_total", "Generation requests by model route and reason", ("route", "reason")
+)
+ROUTE_LATENCY_SECONDS = REGISTRY.histogram(
+    "ecomarket_model_route_latency_seconds", "LLM latency of generation requests by model route", ("route",)
+)
+ROUTE_COST = REGISTRY.counter(
+    "ecomarket_model_route_cost_usd_total", "Estimated LLM cost by model route (USD)", ("route",)
+)
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+@dataclass
+class RouteDecision:
+    """Chosen route, its deployment and why it was chosen"""
+    route: str
+    deployment: str
+    reason: str
+
+
+class ModelRouterStats:
+    """Thread-safe per-route counters of requests, LLM latency, tokens and estimated cost"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes: Dict[str, Dict[str, float]] = {
+            route: {"requests": 0, "llm_calls": 0, "latency_seconds": 0.0, "prompt_tokens": 0,
+                    "completion_tokens": 0, "cost_usd": 0.0}
+            for route in (ROUTE_SMALL, ROUTE_LARGE)
+        }
+        self.reasons: Dict[str, int] = {}
+
+    def record_decision(self, decision: RouteDecision):
+        with self._lock:
+            self.routes[decision.route]["requests"] += 1
+            self.reasons[decision.reason] = self.reasons.get(decision.reason, 0) + 1
+
+    def record_call(self, route: str, latency: float, prompt_tokens: int, completion_tokens: int, cost: float):
+        with self._lock:
+            series = self.routes[route]
+            series["llm_calls"] += 1
+            series["latency_seconds"] += latency
+            series["prompt_tokens"] += prompt_tokens
+            series["completion_tokens"] += completion_tokens
+            series["cost_usd"] += cost
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-route counters plus average latency and cost per LLM call, and the small-route share"""
+        with self._lock:
+            routes = {route: dict(series) for route, series in self.routes.items()}
+            reasons = dict(self.reasons)
+        for series in routes.values():
+            calls = series["llm_calls"]
+            series["avg_latency_seconds"] = series["latency_seconds"] / calls if calls else 0.0
+            series["avg_cost_usd"] = series["cost_usd"] / calls if calls else 0.0
+        total = sum(series["requests"] for series in routes.values())
+        return {
+            "routes": routes,
+            "reasons": reasons,
+            "small_ratio": routes[ROUTE_SMALL]["requests"] / total if total else 0.0,
+        }
+
+
+class ModelRouter:
+    """
+    Picks the deployment for a RAG answer before calling the LLM.
+
+    A question goes to the small deployment only when both hold:
+    retrieval confidence (``ResponseGenerator._calculate_confidence``) is at
+    least ``confidence_threshold``, and the question is a simple intent: an
+    order lookup or a policy/manual question (``classify_query``) that is
+    short and asks for no reasoning or comparison. Everything else escalates.
+    """
+
+    def __init__(self, small_deployment: str, large_deployment: str, confidence_threshold: float = 0.6,
+                 simple_max_words: int = 25, prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        """
+        Args:
+            small_deployment: Cheaper, faster deployment for easy questions
+            large_deployment: Deployment for everything else
+            confidence_threshold: Minimum retrieval confidence for the small deployment
+            simple_max_words: Longer questions are not treated as simple
+            prices: USD per million (input, output) tokens by route, for cost estimates
+        """
+        self.small_deployment = small_deployment
+        self.large_deployment = large_deployment
+        self.confidence_threshold = confidence_threshold
+        self.simple_max_words = simple_max_words
+        self.prices = prices or {}
+        self.stats = ModelRouterStats()
+
+    def simple_intent(self, question: str) -> Optional[str]:
+        """Name of the simple intent the question matches, or None if it needs the large model"""
+        text = _normalize(question)
+        if len(text.split()) > self.simple_max_words or question.count("?") > 1:
+            return None
+        if any(marker in text for marker in COMPLEX_MARKERS):
+            return None
+        if ORDER_SPECIFIC_PATTERN.search(question):
+            return "order"
+        filters = classify_query(question)
+        return filters["doc_type"][0] if filters else None
+
+    def choose(self, question: str, confidence: float) -> RouteDecision:
+        if confidence < self.confidence_threshold:
+            decision = RouteDecision(ROUTE_LARGE, self.large_deployment, "low_confidence")
+        else:
+            intent = self.simple_intent(question)
+            decision = (RouteDecision(ROUTE_SMALL, self.small_deployment, f"simple_{intent}") if intent
+                        else RouteDecision(ROUTE_LARGE, self.large_deployment, "not_simple"))
+        self.stats.record_decision(decision)
+        if metrics_enabled():
+            ROUTE_DECISIONS.inc(route=decision.route, reason=decision.reason)
+        return decision
+
+    def record_call(self, route: str, latency: float, usage) -> float:
+        """Record one LLM call of the route; returns its estimated cost in USD"""
+        def tokens(kind: str) -> int:
+            value = usage.get(kind) if isinstance(usage, dict) else getattr(usage, kind, None)
+            return int(value) if isinstance(value, (int, float)) else 0
+        prompt_tokens, completion_tokens = tokens("prompt_tokens"), tokens("completion_tokens")
+        input_price, output_price = self.prices.get(route, (0.0, 0.0))
+        cost = (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+        self.stats.record_call(route, latency, prompt_tokens, completion_tokens, cost)
+        if metrics_enabled():
+            ROUTE_LATENCY_SECONDS.observe(latency, route=route)
+            ROUTE_COST.inc(cost, route=route)
+        return cost
+
+
+@lru_cache()
+def get_model_router() -> Optional[ModelRouter]:
+    """Router configured from settings, or None when no small deployment is set"""
+    settings = get_settings()
+    if not settings.azure_openai_small_deployment_name:
+        return None
+    return ModelRouter(
+        small_deployment=settings.azure_openai_small_deployment_name,
+        large_deployment=settings.azure_openai_deployment_name or "gpt-4.1-mini",
+        confidence_threshold=settings.model_router_confidence_threshold,
+        simple_max_words=settings.model_router_simple_max_words,
+        prices={
+            ROUTE_SMALL: (settings.llm_small_input_price, settings.llm_small_output_price),
+            ROUTE_LARGE: (settings.llm_large_input_price, settings.llm_large_output_price),
+        },
+    )
@@ -0,0 +1,361 @@
+"""
+LLM Resilience Module
+Retry layer for Azure OpenAI calls: per-attempt timeouts, jittered
+exponential backoff that honors Retry-After, a circuit breaker per Azure OpenAI
+deployment shared by its callers, and optional hedging (a second request fired once
+the first is slower than a latency percentile; the first answer wins)
+"""
+
+import asyncio
+import contextvars
+import functools
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+from loguru import logger
+from app.config.settings import get_settings
+from utils.metrics import REGISTRY, metrics_enabled
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+# Errores de red del SDK de OpenAI (sin importar el SDK aquí)
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError", "ServiceResponseError", "ServiceRequestError")
+
+LLM_ATTEMPTS = REGISTRY.counter(
+    "ecomarket_llm_attempts_total", "LLM call attempts by caller and outcome", ("caller", "outcome")
+)
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open: the call was not attempted"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def retry_after_of(error: BaseException) -> Optional[float]:
+    """Seconds from the Retry-After header of an HTTP error raised by the OpenAI SDK, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name in ("retry-after-ms", "retry-after"):
+        value = headers.get(name)
+        try:
+            if value is not None:
+                return float(value) / (1000.0 if name.endswith("-ms") else 1.0)
+        except ValueError:
+            continue
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors, 429 and 5xx are transient; anything else (400, 401, content filter) is not"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    return status_code_of(error) in RETRYABLE_STATUS or type(error).__name__ in RETRYABLE_ERRORS
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` transient failures in a row the circuit opens
+    and calls fail at once with CircuitOpenError for ``reset_timeout``
+    seconds; then a single trial call is let through (half-open) and its
+    outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may proceed"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._trial_running:
+                raise CircuitOpenError(max(remaining, 1.0))
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("LLM circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or (self._opened_at is None and self._failures >= self.failure_threshold):
+                logger.warning(f"LLM circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release_trial(self):
+        """A trial call ended without a verdict (non-transient error): let the next call try"""
+        with self._lock:
+            self._trial_running = False
+
+
+class ResilientCaller:
+    """
+    Runs LLM calls with timeouts, retries, hedging and the shared circuit breaker.
+
+    ``call`` takes a zero-argument coroutine factory, so every attempt (and
+    every hedge) issues a fresh request. Only idempotent calls should be
+    hedged; chat completions are, at the price of paying for both requests
+    when the hedge fires.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, max_attempts: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 8.0, attempt_timeout: float = 30.0, max_retry_after: float = 20.0,
+                 hedge_quantile: Optional[float] = None, hedge_min_samples: int = 20, window: int = 200):
+        """
+        Args:
+            name: Caller name in logs and metrics (e.g. "generation", "agent")
+            breaker: Circuit breaker of the upstream deployment
+            max_attempts: Attempts per call, including the first
+            base_delay: Backoff before the second attempt; doubles per attempt, with full jitter
+            max_delay: Cap of the backoff
+            attempt_timeout: Seconds before an attempt is abandoned (and retried)
+            max_retry_after: A Retry-After longer than this is not waited for: the error is raised
+            hedge_quantile: Latency percentile (e.g. 0.95) after which a second request is fired; None disables hedging
+            hedge_min_samples: Successful calls observed before hedging starts
+            window: Recent latencies kept for the percentile
+        """
+        self.name = name
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.max_retry_after = max_retry_after
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "calls": 0, "attempts": 0, "successes": 0, "retries": 0, "failures": 0, "timeouts": 0,
+            "hedges": 0, "hedge_wins": 0, "circuit_rejections": 0,
+        }
+
+    async def call(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """Run the call until it succeeds, fails permanently or runs out of attempts"""
+        self._count("calls")
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("circuit_rejections", outcome="circuit_open")
+                raise
+            try:
+                result = await self._attempt(factory)
+            except asyncio.CancelledError:
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release_trial()
+                    self._count("failures", outcome="error")
+                    raise
+                self.breaker.record_failure()
+                delay = self._backoff(attempt, e)
+                if attempt == self.max_attempts or delay is None:
+                    self._count("failures", outcome="error")
+                    raise
+                self._count("retries", outcome="retry")
+                logger.warning(f"LLM {self.name} attempt {attempt} failed ({type(e).__name__}: {e}), "
+                               f"retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _backoff(self, attempt: int, error: BaseException) -> Optional[float]:
+        """Seconds before the next attempt, or None when Retry-After asks for longer than we wait"""
+        retry_after = retry_after_of(error)
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            # Un poco de jitter para que los reintentos de todos los workers no lleguen juntos
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def hedge_delay(self) -> Optional[float]:
+        """The configured latency percentile of recent first requests, once there are enough"""
+        if self.hedge_quantile is None:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+
+    async def _attempt(self, factory: Callable[[], Awaitable[T]]) -> T:
+        hedge_after = self.hedge_delay()
+        if hedge_after is None:
+            return await self._timed(factory, record=True)
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._timed(factory, record=True))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+        self._count("hedges", outcome="hedge")
+        hedge = asyncio.ensure_future(self._timed(factory))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins", outcome="hedge_win")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            if primary in pending:
+                # La primera petición perdió contra el hedge: cuenta con el tiempo que llevaba (una cota
+                # inferior), si no el percentil solo vería las rápidas y bajaría en cada hedge
+                self._record_latency(time.perf_counter() - started)
+            for task in pending:
+                task.cancel()
+
+    async def _timed(self, factory: Callable[[], Awaitable[T]], record: bool = False) -> T:
+        """
+        One request under the per-attempt timeout, reported to admission control
+
+        With ``record``, its latency feeds the hedge percentile; hedges are not
+        recorded: they only run when the first request is already slow.
+        """
+        from app.api.admission import observe_llm_call
+        self._count("attempts")
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(factory(), self.attempt_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._count("timeouts", outcome="timeout")
+            # Para el límite adaptativo (y para el percentil) un intento abandonado es una llamada lenta
+            observe_llm_call(latency=self.attempt_timeout)
+            if record:
+                self._record_latency(self.attempt_timeout)
+            raise
+        except Exception as e:
+            observe_llm_call(error=e)
+            raise
+        latency = time.perf_counter() - started
+        if record:
+            self._record_latency(latency)
+        self._count("successes", outcome="ok")
+        observe_llm_call(latency=latency)
+        return result
+
+    def _record_latency(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _count(self, stat: str, outcome: Optional[str] = None):
+        with self._lock:
+            self.stats[stat] += 1
+        if outcome and metrics_enabled():
+            LLM_ATTEMPTS.inc(caller=self.name, outcome=outcome)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.stats)
+        stats["hedge_after_seconds"] = self.hedge_delay()
+        return stats
+
+
+@lru_cache()
+def get_llm_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool of the blocking Azure OpenAI SDK calls
+
+    Sized by LLM_EXECUTOR_WORKERS and separate from the loop's default
+    executor, so slow or hedged LLM requests (a cancelled hedge keeps its
+    thread until the request times out) cannot starve ``asyncio.to_thread``
+    work such as embeddings, FAQ lookups and file I/O.
+    """
+    return ThreadPoolExecutor(max_workers=get_settings().llm_executor_workers, thread_name_prefix="llm")
+
+
+async def run_llm_call(func: Callable[..., T], *args, **kwargs) -> T:
+    """``asyncio.to_thread`` for LLM SDK calls: runs ``func`` in the LLM executor, keeping the context vars"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_llm_executor(), call)
+
+
+@lru_cache()
+def get_circuit_breaker(deployment: str) -> CircuitBreaker:
+    """Circuit breaker of one Azure OpenAI deployment, shared by the callers that use it"""
+    settings = get_settings()
+    _deployments.append(deployment)
+    return CircuitBreaker(settings.llm_circuit_failure_threshold, settings.llm_circuit_reset_timeout)
+
+
+def deployment_of(name: str) -> str:
+    """Deployment a caller talks to: the small one for "generation_small", the main one for the rest"""
+    settings = get_settings()
+    if name == "generation_small" and settings.azure_openai_small_deployment_name:
+        return settings.azure_openai_small_deployment_name
+    return settings.azure_openai_deployment_name or "default"
+
+
+# Nombres de los callers y despliegues creados, para /llm_stats
+_caller_names: List[str] = []
+_deployments: List[str] = []
+
+
+@lru_cache()
+def get_llm_caller(name: str) -> ResilientCaller:
+    """
+    Resilient caller for one kind of LLM call ("generation", "generation_small", "agent"), configured
+    from settings; a circuit opened by one deployment does not reject the calls to another
+    """
+    settings = get_settings()
+    _caller_names.append(name)
+    return ResilientCaller(
+        name,
+        get_circuit_breaker(deployment_of(name)),
+        max_attempts=settings.llm_max_attempts,
+        base_delay=settings.llm_backoff_base,
+        max_delay=settings.llm_backoff_max,
+        attempt_timeout=settings.llm_attempt_timeout,
+        max_retry_after=settings.llm_max_retry_after,
+        hedge_quantile=settings.llm_hedge_quantile if settings.llm_hedge_enabled else None,
+    )
+
+
+def llm_stats() -> Dict[str, Any]:
+    """Circuit state of every deployment plus the counters of every caller created so far"""
+    callers = {name: {"deployment": deployment_of(name), **get_llm_caller(name).snapshot()}
+               for name in list(_caller_names)}
+    circuits = {deployment: get_circuit_breaker(deployment).state for deployment in list(_deployments)}
+    return {"circuits": circuits, "callers": callers}
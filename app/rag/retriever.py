@@ -3,12 +3,26 @@ Document Retriever Module
 Retrieves relevant documents using vector similarity search
 """
 
-import chromadb
-from typing import List, Dict, Any
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 from loguru import logger
-from app.rag.embeddings import EmbeddingService
-from app.rag.embeddings_hugging_face import EmbeddingHuggingFaceService
 from app.config.settings import get_settings
+from app.rag.blob_ingestion import AzureBlobContainer, BlobManifest, local_etag, sync_container
+from app.rag.dedup import NearDuplicateIndex, format_source, merge_sources, mmr_select, simhash
+from app.rag.doc_types import build_where, classify_query, tag_document
+from utils.metrics import stage_timer
+
+# Parámetros de fragmentación: forman parte de la versión de los snapshots del índice
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+DOCS_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "docs")
+
+if TYPE_CHECKING:
+    from app.rag.embeddings_hugging_face import EmbeddingHuggingFaceService
 
 
 
@@ -16,8 +30,8 @@ class DocumentRetriever:
     """
     Retrieves relevant documents using ChromaDB vector store
     """
-    def __init__(self, embedding_service: EmbeddingHuggingFaceService, 
-                 collection_name: str = "ecomarketdocs"):
+    def __init__(self, embedding_service: "EmbeddingHuggingFaceService", 
+                 collection_name: str = "ecomarketdocs", index_on_init: bool = True):
         """
         Initialize the document retriever and populate collection with PDF contents
         Si prefiere usar la biblioteca Hugging Face Transformers, puede manejar manualmente 
@@ -26,16 +40,48 @@ class DocumentRetriever:
         Args:
             embedding_service: Service for generating embeddings
             collection_name: Name of the ChromaDB collection
+            index_on_init: Index the PDFs before returning; pass False to index later
+                (e.g. in a background task) while the partial index already serves queries
         """
         import os
         from glob import glob
         try:
             logger.info(f"Initializing document retriever with collection: {collection_name}")
             self.embedding_service = embedding_service
+            self.collection_name = collection_name
             settings = get_settings()
-            self.client = chromadb.Client()
-            self.collection = self.client.get_or_create_collection(collection_name)
-            self.load_and_index_pdfs()
+            if settings.vector_store_backend == "numpy":
+                # Sin SQLite ni hilos: se puede construir antes del fork de los workers
+                from app.rag.vector_store import NumpyCollection
+                self.client = None
+                self.collection = NumpyCollection(collection_name)
+            else:
+                import chromadb
+                self.client = chromadb.Client()
+                self.collection = self.client.get_or_create_collection(collection_name)
+            self._status_lock = threading.Lock()
+            self.index_status: Dict[str, Any] = {
+                "state": "pending", "files_total": 0, "files_indexed": 0, "chunks_indexed": 0,
+                "duplicates_skipped": 0, "error": None,
+            }
+            # Fragmentos casi idénticos (encabezados, pies de página, texto legal repetido) se indexan una sola vez
+            self._near_duplicates = NearDuplicateIndex(settings.dedup_max_distance) if settings.dedup_enabled else None
+            # Metadatos de cada fragmento indexado, para registrar duplicados y retirar documentos
+            self._chunk_metadata: Dict[str, Dict[str, Any]] = {}
+            self._fingerprints: Dict[str, int] = {}
+            # Snapshot cargado cuyos metadatos y huellas aún no se han volcado a las estructuras anteriores
+            self._unloaded_snapshot = None
+            # Serializa las escrituras al índice (indexar, reemplazar, retirar); las consultas no lo toman
+            self._write_lock = threading.RLock()
+            self.manifest = BlobManifest(settings.blob_manifest_path)
+            # Resultados recientes de retrieve(), invalidados con cada cambio del índice
+            self._retrieval_cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+            self._retrieval_cache_size = settings.retrieval_cache_size
+            self._index_generation = 0
+            self._cache_lock = threading.Lock()
+            self.retrieval_cache_stats = {"hits": 0, "misses": 0}
+            if index_on_init:
+                self.load_and_index_pdfs()
             # self.load_and_index_pdfs_from_blob(
             #     connection_string=settings.blob_storage_connection_string,
             #     container_name=settings.blob_container_name
@@ -53,121 +99,473 @@ class DocumentRetriever:
         import os
         from glob import glob
         from pypdf import PdfReader
-        from langchain_text_splitters import RecursiveCharacterTextSplitter
         try:
-            pdf_folder = docs_folder or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "docs")
+            pdf_folder = docs_folder or DOCS_FOLDER
             pdf_files = glob(os.path.join(pdf_folder, "*.pdf"))
             logger.info(f"Found {len(pdf_files)} PDF files in {pdf_folder}")
+            self._update_status(state="indexing", files_total=len(pdf_files))
             for pdf_path in pdf_files:
                 try:
                     reader = PdfReader(pdf_path)
                     text = "\n".join(page.extract_text() or "" for page in reader.pages)
-                    text_temp = text.replace("\n", " ").replace("\r", " ")
-                    if text_temp.strip():
-                        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-                        docs = text_splitter.create_documents([text])
-                        for idx, doc in enumerate(docs):
-                            chunk_text = doc.page_content if hasattr(doc, 'page_content') else str(doc)
-                            embedding = self.embedding_service.embed_text(chunk_text)
-                            self.collection.add(
-                                documents=[chunk_text],
-                                embeddings=[embedding.tolist()],
-                                metadatas=[{"filename": os.path.basename(pdf_path), "chunk": idx}],
-                                ids=[f"{os.path.splitext(os.path.basename(pdf_path))[0]}_chunk{idx}"]
-                            )
-                        logger.info(f"Indexed PDF in {len(docs)} chunks: {pdf_path}")
-                    else:
-                        logger.warning(f"No text extracted from: {pdf_path}")
+                    chunks = self._index_document(os.path.basename(pdf_path), text)
+                    self.manifest.record(os.path.basename(pdf_path), local_etag(pdf_path), chunks)
                 except Exception as pdf_err:
                     logger.error(f"Error processing PDF {pdf_path}: {pdf_err}")
+                self._update_status(files_indexed=1)
+            self._update_status(state="ready")
         except Exception as e:
             logger.error(f"Error loading and indexing PDFs: {str(e)}")
+            self._update_status(state="failed", error=str(e))
             raise
 
-    def load_and_index_pdfs_from_blob(self, connection_string: str, container_name: str):
+    def load_and_index_pdfs_from_blob(self, connection_string: str, container_name: str) -> Dict[str, int]:
         """
         Load and register PDF documents from Azure Blob Storage, splitting into chunks and indexing.
+        Runs the async ingestion in its own event loop; use ``aload_and_index_pdfs_from_blob`` from async code.
         """
-        from azure.storage.blob import BlobServiceClient
-        from tempfile import TemporaryDirectory
-        from pypdf import PdfReader
-        from langchain_text_splitters import RecursiveCharacterTextSplitter
-        import os
+        import asyncio
+        return asyncio.run(self.aload_and_index_pdfs_from_blob(connection_string, container_name))
+
+    async def aload_and_index_pdfs_from_blob(self, connection_string: str, container_name: str,
+                                             concurrency: int = None) -> Dict[str, int]:
+        """
+        Sync the index with an Azure Blob Storage (or Azurite) container
+
+        Blobs are downloaded concurrently into memory (no temp files) and
+        overlapped with parsing and embedding; blobs whose ETag is already in
+        the manifest are skipped, changed ones replace their chunks and deleted
+        ones are removed. See ``blob_ingestion.sync_container``.
+        """
+        container = AzureBlobContainer(connection_string, container_name)
         try:
-            blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-            container_client = blob_service_client.get_container_client(container_name)
-            blobs = container_client.list_blobs()
-            with TemporaryDirectory() as temp_dir:
-                pdf_files = []
-                for blob in blobs:
-                    if blob.name.lower().endswith('.pdf'):
-                        file_path = os.path.join(temp_dir, os.path.basename(blob.name))
-                        with open(file_path, "wb") as f:
-                            f.write(container_client.download_blob(blob.name).readall())
-                        pdf_files.append(file_path)
-                logger.info(f"Downloaded {len(pdf_files)} PDF files from Azure Blob Storage")
-                for pdf_path in pdf_files:
-                    try:
-                        reader = PdfReader(pdf_path)
-                        text = "\n".join(page.extract_text() or "" for page in reader.pages)
-                        text_temp = text.replace("\n", " ").replace("\r", " ")
-                        if text_temp.strip():
-                            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-                            docs = text_splitter.create_documents([text])
-                            for idx, doc in enumerate(docs):
-                                chunk_text = doc.page_content if hasattr(doc, 'page_content') else str(doc)
-                                embedding = self.embedding_service.embed_text(chunk_text)
-                                self.collection.add(
-                                    documents=[chunk_text],
-                                    embeddings=[embedding.tolist()],
-                                    metadatas=[{"filename": os.path.basename(pdf_path), "chunk": idx}],
-                                    ids=[f"{os.path.splitext(os.path.basename(pdf_path))[0]}_chunk{idx}"]
-                                )
-                            logger.info(f"Indexed PDF in {len(docs)} chunks: {pdf_path}")
-                        else:
-                            logger.warning(f"No text extracted from: {pdf_path}")
-                    except Exception as pdf_err:
-                        logger.error(f"Error processing PDF {pdf_path}: {pdf_err}")
+            return await sync_container(
+                self, container, self.manifest,
+                concurrency=concurrency or get_settings().blob_ingestion_concurrency,
+            )
         except Exception as e:
             logger.error(f"Error loading and indexing PDFs from blob: {str(e)}")
+            self._update_status(state="failed", error=str(e))
             raise
+        finally:
+            await container.close()
+
+    def index_pdf_bytes(self, filename: str, data: bytes, replace: bool = False) -> int:
+        """
+        Parse an in-memory PDF and index it
+
+        Args:
+            filename: Document name recorded in the chunk metadata
+            data: PDF file contents
+            replace: Swap out the chunks previously indexed for this document
+
+        Returns:
+            Number of chunks indexed
+        """
+        import io
+        from pypdf import PdfReader
+        reader = PdfReader(io.BytesIO(data))
+        text = "\n".join(page.extract_text() or "" for page in reader.pages)
+        return self._index_document(filename, text, replace=replace)
+
+    def remove_document(self, filename: str) -> int:
+        """
+        Remove a document's chunks from the index
+
+        A canonical chunk whose text also appears in other documents is kept
+        and re-attributed to its next source instead of being deleted, and the
+        document is dropped from the ``sources`` of every other chunk.
+
+        Returns:
+            Number of chunks deleted from the collection
+        """
+        with self._write_lock:
+            deleted, updated = self._plan_removal(filename)
+            self._apply_changes(deleted, updated, [])
+            self._update_status(chunks_indexed=-len(deleted))
+        logger.info(f"Removed {filename} from the index ({len(deleted)} chunks deleted, {len(updated)} re-attributed)")
+        return len(deleted)
 
-    async def retrieve(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    def _plan_removal(self, filename: str) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+        """
+        Drop a document from the bookkeeping (caller holds the write lock)
+
+        Returns:
+            Chunk ids to delete from the collection and new metadata of the chunks to update
+        """
+        self._ensure_bookkeeping()
+        prefix = f"{filename}#"
+        deleted, updated = [], {}
+        for chunk_id, metadata in self._chunk_metadata.items():
+            sources = [source for source in metadata["sources"].split(";") if source]
+            remaining = [source for source in sources if not source.startswith(prefix)]
+            if metadata["filename"] == filename and not remaining:
+                deleted.append(chunk_id)
+            elif len(remaining) != len(sources):
+                new_filename, new_chunk = remaining[0].rsplit("#", 1)
+                updated[chunk_id] = {
+                    **metadata, "filename": new_filename, "chunk": int(new_chunk),
+                    "sources": ";".join(remaining), "duplicates": len(remaining) - 1,
+                }
+        for chunk_id in deleted:
+            del self._chunk_metadata[chunk_id]
+            self._fingerprints.pop(chunk_id, None)
+        self._chunk_metadata.update(updated)
+        if self._near_duplicates is not None:
+            self._near_duplicates.remove(deleted)
+        return deleted, updated
+
+    def _apply_changes(self, deleted: List[str], updated: Dict[str, Dict[str, Any]], added: List[Dict[str, Any]]):
+        """
+        Write one document's changes to the collection
+
+        NumpyCollection applies them under a single lock, so a query sees either
+        the old or the new version of the document. ChromaDB has no
+        transactions: new chunks are added before the old ones are deleted, so
+        a query may briefly see both versions but never neither.
+
+        A chunk whose text did not change keeps its id (the id carries a hash
+        of the text), so it is neither deleted nor added again: only its
+        metadata is updated. With ChromaDB, adding an existing id is ignored
+        and the delete that follows would drop the chunk.
+        """
+        readded = set(deleted) & {chunk["id"] for chunk in added}
+        if readded:
+            deleted = [chunk_id for chunk_id in deleted if chunk_id not in readded]
+            updated = {**{chunk["id"]: chunk["metadata"] for chunk in added if chunk["id"] in readded}, **updated}
+            added = [chunk for chunk in added if chunk["id"] not in readded]
+        new_chunks = {
+            "ids": [chunk["id"] for chunk in added],
+            "documents": [chunk["text"] for chunk in added],
+            "embeddings": [chunk["embedding"] for chunk in added],
+            "metadatas": [chunk["metadata"] for chunk in added],
+        }
+        if hasattr(self.collection, "apply_changes"):
+            self.collection.apply_changes(delete_ids=deleted, updates=updated, **new_chunks)
+        else:
+            if added:
+                self.collection.add(**new_chunks)
+            if updated:
+                self.collection.update(ids=list(updated), metadatas=list(updated.values()))
+            if deleted:
+                self.collection.delete(ids=deleted)
+        self._invalidate_retrieval_cache()
+
+    def _invalidate_retrieval_cache(self):
+        with self._cache_lock:
+            self._index_generation += 1
+            self._retrieval_cache.clear()
+
+    @property
+    def index_generation(self) -> int:
+        """Counter bumped on every change of the index (writes and snapshot loads)"""
+        return self._index_generation
+
+    def existing_chunk_ids(self, ids: List[str]) -> set:
+        """The given chunk ids that are currently indexed"""
+        if not ids:
+            return set()
+        return set(self.collection.get(ids=list(dict.fromkeys(ids)), include=[])["ids"])
+
+    def _prepare_document(self, filename: str, text: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Split, tag, fingerprint and embed a document without touching the index
+
+        Runs outside the write lock, so the slow part of a re-index never
+        blocks other writers, and queries keep using the current chunks.
+        Chunks that already duplicate another document's chunk are not embedded.
+
+        Returns:
+            The document type and one record per chunk
+        """
+        import hashlib
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        doc_type = tag_document(filename, text)
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        docs = text_splitter.create_documents([text])
+        self._ensure_bookkeeping()
+        own = lambda chunk_id: self._chunk_metadata.get(chunk_id, {}).get("filename") == filename
+        chunks = []
+        for idx, doc in enumerate(docs):
+            chunk_text = doc.page_content if hasattr(doc, 'page_content') else str(doc)
+            fingerprint = simhash(chunk_text) if self._near_duplicates is not None else None
+            duplicate = fingerprint is not None and self._near_duplicates.find(fingerprint, exclude=own) is not None
+            chunks.append({
+                # El hash del texto evita choques con fragmentos conservados de una versión anterior del archivo
+                "id": f"{os.path.splitext(filename)[0]}_chunk{idx}_{hashlib.sha1(chunk_text.encode('utf-8')).hexdigest()[:8]}",
+                "index": idx,
+                "text": chunk_text,
+                "fingerprint": fingerprint,
+                "embedding": None if duplicate else self.embedding_service.embed_text(chunk_text).tolist(),
+            })
+        return doc_type, chunks
+
+    def _index_document(self, filename: str, text: str, replace: bool = False) -> int:
+        """
+        Split one document into chunks, embed them and add them to the collection
+
+        Every chunk carries ``filename``, ``chunk`` and the ``doc_type`` tag
+        assigned here, so searches can be filtered by them.
+
+        Near-duplicates of an already indexed chunk, within this document or
+        across documents, are not embedded again: their location is appended
+        to the canonical chunk's ``sources`` (``file.pdf#3;other.pdf#7``).
+
+        With ``replace``, the document's previous chunks are swapped for the
+        new ones in one step once the new ones are embedded.
+
+        Returns:
+            Number of chunks indexed
+        """
+        text_temp = text.replace("\n", " ").replace("\r", " ")
+        if not text_temp.strip():
+            logger.warning(f"No text extracted from: {filename}")
+            if replace:
+                self.remove_document(filename)
+            return 0
+        doc_type, chunks = self._prepare_document(filename, text)
+        with self._write_lock:
+            deleted, updated = self._plan_removal(filename) if replace else ([], {})
+            added, duplicates = [], 0
+            for chunk in chunks:
+                fingerprint = chunk["fingerprint"]
+                canonical_id = self._near_duplicates.find(fingerprint) if fingerprint is not None else None
+                if canonical_id is not None:
+                    updated[canonical_id] = self._add_source(canonical_id, format_source(filename, chunk["index"]))
+                    duplicates += 1
+                    continue
+                if chunk["embedding"] is None:
+                    # Duplicaba un fragmento que ya no existe: se calcula ahora
+                    chunk["embedding"] = self.embedding_service.embed_text(chunk["text"]).tolist()
+                chunk["metadata"] = {
+                    "filename": filename, "chunk": chunk["index"], "doc_type": doc_type,
+                    "sources": format_source(filename, chunk["index"]), "duplicates": 0,
+                }
+                added.append(chunk)
+                self._chunk_metadata[chunk["id"]] = chunk["metadata"]
+                if fingerprint is not None:
+                    self._near_duplicates.add(fingerprint, chunk["id"])
+                    self._fingerprints[chunk["id"]] = fingerprint
+            self._apply_changes(deleted, updated, added)
+            self._update_status(chunks_indexed=len(added) - len(deleted), duplicates_skipped=duplicates)
+        logger.info(f"Indexed {filename} ({doc_type}) in {len(added)} chunks ({duplicates} near-duplicates skipped)")
+        return len(added)
+
+    def _add_source(self, chunk_id: str, source: str) -> Dict[str, Any]:
+        """Record another place where the text of a canonical chunk appears (caller holds the write lock)"""
+        metadata = dict(self._chunk_metadata[chunk_id])
+        metadata["sources"] = merge_sources(metadata["sources"], [source])
+        metadata["duplicates"] += 1
+        self._chunk_metadata[chunk_id] = metadata
+        return metadata
+
+    def snapshot_version(self) -> Dict[str, Any]:
+        """Version of this index's content: embedding model, chunking and dedup parameters"""
+        from app.rag.snapshot import snapshot_version
+        service = self.embedding_service
+        model = getattr(service, "model_name", None) or f"{type(service).__name__}:{getattr(service, 'embedding_dim', '')}"
+        return snapshot_version(
+            embedding_model=model, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+            dedup_max_distance=self._near_duplicates.max_distance if self._near_duplicates is not None else None,
+        )
+
+    def save_snapshot(self, root: str) -> str:
+        """
+        Write the current index as a memory-mappable snapshot (see app.rag.snapshot)
+
+        Returns:
+            The snapshot directory
+        """
+        from app.rag.snapshot import write_snapshot
+        with self._write_lock:
+            self._ensure_bookkeeping()
+            content = self.collection.get(include=["documents", "metadatas", "embeddings"])
+            fingerprints = [self._fingerprints.get(chunk_id, 0) for chunk_id in content["ids"]]
+            documents_manifest = {name: {"etag": self.manifest.etag(name), "chunks": self.manifest.chunks(name)}
+                                  for name in self.manifest.names()}
+        return write_snapshot(
+            root, self.snapshot_version(), content["ids"], content["documents"], content["metadatas"],
+            content["embeddings"], fingerprints, documents_manifest,
+        )
+
+    def load_snapshot(self, root: str) -> bool:
+        """
+        Serve from a snapshot written for the same version instead of re-indexing
+
+        The collection becomes a NumpyCollection over the mapped files, and the
+        dedup index and the ETag manifest are restored, so the corpus watcher
+        only re-indexes documents that changed after the snapshot was written.
+
+        Returns:
+            False when there is no snapshot for this version (the caller indexes normally)
+        """
+        from app.rag.snapshot import open_snapshot
+        from app.rag.vector_store import NumpyCollection
+        snapshot = open_snapshot(root, self.snapshot_version())
+        if snapshot is None:
+            return False
+        with self._write_lock:
+            self.client = None
+            self.collection = NumpyCollection.from_snapshot(self.collection_name, snapshot)
+            self._invalidate_retrieval_cache()
+            self._chunk_metadata, self._fingerprints = {}, {}
+            self._unloaded_snapshot = snapshot
+            for name, entry in snapshot.blob_manifest.items():
+                self.manifest.record(name, entry["etag"], entry.get("chunks", 0))
+            files = len(snapshot.blob_manifest)
+            self._update_status(state="ready", files_total=files, files_done=files, chunks_indexed=len(snapshot.ids))
+        return True
+
+    def _ensure_bookkeeping(self):
+        """Load chunk metadata and the dedup index from a loaded snapshot before the first write"""
+        with self._write_lock:
+            snapshot, self._unloaded_snapshot = self._unloaded_snapshot, None
+            if snapshot is None:
+                return
+            self._chunk_metadata = dict(zip(snapshot.ids, (dict(metadata) for metadata in snapshot.metadatas)))
+            for chunk_id, fingerprint in zip(snapshot.ids, snapshot.fingerprints.tolist()):
+                if fingerprint and self._near_duplicates is not None:
+                    self._near_duplicates.add(fingerprint, chunk_id)
+                    self._fingerprints[chunk_id] = fingerprint
+
+    def _update_status(self, state: str = None, error: str = None, files_total: int = None,
+                       files_indexed: int = 0, chunks_indexed: int = 0, duplicates_skipped: int = 0,
+                       files_done: int = None):
+        """Record indexing progress: counters are increments, state, totals and files_done are replaced"""
+        with self._status_lock:
+            if files_done is not None:
+                self.index_status["files_indexed"] = files_done
+            if state is not None:
+                self.index_status["state"] = state
+            if error is not None:
+                self.index_status["error"] = error
+            if files_total is not None:
+                self.index_status["files_total"] = files_total
+            self.index_status["files_indexed"] += files_indexed
+            self.index_status["chunks_indexed"] += chunks_indexed
+            self.index_status["duplicates_skipped"] += duplicates_skipped
+
+    def get_index_status(self) -> Dict[str, Any]:
+        """Snapshot of the indexing progress"""
+        with self._status_lock:
+            return dict(self.index_status)
+
+    @property
+    def is_ready(self) -> bool:
+        """True once every document has been indexed"""
+        return self.index_status["state"] == "ready"
+
+    @property
+    def has_documents(self) -> bool:
+        """True as soon as at least one chunk is searchable (the index may still be partial)"""
+        return self.index_status["chunks_indexed"] > 0
+
+    async def retrieve(self, query: str, top_k: int = 3, filters: Optional[Dict[str, Any]] = None,
+                       query_embedding=None) -> List[Dict[str, Any]]:
         """
         Retrieve relevant documents for a query
         
         Args:
             query: Search query
             top_k: Number of documents to retrieve
+            filters: Metadata filters (``{"doc_type": ["policy", "faq"]}``,
+                ``{"filename": "..."}``) applied inside the vector search
+            query_embedding: Embedding of ``query`` when the caller already computed it
             
         Returns:
-            List of relevant documents with metadata
+            List of relevant documents: chunk id, content, metadata and distance
         """
         try:
-            logger.info(f"Retrieving documents for query: {query[:50]}...")
-            
-            
-            # Generate query embedding
-            query_embedding = self.embedding_service.embed_text(query)
-            
-            # Search in vector store
-            results = self.collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=top_k
-            )
-            
-            documents = []
-            if results['documents']:
-                for i, doc in enumerate(results['documents'][0]):
-                    documents.append({
-                        'content': doc,
-                        'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                        'distance': results['distances'][0][i] if results['distances'] else 0.0
-                    })
-            
-            logger.info(f"Retrieved {len(documents)} documents")
-            return documents
+            logger.debug("Retrieving documents for query: {}...", query[:50])
+            cache_key = (" ".join(query.lower().split()), top_k, json.dumps(filters, sort_keys=True, default=str))
+            with self._cache_lock:
+                generation = self._index_generation
+                cached = self._retrieval_cache.get(cache_key)
+                if cached is not None:
+                    self._retrieval_cache.move_to_end(cache_key)
+                    self.retrieval_cache_stats["hits"] += 1
+                    return list(cached)
+                self.retrieval_cache_stats["misses"] += 1
+
+            # Embedding, búsqueda vectorial y MMR son CPU/I/O bloqueante: en un hilo, para que el event loop
+            # atienda otras peticiones y las etapas paralelas de /query (orden, devoluciones) avancen a la vez
+            documents = await asyncio.to_thread(self._search_index, query, top_k, filters, query_embedding)
+
+            logger.debug("Retrieved {} documents", len(documents))
+            with self._cache_lock:
+                # Un cambio del índice durante la búsqueda deja el resultado sin guardar
+                if self._retrieval_cache_size > 0 and generation == self._index_generation:
+                    self._retrieval_cache[cache_key] = documents
+                    while len(self._retrieval_cache) > self._retrieval_cache_size:
+                        self._retrieval_cache.popitem(last=False)
+            return list(documents)
             
         except Exception as e:
             logger.error(f"Error retrieving documents: {str(e)}")
             raise
+
+    def _search_index(self, query: str, top_k: int, filters: Optional[Dict[str, Any]],
+                      query_embedding=None) -> List[Dict[str, Any]]:
+        """Embed the query (unless given) and run the vector search and MMR selection (blocking)"""
+        # Generate query embedding
+        if query_embedding is None:
+            with stage_timer("retrieval", "query_embedding"):
+                query_embedding = self.embedding_service.embed_text(query)
+        
+        # Search in vector store; with MMR, fetch extra candidates to diversify
+        settings = get_settings()
+        use_mmr = top_k > 1 and settings.retrieval_mmr_lambda < 1.0 and settings.retrieval_mmr_fetch_factor > 1
+        with stage_timer("retrieval", "vector_search"):
+            where = build_where(filters)
+            results = self.collection.query(
+                query_embeddings=[query_embedding.tolist()],
+                n_results=top_k * settings.retrieval_mmr_fetch_factor if use_mmr else top_k,
+                **({"where": where} if where else {}),
+                **({"include": ["documents", "metadatas", "distances", "embeddings"]} if use_mmr else {})
+            )
+        
+        documents = []
+        if results['documents']:
+            positions = range(len(results['documents'][0]))
+            if use_mmr and results.get('embeddings') is not None and len(results['documents'][0]) > top_k:
+                with stage_timer("retrieval", "mmr"):
+                    positions = mmr_select(query_embedding, results['embeddings'][0], top_k,
+                                           settings.retrieval_mmr_lambda)
+            for i in positions:
+                documents.append({
+                    'id': results['ids'][0][i] if results.get('ids') else None,
+                    'content': results['documents'][0][i],
+                    'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
+                    'distance': results['distances'][0][i] if results['distances'] else 0.0
+                })
+        return documents
+
+    async def search(self, query: str, top_k: int = 3, filters: Optional[Dict[str, Any]] = None,
+                     auto_filter: Optional[bool] = None, classify_text: Optional[str] = None,
+                     query_embedding=None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Retrieve documents with explicit filters, or with the ones the query classifier picks
+
+        An automatically chosen filter that matches nothing falls back to an
+        unfiltered search, so a misclassified question still gets context.
+
+        Args:
+            query: Search query
+            top_k: Number of documents to retrieve
+            filters: Explicit metadata filters; they disable the classifier
+            auto_filter: Let the classifier choose filters (default: settings.retrieval_auto_filter)
+            classify_text: Text to classify instead of ``query`` (e.g. the user's raw question)
+            query_embedding: Embedding of ``query`` when the caller already computed it
+
+        Returns:
+            The documents and the filters actually applied (None for an unfiltered search)
+        """
+        applied = filters
+        if applied is None and (get_settings().retrieval_auto_filter if auto_filter is None else auto_filter):
+            applied = classify_query(classify_text or query)
+        documents = await self.retrieve(query, top_k=top_k, filters=applied, query_embedding=query_embedding)
+        if not documents and applied and filters is None:
+            logger.debug("Auto filter {} matched no documents, searching the whole index", applied)
+            applied = None
+            documents = await self.retrieve(query, top_k=top_k, query_embedding=query_embedding)
+        return documents, applied
@@ -0,0 +1,277 @@
+"""
+RAG Services Module
+Process-wide, lazily built embedding service, retriever and generator shared by
+the FastAPI app and the Gradio front, plus a background warm-up that indexes
+the documents while the (partial) index already serves queries, and the
+pre-built FAQ answers served before retrieval
+"""
+
+import threading
+from typing import Any, Dict, Optional
+from loguru import logger
+
+# Un lock por servicio: indexar documentos no debe bloquear la creación del generador
+_embedding_lock = threading.Lock()
+_retriever_lock = threading.Lock()
+_generator_lock = threading.Lock()
+_warm_up_lock = threading.Lock()
+_index_lock = threading.Lock()
+_faq_lock = threading.Lock()
+_faq_refresh_lock = threading.Lock()
+_watcher_lock = threading.Lock()
+_embedding_service = None
+_retriever = None
+_generator = None
+_corpus_watcher = None
+_warm_up_thread: Optional[threading.Thread] = None
+
+
+def get_embedding_service():
+    """Get the shared embedding service (the model itself loads on first use)"""
+    global _embedding_service
+    if _embedding_service is None:
+        with _embedding_lock:
+            if _embedding_service is None:
+                from app.config.settings import get_settings
+                if get_settings().embedding_backend == "hashing":
+                    from app.rag.embeddings import HashingEmbeddingService
+                    _embedding_service = HashingEmbeddingService()
+                else:
+                    from app.rag.embeddings import EmbeddingService
+                    _embedding_service = EmbeddingService()
+    return _embedding_service
+
+
+def get_retriever():
+    """Get the shared document retriever; its documents are indexed by warm_up"""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                from app.rag.retriever import DocumentRetriever
+                _retriever = DocumentRetriever(get_embedding_service(), index_on_init=False)
+    return _retriever
+
+
+def get_generator():
+    """Get the shared response generator"""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                from app.rag.generator import ResponseGenerator
+                _generator = ResponseGenerator()
+    return _generator
+
+
+def is_retrieval_ready() -> bool:
+    """True once every document is indexed"""
+    return _retriever is not None and _retriever.is_ready
+
+
+def has_searchable_index() -> bool:
+    """True as soon as the (possibly partial) index can answer queries"""
+    return _retriever is not None and _retriever.has_documents
+
+
+def retrieval_status() -> Dict[str, Any]:
+    """Indexing progress of the shared retriever"""
+    if _retriever is None:
+        return {"state": "pending", "files_total": 0, "files_indexed": 0, "chunks_indexed": 0,
+                "duplicates_skipped": 0, "error": None}
+    return _retriever.get_index_status()
+
+
+def build_index(use_snapshot: bool = True):
+    """
+    Load the embedding model and index the documents, once per process
+
+    With INDEX_SNAPSHOT_PATH set, a snapshot of the same version is opened
+    instead of indexing (milliseconds, memory-mapped); otherwise the documents
+    are indexed and a snapshot is written for the next start.
+    """
+    get_embedding_service().warm_up()
+    retriever = get_retriever()
+    with _index_lock:
+        if retriever.get_index_status()["state"] == "pending":
+            from app.config.settings import get_settings
+            settings = get_settings()
+            snapshot_path = settings.index_snapshot_path
+            if use_snapshot and snapshot_path and retriever.load_snapshot(snapshot_path):
+                return retriever
+            if settings.docs_source == "blob":
+                retriever.load_and_index_pdfs_from_blob(
+                    connection_string=settings.blob_storage_connection_string,
+                    container_name=settings.blob_container_name
+                )
+            else:
+                retriever.load_and_index_pdfs()
+            if snapshot_path:
+                try:
+                    retriever.save_snapshot(snapshot_path)
+                except Exception as e:
+                    logger.error(f"Error writing the index snapshot: {str(e)}")
+    return retriever
+
+
+def create_corpus_watcher():
+    """
+    Watcher that hot-reloads the documents source into the shared retriever
+
+    There is one watcher per process: FastAPI and Gradio share the retriever
+    when ``main.py`` runs both, and two watchers would re-index every change
+    twice, concurrently. Only the first caller gets the watcher and runs it;
+    later callers (and DOCS_WATCH_INTERVAL=0) get None. See get_corpus_watcher.
+    """
+    global _corpus_watcher
+    from app.config.settings import get_settings
+    settings = get_settings()
+    if settings.docs_watch_interval <= 0:
+        return None
+    with _watcher_lock:
+        if _corpus_watcher is not None:
+            return None
+        _corpus_watcher = _build_corpus_watcher(settings)
+    return _corpus_watcher
+
+
+def get_corpus_watcher():
+    """The process' corpus watcher, whoever runs it (None until one is created)"""
+    return _corpus_watcher
+
+
+def _build_corpus_watcher(settings):
+    from app.rag.blob_ingestion import AzureBlobContainer, LocalFolderContainer
+    from app.rag.watcher import CorpusWatcher
+    if settings.docs_source == "blob":
+        container = AzureBlobContainer(settings.blob_storage_connection_string, settings.blob_container_name)
+    else:
+        from app.rag.retriever import DOCS_FOLDER
+        container = LocalFolderContainer(DOCS_FOLDER)
+    retriever = get_retriever()
+
+    def on_change():
+        # Tras cada recarga con cambios se reescribe el snapshot, para que el próximo arranque no re-indexe
+        if settings.index_snapshot_path:
+            retriever.save_snapshot(settings.index_snapshot_path)
+
+    # Y se regeneran las respuestas de la FAQ cuyos fragmentos cambiaron, en el loop del watcher
+    return CorpusWatcher(retriever, container, settings.docs_watch_interval,
+                         concurrency=settings.blob_ingestion_concurrency, on_change=on_change,
+                         after_change=refresh_faq_store)
+
+
+def load_faq_store():
+    """
+    Load the pre-built FAQ answers (FAQ_STORE_PATH) for the current index
+
+    The answers whose chunks changed since the store was built are stale until
+    refresh_faq_store runs (warm_up's callers await it on their event loop).
+    """
+    from app.rag.faq_store import get_faq_store, store_version
+    store = get_faq_store()
+    if store is None:
+        return None
+    with _faq_lock:
+        if store.version is not None:
+            return store
+        if not store.load(store_version(get_retriever())):
+            logger.info("No FAQ store for the current index, build it with: python -m app.rag.faq_store")
+    return store
+
+
+async def refresh_faq_store():
+    """
+    Regenerate the FAQ answers whose retrieved chunks changed
+
+    Runs on the caller's event loop, the one that owns the shared generator's
+    clients. Refreshes are serialized (FastAPI and Gradio both refresh after
+    warm-up, the watcher after each change); the lock is taken in a thread so
+    a waiting refresh does not block the loop.
+    """
+    from app.rag.faq_store import get_faq_store
+    store = get_faq_store()
+    if store is None or not store.entries:
+        return
+    import asyncio
+    await asyncio.to_thread(_faq_refresh_lock.acquire)
+    try:
+        await store.refresh(get_retriever(), get_generator())
+    except Exception as e:
+        logger.error(f"Error refreshing the FAQ store: {str(e)}")
+    finally:
+        _faq_refresh_lock.release()
+
+
+def faq_lookup(question: str, source: str = "query", text: Optional[str] = None):
+    """
+    Pre-built FAQ entry for a question that closely matches a canonical one
+
+    Blocking (embeds the question and scans the store): call it with
+    ``asyncio.to_thread`` from async code.
+
+    Args:
+        question: The user's question as typed (order-specific questions are never matched)
+        source: Caller, for stats and metrics ("query" or "chat")
+        text: Text to embed instead of ``question`` (e.g. the retrieval query), so retrieval can reuse it
+
+    Returns:
+        The entry or None, and the embedding that was computed (None when the store was not consulted)
+    """
+    from app.rag.faq_store import get_faq_store
+    store = get_faq_store()
+    if store is None or not has_searchable_index():
+        return None, None
+    # Sin entradas o con código de orden no se consulta el store: no se calcula el embedding
+    embedding = _retriever.embedding_service.embed_text(text or question) if store.accepts(question) else None
+    return store.lookup(question, _retriever, source=source, embedding=embedding), embedding
+
+
+def faq_chat_answer(message: str):
+    """Pre-built FAQ answer for a chat turn, or None (``faq_provider`` of ChatSessionManager; blocking)"""
+    entry, _ = faq_lookup(message, source="chat")
+    return entry.answer if entry is not None else None
+
+
+def warm_up():
+    """Load the embedding model, build the generator, index the documents and load the FAQ store (once per process)"""
+    logger.info("Warming up RAG services...")
+    get_embedding_service().warm_up()
+    get_generator()
+    build_index()
+    try:
+        load_faq_store()
+    except Exception as e:
+        logger.error(f"Error loading the FAQ store: {str(e)}")
+    logger.info("RAG services ready")
+
+
+async def serve(watcher=None):
+    """Refresh the FAQ answers, then run the corpus watcher (if any) on the current loop"""
+    await refresh_faq_store()
+    if watcher is not None:
+        await watcher.run()
+
+
+def start_background_warm_up() -> threading.Thread:
+    """
+    Run warm_up in a daemon thread once per process, so startup is not blocked;
+    the thread then keeps the corpus hot-reloaded (see create_corpus_watcher)
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            def run():
+                try:
+                    warm_up()
+                except Exception as e:
+                    logger.error(f"Error warming up RAG services: {str(e)}")
+                    return
+                # Con el índice listo, el mismo hilo regenera la FAQ y queda revisando el corpus (recarga en caliente),
+                # todo en un único event loop
+                import asyncio
+                asyncio.run(serve(create_corpus_watcher()))
+
+            _warm_up_thread = threading.Thread(target=run, name="rag-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
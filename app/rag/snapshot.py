@@ -0,0 +1,201 @@
+"""
+Index Snapshot Module
+Versioned on-disk snapshots of the vector index that a process opens
+read-only in milliseconds: the embedding matrix and its norms are .npy files
+memory-mapped without copying, and chunk text plus metadata live in one
+offset-indexed binary file whose texts are only read when a result needs them
+
+Each version has a pointer file ``<root>/<version key>.current`` naming its
+latest generation directory ``<root>/<version key>-<timestamp>/``:
+    manifest.json     version, chunk count, dimension and the blob ETag manifest
+    embeddings.npy    float32 (n, dim)
+    norms.npy         float32 (n,)  squared L2 norms
+    fingerprints.npy  uint64 (n,)   SimHash of each chunk (0 when dedup is off)
+    ids.json          chunk ids, in row order
+    offsets.npy       int64 (n, 3)  start, metadata length and text length of each record
+    chunks.bin        records: metadata JSON followed by the UTF-8 text
+
+Usage (build the snapshot offline, e.g. in the image build):
+    python -m app.rag.snapshot
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import numpy as np
+from loguru import logger
+
+FORMAT_VERSION = 1
+
+
+def snapshot_version(embedding_model: str, chunk_size: int, chunk_overlap: int,
+                     dedup_max_distance: Optional[int]) -> Dict[str, Any]:
+    """Everything that changes the content of an index: a snapshot is reused only if all of it matches"""
+    return {
+        "format": FORMAT_VERSION,
+        "embedding_model": embedding_model,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "dedup_max_distance": dedup_max_distance,
+    }
+
+
+def version_key(version: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(version, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+class SnapshotTexts:
+    """Read-only sequence of chunk texts decoded from the mapped file on access"""
+
+    def __init__(self, data: mmap.mmap, offsets: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, position: int) -> str:
+        start, metadata_length, text_length = (int(value) for value in self._offsets[position])
+        start += metadata_length
+        return self._data[start:start + text_length].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(len(self)):
+            yield self[position]
+
+
+class SnapshotMetadatas(SnapshotTexts):
+    """Read-only sequence of chunk metadata, each decoded on first access and then cached"""
+
+    def __init__(self, data: mmap.mmap, offsets: np.ndarray):
+        super().__init__(data, offsets)
+        self._decoded: List[Optional[Dict[str, Any]]] = [None] * len(offsets)
+
+    def __getitem__(self, position: int) -> Dict[str, Any]:
+        metadata = self._decoded[position]
+        if metadata is None:
+            start, metadata_length, _ = (int(value) for value in self._offsets[position])
+            metadata = self._decoded[position] = json.loads(self._data[start:start + metadata_length])
+        return metadata
+
+
+class IndexSnapshot:
+    """An opened snapshot: mapped arrays, the chunk ids, and lazily decoded texts and metadata"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        self.embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        self.norms = np.load(os.path.join(directory, "norms.npy"), mmap_mode="r")
+        self.fingerprints = np.load(os.path.join(directory, "fingerprints.npy"), mmap_mode="r")
+        offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "chunks.bin"), "rb") as f:
+            # Un archivo vacío no se puede mapear
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        with open(os.path.join(directory, "ids.json"), encoding="utf-8") as f:
+            self.ids: List[str] = json.load(f)
+        self.texts = SnapshotTexts(self._data, offsets)
+        self.metadatas = SnapshotMetadatas(self._data, offsets)
+
+    @property
+    def blob_manifest(self) -> Dict[str, Dict[str, Any]]:
+        return self.manifest.get("documents", {})
+
+
+def _pointer_path(root: str, version: Dict[str, Any]) -> str:
+    return os.path.join(root, f"{version_key(version)}.current")
+
+
+def open_snapshot(root: str, version: Dict[str, Any]) -> Optional[IndexSnapshot]:
+    """Open the latest snapshot written for this exact version, or None if there is none"""
+    try:
+        with open(_pointer_path(root, version), encoding="utf-8") as f:
+            directory = os.path.join(root, f.read().strip())
+    except FileNotFoundError:
+        return None
+    if not os.path.exists(os.path.join(directory, "manifest.json")):
+        return None
+    started = time.perf_counter()
+    snapshot = IndexSnapshot(directory)
+    if snapshot.manifest.get("version") != version:
+        logger.warning(f"Index snapshot {directory} does not match the current version, ignoring it")
+        return None
+    logger.info(f"Opened index snapshot {directory} ({len(snapshot.ids)} chunks) "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return snapshot
+
+
+def write_snapshot(root: str, version: Dict[str, Any], ids: Sequence[str], documents: Sequence[str],
+                   metadatas: Sequence[Dict[str, Any]], embeddings, fingerprints: Sequence[int],
+                   documents_manifest: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Write a new generation of the snapshot and publish it atomically
+
+    The files go into a fresh generation directory and the version's pointer
+    file is swapped with ``os.replace`` only once they are complete, so a
+    reader never opens a half-written snapshot. Older generations are then
+    deleted; processes that still map them keep reading the unlinked files.
+
+    Returns:
+        The snapshot directory
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    embeddings = np.ascontiguousarray(embeddings.reshape(len(ids), -1) if len(ids) else np.zeros((0, 0), np.float32))
+    key = version_key(version)
+    generation = f"{key}-{time.time_ns()}"
+    directory = os.path.join(root, generation)
+    os.makedirs(directory)
+    np.save(os.path.join(directory, "embeddings.npy"), embeddings)
+    np.save(os.path.join(directory, "norms.npy"), np.einsum("ij,ij->i", embeddings, embeddings))
+    np.save(os.path.join(directory, "fingerprints.npy"), np.asarray(fingerprints, dtype=np.uint64))
+    offsets = np.zeros((len(ids), 3), dtype=np.int64)
+    with open(os.path.join(directory, "chunks.bin"), "wb") as f:
+        position = 0
+        for i, (text, metadata) in enumerate(zip(documents, metadatas)):
+            metadata_bytes = json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+            text_bytes = text.encode("utf-8")
+            f.write(metadata_bytes)
+            f.write(text_bytes)
+            offsets[i] = (position, len(metadata_bytes), len(text_bytes))
+            position += len(metadata_bytes) + len(text_bytes)
+    np.save(os.path.join(directory, "offsets.npy"), offsets)
+    with open(os.path.join(directory, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(list(ids), f, ensure_ascii=False)
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version, "count": len(ids), "dim": int(embeddings.shape[1]) if len(ids) else 0,
+            "created_at": time.time(), "documents": documents_manifest,
+        }, f, ensure_ascii=False, indent=2)
+
+    pointer = _pointer_path(root, version)
+    with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(f"{pointer}.tmp", pointer)
+    for entry in os.listdir(root):
+        if entry.startswith(f"{key}-") and entry != generation:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    logger.info(f"Wrote index snapshot {directory} ({len(ids)} chunks)")
+    return directory
+
+
+def main() -> int:
+    """Build the index from the configured documents source and write its snapshot"""
+    from app.config.settings import get_settings
+    from app.rag import services as rag_services
+    settings = get_settings()
+    if not settings.index_snapshot_path:
+        raise SystemExit("INDEX_SNAPSHOT_PATH is not set")
+    # El snapshot se abre siempre como índice numpy: se construye con el mismo backend
+    settings.vector_store_backend = "numpy"
+    retriever = rag_services.build_index(use_snapshot=False)
+    print(retriever.save_snapshot(settings.index_snapshot_path))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
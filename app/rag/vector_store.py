@@ -0,0 +1,263 @@
+"""
+Vector Store Module
+In-memory numpy vector collection exposing the subset of the ChromaDB collection
+API used by DocumentRetriever (add / count / query)
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+
+_OPERATORS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a ChromaDB-style ``where`` clause against one metadata dict
+
+    Supports field equality, ``$eq``, ``$ne``, ``$in``, ``$nin``, ``$gt``,
+    ``$gte``, ``$lt``, ``$lte`` and the ``$and`` / ``$or`` combinators.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not _OPERATORS[operator](value, operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyCollection:
+    """
+    Brute-force vector collection backed by a contiguous float32 matrix.
+
+    Unlike the ChromaDB in-memory client it holds no SQLite connection and
+    starts no threads, so it is safe to build before a pre-fork server forks
+    its workers: once indexing is done the matrix is only read, and the workers
+    share its pages copy-on-write. Distances are squared L2, as ChromaDB's
+    default space.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize an empty collection
+
+        Args:
+            name: Collection name (informational)
+        """
+        self.name = name
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self._pending: List[np.ndarray] = []
+        # Filas que cumple cada filtro, válidas mientras la colección no cambie
+        self._where_rows: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_snapshot(cls, name: str, snapshot) -> "NumpyCollection":
+        """
+        Collection backed by an opened ``IndexSnapshot`` without copying it
+
+        The matrix and norms stay memory-mapped, texts are decoded only for
+        returned results and metadata on first use (a filtered query decodes
+        all of it once). Writes (hot reload) copy what they touch into memory.
+        """
+        collection = cls(name)
+        if len(snapshot.ids):
+            collection._matrix, collection._norms = snapshot.embeddings, snapshot.norms
+        collection._ids = list(snapshot.ids)
+        collection._documents = snapshot.texts
+        collection._metadatas = snapshot.metadatas
+        collection._positions = {chunk_id: i for i, chunk_id in enumerate(collection._ids)}
+        return collection
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None, **kwargs) -> Dict[str, list]:
+        """Entries by id (all of them by default), ChromaDB-shaped"""
+        matrix, _, all_ids, documents, metadatas, size = self._snapshot()
+        positions = range(size) if ids is None else [self._positions[i] for i in ids if i in self._positions]
+        result = {
+            "ids": [all_ids[i] for i in positions],
+            "documents": [documents[i] for i in positions],
+            "metadatas": [metadatas[i] for i in positions],
+        }
+        if include and "embeddings" in include:
+            result["embeddings"] = matrix[list(positions)] if matrix is not None else np.zeros((0, 0), np.float32)
+        return result
+
+    def add(self, documents: List[str], embeddings: List[List[float]],
+            metadatas: Optional[List[Dict[str, Any]]] = None, ids: Optional[List[str]] = None):
+        """Append documents with their embeddings"""
+        with self._lock:
+            self._add(documents, embeddings, metadatas, ids)
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]], **kwargs):
+        """Merge new metadata values into existing entries (unknown ids are ignored)"""
+        with self._lock:
+            self._update(ids, metadatas)
+
+    def delete(self, ids: List[str], **kwargs):
+        """Remove entries by id (unknown ids are ignored)"""
+        with self._lock:
+            self._delete(ids)
+
+    def apply_changes(self, delete_ids: List[str], updates: Dict[str, Dict[str, Any]], ids: List[str],
+                      documents: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]):
+        """
+        Delete, update and add entries as one atomic step
+
+        Queries take a snapshot under the same lock, so they see the collection
+        entirely before or entirely after the change (e.g. a re-indexed document
+        is never missing nor present twice).
+        """
+        with self._lock:
+            if updates:
+                self._update(list(updates), list(updates.values()))
+            if delete_ids:
+                self._delete(delete_ids)
+            if documents:
+                self._add(documents, embeddings, metadatas, ids)
+
+    def _materialize(self):
+        """Copy snapshot-backed texts and metadata into lists before the first write"""
+        if not isinstance(self._documents, list):
+            self._documents = list(self._documents)
+        if not isinstance(self._metadatas, list):
+            self._metadatas = [dict(metadata) for metadata in self._metadatas]
+
+    def _add(self, documents, embeddings, metadatas, ids):
+        self._materialize()
+        rows = np.asarray(embeddings, dtype=np.float32)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        start = len(self._ids)
+        new_ids = ids or [str(start + i) for i in range(len(documents))]
+        self._positions.update((chunk_id, start + i) for i, chunk_id in enumerate(new_ids))
+        self._ids.extend(new_ids)
+        self._documents.extend(documents)
+        self._metadatas.extend(metadatas or [{} for _ in documents])
+        self._pending.append(rows)
+
+    def _update(self, ids, metadatas):
+        self._materialize()
+        for chunk_id, metadata in zip(ids, metadatas):
+            position = self._positions.get(chunk_id)
+            if position is not None:
+                self._metadatas[position] = {**self._metadatas[position], **metadata}
+        self._where_rows.clear()
+
+    def _delete(self, ids):
+        self._fold_pending()
+        self._materialize()
+        removed = {self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions}
+        if not removed:
+            return
+        keep = [i for i in range(len(self._ids)) if i not in removed]
+        self._ids = [self._ids[i] for i in keep]
+        self._documents = [self._documents[i] for i in keep]
+        self._metadatas = [self._metadatas[i] for i in keep]
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+        # Matrices nuevas en lugar de modificar in situ: las consultas en curso conservan su snapshot
+        self._matrix = self._matrix[keep] if keep else None
+        self._norms = self._norms[keep] if keep else None
+        self._where_rows.clear()
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def _fold_pending(self):
+        """Append pending rows to the matrix (caller holds the lock)"""
+        if self._pending:
+            blocks = ([self._matrix] if self._matrix is not None else []) + self._pending
+            self._matrix = np.ascontiguousarray(np.vstack(blocks), dtype=np.float32)
+            self._norms = np.einsum("ij,ij->i", self._matrix, self._matrix)
+            self._pending = []
+
+    def _snapshot(self):
+        """
+        Fold pending rows into the matrix; returns (matrix, norms, ids, documents,
+        metadatas, size) consistent with each other: later adds only append past
+        ``size`` and deletes replace the lists instead of mutating them
+        """
+        with self._lock:
+            self._fold_pending()
+            return self._matrix, self._norms, self._ids, self._documents, self._metadatas, len(self._ids)
+
+    def _rows_matching(self, where: Dict[str, Any], metadatas: List[Dict[str, Any]], size: int) -> np.ndarray:
+        """Indices of the first ``size`` rows of a snapshot whose metadata satisfy ``where``"""
+        key = json.dumps(where, sort_keys=True, default=str)
+        cached = self._where_rows.get(key)
+        if cached is not None and cached[0] is metadatas and cached[1] == size:
+            return cached[2]
+        rows = np.fromiter(
+            (i for i in range(size) if matches_where(metadatas[i], where)), dtype=np.int64
+        )
+        self._where_rows[key] = (metadatas, size, rows)
+        return rows
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, include: Optional[List[str]] = None,
+              **kwargs) -> Dict[str, list]:
+        """
+        Nearest neighbours of each query embedding
+
+        With ``where``, only the rows whose metadata match are scored, so the
+        filter narrows the search instead of trimming its results.
+
+        Returns:
+            ChromaDB-shaped result: lists of ids, documents, metadatas and distances per query
+            (and embeddings when ``include`` asks for them)
+        """
+        result: Dict[str, list] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if include and "embeddings" in include:
+            result["embeddings"] = []
+        matrix, norms, ids, documents, metadatas, size = self._snapshot()
+        rows = self._rows_matching(where, metadatas, size) if where and matrix is not None else None
+        if rows is not None:
+            matrix, norms, size = matrix[rows], norms[rows], len(rows)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        for query in queries:
+            if matrix is None or size == 0:
+                for key in result:
+                    result[key].append([])
+                continue
+            distances = norms - 2.0 * (matrix @ query) + float(query @ query)
+            k = min(n_results, size)
+            top = np.argpartition(distances, k - 1)[:k] if k < size else np.arange(size)
+            top = top[np.argsort(distances[top], kind="stable")]
+            distances_top = distances[top]
+            if "embeddings" in result:
+                result["embeddings"].append(matrix[top])
+            if rows is not None:
+                top = rows[top]
+            result["ids"].append([ids[i] for i in top])
+            result["documents"].append([documents[i] for i in top])
+            result["metadatas"].append([metadatas[i] for i in top])
+            result["distances"].append([float(distance) for distance in distances_top])
+        return result
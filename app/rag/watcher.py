@@ -0,0 +1,89 @@
+"""
+Corpus Watcher Module
+Polls the documents source (the docs/ folder or the blob container) and
+re-indexes only the PDFs that were added, changed or removed, while the
+service keeps answering queries from the current index
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional
+from loguru import logger
+
+from app.rag.blob_ingestion import sync_container
+
+if TYPE_CHECKING:
+    from app.rag.retriever import DocumentRetriever
+
+
+class CorpusWatcher:
+    """
+    Background polling loop over a container (``LocalFolderContainer`` or
+    ``AzureBlobContainer``).
+
+    Each poll compares listed ETags with the retriever's manifest, so an idle
+    poll costs one directory scan or one blob listing. Changed documents are
+    embedded outside the index's write lock and swapped in one step (see
+    ``DocumentRetriever._index_document``), so in-flight queries never wait
+    and never see a document missing.
+    """
+
+    def __init__(self, retriever: "DocumentRetriever", container, interval: float, concurrency: int = 4,
+                 on_change: Optional[Callable[[], object]] = None,
+                 after_change: Optional[Callable[[], Awaitable[object]]] = None):
+        """
+        Args:
+            retriever: Retriever whose index and manifest are kept in sync
+            container: Source of the PDFs
+            interval: Seconds between polls
+            concurrency: Simultaneous downloads per poll
+            on_change: Called in a thread after a poll that changed the index (e.g. rewrite the snapshot)
+            after_change: Coroutine function awaited on the watcher's loop after ``on_change``
+                (e.g. regenerate the FAQ answers with the shared generator)
+        """
+        self.retriever = retriever
+        self.container = container
+        self.interval = interval
+        self.concurrency = concurrency
+        self.on_change = on_change
+        self.after_change = after_change
+        self.last_changes: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def poll(self) -> Dict[str, int]:
+        """Sync once; returns the counts of added, updated, removed, unchanged and failed documents"""
+        changes = await sync_container(self.retriever, self.container, self.retriever.manifest,
+                                       concurrency=self.concurrency, report_progress=False)
+        self.last_changes = changes
+        if changes["added"] or changes["updated"] or changes["removed"]:
+            logger.info(f"Corpus reloaded: {changes}")
+            if self.on_change is not None:
+                await asyncio.to_thread(self.on_change)
+            if self.after_change is not None:
+                await self.after_change()
+        return changes
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reloading the corpus: {e}")
+
+    def start(self) -> asyncio.Task:
+        """Start polling on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="corpus-watcher")
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.container.close()
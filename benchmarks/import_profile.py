@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Import-time profile of the application modules.
+
+Each module is imported in a fresh interpreter with ``python -X importtime``;
+the script reports the wall time of the import and the slowest transitive
+imports (cumulative microseconds), so regressions in startup time show up as
+a heavy dependency reappearing under a light module.
+
+Usage:
+    python benchmarks/import_profile.py [--runs 3] [--top 10] [--output FILE] [module ...]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "app",
+    "app.config.settings",
+    "app.api.orders",
+    "app.rag.services",
+    "app.rag.embeddings",
+    "app.rag.retriever",
+    "app.rag.generator",
+    "app.api.apiFast",
+    "app.front.grad",
+]
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    Parse ``-X importtime`` lines into (module, self_us, cumulative_us).
+    Nested imports keep their indentation, so top-level ones have none.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, cumulative, name = line.split("|", 2)
+        rows.append((name[1:].rstrip(), int(head.split(":", 1)[1]), int(cumulative)))
+    return rows
+
+
+def profile_module(module: str) -> Tuple[Optional[float], List[Tuple[str, int, int]], str]:
+    """Import a module in a fresh interpreter; returns (seconds, importtime rows, error)"""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+        return None, [], error
+    return elapsed, parse_importtime(proc.stderr), ""
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module (best run is kept)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest transitive imports listed per module")
+    parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    lines = [f"# Import profile — Python {sys.version.split()[0]}", ""]
+    for module in args.modules:
+        best: Optional[float] = None
+        best_rows: List[Tuple[str, int, int]] = []
+        error = ""
+        for _ in range(args.runs):
+            elapsed, rows, error = profile_module(module)
+            if elapsed is None:
+                break
+            if best is None or elapsed < best:
+                best, best_rows = elapsed, rows
+        if best is None:
+            lines.append(f"{module}: import failed ({error})")
+            continue
+        lines.append(f"{module}: {best * 1000:.0f} ms wall, {len(best_rows)} modules imported")
+        # Solo imports de primer nivel: sus tiempos acumulados no se solapan
+        top_level = sorted(
+            ((name, cumulative) for name, _, cumulative in best_rows if not name.startswith(" ")),
+            key=lambda item: item[1], reverse=True,
+        )[:args.top]
+        for name, cumulative in top_level:
+            lines.append(f"    {cumulative / 1000:8.1f} ms  {name}")
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmark for the EcoMarket API and Gradio chat.
+
+Drives each scenario with a fixed number of concurrent virtual users and
+reports p50/p95/p99 latency, throughput and errors per endpoint. Point it
+at a running stack, or use ``offline_stack.py`` to start the API against
+local stand-ins first.
+
+Scenarios:
+    query          POST /query
+    get_order      GET  /get_order
+    register       POST /register_return_order (writes to docs/*.json, opt-in)
+    chat           POST /chat (one server-side session per virtual user)
+    gradio         Gradio chat_function through gradio_client (optional dependency)
+
+Usage:
+    python benchmarks/load_benchmark.py --scenarios query,get_order,chat --concurrency 16 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+QUESTIONS = [
+    "¿Cuál es el plazo para devolver un producto?",
+    "¿Qué productos no se pueden devolver?",
+    "¿Cómo solicito el reembolso de mi compra?",
+    "¿Cuánto tarda el envío a Medellín?",
+    "¿Puedo cambiar la dirección de entrega?",
+    "¿Qué hago si mi pedido llegó dañado?",
+]
+
+DEFAULT_SCENARIOS = ["query", "get_order", "chat"]
+
+
+def order_id(index: int) -> str:
+    return f"ECO-2509-{20001 + index:05d}"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class ScenarioResult:
+    """Latencies and errors collected for one scenario"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.wall_time = 0.0
+
+    def record(self, latency: float, error: Optional[str] = None):
+        if error is None:
+            self.latencies.append(latency)
+        else:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def summary(self) -> dict:
+        values = sorted(self.latencies)
+        errors = sum(self.errors.values())
+        return {
+            "scenario": self.name,
+            "requests": len(values) + errors,
+            "ok": len(values),
+            "errors": errors,
+            "error_breakdown": self.errors,
+            "throughput_rps": len(values) / self.wall_time if self.wall_time else 0.0,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": (values[-1] if values else 0.0) * 1000,
+            "wall_time_s": self.wall_time,
+        }
+
+
+def build_scenarios(args) -> Dict[str, Callable[[httpx.AsyncClient, int, int], Awaitable[None]]]:
+    """Map scenario name -> request(client, worker, sequence); a request raises on failure"""
+    sessions: Dict[int, Optional[str]] = {}
+
+    async def query(client: httpx.AsyncClient, worker: int, seq: int):
+        question = random.choice(QUESTIONS)
+        if random.random() < args.order_mention_ratio:
+            question = f"{question} Mi orden es {order_id(random.randrange(args.orders))}"
+        response = await client.post("/query", json={"query": question, "top_k": 3, "temperature": args.temperature})
+        response.raise_for_status()
+
+    async def get_order(client: httpx.AsyncClient, worker: int, seq: int):
+        response = await client.get("/get_order", params={"orden_servicio": order_id(random.randrange(args.orders))})
+        response.raise_for_status()
+
+    async def register(client: httpx.AsyncClient, worker: int, seq: int):
+        response = await client.post(
+            "/register_return_order", json={"codigo_devolucion": order_id(random.randrange(args.orders))}
+        )
+        response.raise_for_status()
+
+    async def chat(client: httpx.AsyncClient, worker: int, seq: int):
+        response = await client.post(
+            "/chat", json={"message": random.choice(QUESTIONS), "session_id": sessions.get(worker)}
+        )
+        response.raise_for_status()
+        sessions[worker] = response.json()["session_id"]
+
+    gradio_clients: Dict[int, object] = {}
+
+    async def gradio(client: httpx.AsyncClient, worker: int, seq: int):
+        from gradio_client import Client
+
+        # Un cliente por usuario virtual: cada uno tiene su propia sesión de Gradio
+        if worker not in gradio_clients:
+            gradio_clients[worker] = await asyncio.to_thread(Client, args.gradio_url, verbose=False)
+        await asyncio.to_thread(
+            gradio_clients[worker].predict, random.choice(QUESTIONS), api_name="/chat_function"
+        )
+
+    return {"query": query, "get_order": get_order, "register": register, "chat": chat, "gradio": gradio}
+
+
+async def run_scenario(name: str, request: Callable, client: httpx.AsyncClient, args) -> ScenarioResult:
+    result = ScenarioResult(name)
+    counter = iter(range(args.warmup + args.requests))
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    lock = asyncio.Lock()
+
+    async def worker(worker_id: int):
+        while True:
+            async with lock:
+                seq = next(counter, None)
+            if seq is None or (deadline is not None and time.perf_counter() >= deadline):
+                return
+            started = time.perf_counter()
+            error = None
+            try:
+                await request(client, worker_id, seq)
+            except httpx.HTTPStatusError as e:
+                error = f"HTTP {e.response.status_code}"
+            except Exception as e:
+                error = type(e).__name__
+            if seq >= args.warmup:
+                result.record(time.perf_counter() - started, error)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    result.wall_time = time.perf_counter() - started
+    return result
+
+
+def format_table(summaries: List[dict]) -> str:
+    header = f"{'scenario':<12}{'ok':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    lines = [header, "-" * len(header)]
+    for s in summaries:
+        lines.append(
+            f"{s['scenario']:<12}{s['ok']:>7}{s['errors']:>6}{s['throughput_rps']:>9.1f}"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+async def run(args) -> List[dict]:
+    scenarios = build_scenarios(args)
+    unknown = [name for name in args.scenarios if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+    if "register" in args.scenarios and not args.allow_writes:
+        raise SystemExit("The register scenario appends to docs/*.json; pass --allow-writes to run it")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    summaries = []
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        for name in args.scenarios:
+            result = await run_scenario(name, scenarios[name], client, args)
+            summaries.append(result.summary())
+    return summaries
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--gradio-url", default="http://127.0.0.1:7000")
+    parser.add_argument("--scenarios", type=lambda v: [s.strip() for s in v.split(",") if s.strip()],
+                        default=DEFAULT_SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent virtual users per scenario")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests sent first")
+    parser.add_argument("--duration", type=float, default=0, help="Stop a scenario after N seconds (0 = no limit)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--orders", type=int, default=100, help="Order IDs are drawn from the first N orders")
+    parser.add_argument("--order-mention-ratio", type=float, default=0.3,
+                        help="Share of /query questions that mention an order ID")
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--allow-writes", action="store_true", help="Allow scenarios that modify docs/*.json")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+    summaries = asyncio.run(run(args))
+    print(format_table(summaries))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != "output"}, "results": summaries},
+                      f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
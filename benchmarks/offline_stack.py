@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Run the load benchmark against a fully offline stack.
+
+Starts the fake Azure OpenAI server, the datasets-server stub and the FastAPI
+app (optionally the Gradio chat too) as subprocesses wired to each other
+through environment variables. Waits for ``GET /ready``, runs
+``load_benchmark.py`` with the remaining arguments and stops everything.
+
+The app uses the deterministic hashing embeddings unless
+``--embedding-backend sentence-transformers`` is given. Chat sessions and
+the completion cache live in a temporary directory, and the completion
+cache is disabled unless ``--llm-cache`` is given. The register scenario
+still writes to docs/*.json.
+
+Usage:
+    python benchmarks/offline_stack.py --token-latency 0.02 --tokens 128 -- --scenarios query,get_order --concurrency 16
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+
+GRADIO_LAUNCHER = (
+    "import sys; from app.front.grad import launch_gradio; "
+    "launch_gradio(share=False, server_port=int(sys.argv[1]))"
+)
+
+
+def wait_for(url: str, timeout: float, ok_status=(200,)) -> None:
+    deadline = time.monotonic() + timeout
+    last_error = ""
+    while time.monotonic() < deadline:
+        try:
+            response = httpx.get(url, timeout=2.0)
+            if response.status_code in ok_status:
+                return
+            last_error = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            last_error = type(e).__name__
+        time.sleep(0.5)
+    raise SystemExit(f"Timed out waiting for {url} ({last_error})")
+
+
+def main(argv: List[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    load_args: List[str] = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, load_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-port", type=int, default=8000)
+    parser.add_argument("--azure-port", type=int, default=9100)
+    parser.add_argument("--datasets-port", type=int, default=9101)
+    parser.add_argument("--gradio-port", type=int, default=0, help="Also launch the Gradio chat on this port")
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--embedding-backend", default="hashing")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM completion cache enabled")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="ecomarket-bench-")
+    env = dict(os.environ)
+    env.update({
+        "AZURE_OPENAI_ENDPOINT": f"http://127.0.0.1:{args.azure_port}",
+        "AZURE_OPENAI_KEY": "offline-benchmark",
+        "AZURE_OPENAI_API_VERSION": "2024-10-21",
+        "AZURE_OPENAI_DEPLOYMENT_NAME": "gpt-4.1-mini",
+        "ENDPOINTDATASET": f"http://127.0.0.1:{args.datasets_port}/rows",
+        "EMBEDDING_BACKEND": args.embedding_backend,
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite"),
+        "CHAT_SESSIONS_DB_PATH": os.path.join(workdir, "chat_sessions.sqlite"),
+        "LANGCHAIN_TRACING_V2": "false",
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+
+    processes = []
+    try:
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(BENCHMARKS, "stubs", "fake_azure_openai.py"),
+            "--port", str(args.azure_port), "--ttft", str(args.ttft),
+            "--token-latency", str(args.token_latency), "--tokens", str(args.tokens),
+        ], cwd=ROOT, env=env))
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(BENCHMARKS, "stubs", "datasets_server.py"),
+            "--port", str(args.datasets_port), "--rows", str(args.orders),
+        ], cwd=ROOT, env=env))
+        wait_for(f"http://127.0.0.1:{args.azure_port}/stats", 30)
+        wait_for(f"http://127.0.0.1:{args.datasets_port}/rows?length=1", 30)
+
+        processes.append(subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "app.api.apiFast:app",
+            "--host", "127.0.0.1", "--port", str(args.api_port), "--log-level", "warning",
+        ], cwd=ROOT, env=env))
+        if args.gradio_port:
+            processes.append(subprocess.Popen(
+                [sys.executable, "-c", GRADIO_LAUNCHER, str(args.gradio_port)], cwd=ROOT, env=env
+            ))
+        wait_for(f"http://127.0.0.1:{args.api_port}/ready", args.startup_timeout)
+        if args.gradio_port:
+            wait_for(f"http://127.0.0.1:{args.gradio_port}/", args.startup_timeout)
+
+        sys.path.insert(0, BENCHMARKS)
+        import load_benchmark
+
+        defaults = ["--base-url", f"http://127.0.0.1:{args.api_port}", "--orders", str(args.orders)]
+        if args.gradio_port:
+            defaults += ["--gradio-url", f"http://127.0.0.1:{args.gradio_port}"]
+        return load_benchmark.main(defaults + load_args)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
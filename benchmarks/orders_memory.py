@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Memory of the orders dataset: raw datasets-server rows vs the columnar OrderTable.
+
+Builds N synthetic orders with the EcoMarket schema, measures the memory
+allocated (tracemalloc) to hold them as the raw ``[{'row': {...}}]`` list of
+dicts, then as an OrderTable, and reports both scaled to one million orders
+together with the lookup latency of each layout.
+
+Usage:
+    python benchmarks/orders_memory.py --orders 1000000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api.orders import OrderTable  # noqa: E402
+
+CITIES = ["Bogotá", "Medellín", "Cali", "Barranquilla", "Cartagena", "Bucaramanga"]
+CATEGORIES = ["Hogar", "Electrónica", "Ropa", "Higiene", "Alimentos", "Jardín"]
+STATUSES = ["Entregado", "En tránsito", "En preparación", "Retrasado"]
+CARRIERS = ["Servientrega", "Coordinadora", "Envia", "Interrapidisimo"]
+
+
+def synthetic_json(count: int, seed: int = 7) -> str:
+    """The dataset as the JSON text the API downloads, so no string is shared between rows"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        status = rng.choice(STATUSES)
+        rows.append({"row_idx": i, "row": {
+            "tracking_number": 900000 + i,
+            "order_id": f"ECO-{2509 + i // 100000:04d}-{20001 + i % 100000:05d}",
+            "customer_name": f"Cliente {i:07d}",
+            "city": rng.choice(CITIES),
+            "product": f"Producto {rng.randint(1, 500)}",
+            "category": rng.choice(CATEGORIES),
+            "status": status,
+            "carrier": rng.choice(CARRIERS),
+            "track_url": f"https://tracking.example/{900000 + i}",
+            "notes": "",
+            "delayed": status == "Retrasado",
+            "eta": f"2025-10-{rng.randint(1, 28):02d}",
+            "last_update": f"2025-09-{rng.randint(1, 28):02d}",
+        }, "truncated_cells": []})
+    return json.dumps({"rows": rows})
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, elapsed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    payload = synthetic_json(args.orders)
+    raw, raw_bytes, raw_seconds = measure(lambda: json.loads(payload)["rows"])
+    # La tabla se construye desde su propia copia del JSON, que se libera: cuenta solo lo que retiene
+    table, table_bytes, table_seconds = measure(lambda: OrderTable.from_rows(json.loads(payload)["rows"]))
+    ids = [raw[random.randrange(len(raw))]["row"]["order_id"] for _ in range(args.lookups)]
+    del payload
+
+    index = {row["row"]["order_id"]: row["row"] for row in raw}
+    started = time.perf_counter()
+    for order_id in ids:
+        index.get(order_id)
+    dict_lookup = (time.perf_counter() - started) / len(ids)
+    started = time.perf_counter()
+    for order_id in ids:
+        table.get(order_id)
+    table_lookup = (time.perf_counter() - started) / len(ids)
+
+    scale = 1_000_000 / args.orders
+    mib = 1024 * 1024
+    print(f"orders: {args.orders}  (figures scaled to 1M orders)")
+    print(f"{'layout':<22}{'MiB / 1M':>12}{'build s':>10}{'lookup µs':>12}")
+    print(f"{'dict-of-dicts (raw)':<22}{raw_bytes * scale / mib:>12.1f}{raw_seconds:>10.2f}{dict_lookup * 1e6:>12.2f}")
+    print(f"{'OrderTable':<22}{table_bytes * scale / mib:>12.1f}{table_seconds:>10.2f}{table_lookup * 1e6:>12.2f}")
+    print(f"reduction: {raw_bytes / table_bytes:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Cold-open time of an index snapshot vs rebuilding the in-memory vector store.
+
+Writes a synthetic snapshot (N chunks of ~1000 characters, 384-dimensional
+embeddings), then measures opening it as a memory-mapped NumpyCollection and
+running the first query, against adding the same vectors to a fresh
+NumpyCollection (the part of a rebuild that does not depend on the model).
+
+Usage:
+    python benchmarks/snapshot_open.py --chunks 50000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.rag.snapshot import open_snapshot, snapshot_version, write_snapshot  # noqa: E402
+from app.rag.vector_store import NumpyCollection  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(7)
+    embeddings = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+    ids = [f"doc{i // 100}_chunk{i % 100}" for i in range(args.chunks)]
+    texts = [f"Fragmento {i} " + "texto de política " * 55 for i in range(args.chunks)]
+    metadatas = [{"filename": f"doc{i // 100}.pdf", "chunk": i % 100, "doc_type": "policy"} for i in range(args.chunks)]
+    version = snapshot_version("benchmark", 1000, 200, 6)
+
+    with tempfile.TemporaryDirectory() as root:
+        started = time.perf_counter()
+        write_snapshot(root, version, ids, texts, metadatas, embeddings, [0] * args.chunks, {})
+        write_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        collection = NumpyCollection.from_snapshot("docs", open_snapshot(root, version))
+        open_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        collection.query(query_embeddings=[embeddings[0]], n_results=5)
+        first_query = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rebuilt = NumpyCollection("docs")
+        for start in range(0, args.chunks, 1000):
+            rebuilt.add(documents=texts[start:start + 1000], embeddings=embeddings[start:start + 1000],
+                        metadatas=metadatas[start:start + 1000], ids=ids[start:start + 1000])
+        rebuilt.query(query_embeddings=[embeddings[0]], n_results=5)
+        rebuild_seconds = time.perf_counter() - started
+
+    print(f"chunks: {args.chunks}  dim: {args.dim}")
+    print(f"write snapshot:            {write_seconds * 1000:10.1f} ms")
+    print(f"open snapshot:             {open_seconds * 1000:10.1f} ms")
+    print(f"first query (mapped):      {first_query * 1000:10.1f} ms")
+    print(f"rebuild store + 1st query: {rebuild_seconds * 1000:10.1f} ms  (excluding embedding the chunks)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Hugging Face datasets-server ``/rows`` endpoint.
+
+Serves a deterministic synthetic orders dataset with the same shape as the
+EcoMarket dataset (``{"rows": [{"row": {...}}]}``) so the API can start and
+answer order lookups offline. Order IDs run from ECO-2509-20001 upwards.
+
+Usage:
+    python benchmarks/stubs/datasets_server.py --port 9101 --rows 1000
+"""
+
+import argparse
+import random
+
+from fastapi import FastAPI, Query
+
+CITIES = ["Bogotá", "Medellín", "Cali", "Barranquilla", "Cartagena", "Bucaramanga"]
+CATEGORIES = ["Hogar", "Electrónica", "Ropa", "Higiene", "Alimentos", "Jardín"]
+STATUSES = ["Entregado", "En tránsito", "En preparación", "Retrasado"]
+CARRIERS = ["Servientrega", "Coordinadora", "Envia", "Interrapidisimo"]
+
+config = {"rows": 1000, "seed": 7}
+
+app = FastAPI(title="Fake datasets-server")
+
+
+def order_id(index: int) -> str:
+    """Order ID of the index-th synthetic order (0-based)"""
+    return f"ECO-2509-{20001 + index:05d}"
+
+
+def build_rows(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        status = rng.choice(STATUSES)
+        rows.append({
+            "row_idx": i,
+            "row": {
+                "tracking_number": 900000 + i,
+                "order_id": order_id(i),
+                "customer_name": f"Cliente {i:05d}",
+                "city": rng.choice(CITIES),
+                "product": f"Producto {rng.randint(1, 500)}",
+                "category": rng.choice(CATEGORIES),
+                "status": status,
+                "carrier": rng.choice(CARRIERS),
+                "track_url": f"https://tracking.example/{900000 + i}",
+                "notes": "",
+                "delayed": status == "Retrasado",
+                "eta": f"2025-10-{rng.randint(1, 28):02d}",
+                "last_update": f"2025-09-{rng.randint(1, 28):02d}",
+            },
+            "truncated_cells": [],
+        })
+    return rows
+
+
+@app.get("/rows")
+async def rows(offset: int = Query(0, ge=0), length: int = Query(None, ge=1)):
+    data = app.state.rows
+    end = len(data) if length is None else offset + length
+    return {"rows": data[offset:end], "num_rows_total": len(data)}
+
+
+app.state.rows = build_rows(config["rows"], config["seed"])
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--rows", type=int, default=config["rows"], help="Number of synthetic orders")
+    parser.add_argument("--seed", type=int, default=config["seed"])
+    args = parser.parse_args()
+    app.state.rows = build_rows(args.rows, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Fake Azure OpenAI chat completions server for offline benchmarks.
+
+Implements ``POST /openai/deployments/{deployment}/chat/completions`` (plain and
+streamed) with a configurable time-to-first-token and per-token latency, so the
+generator and the LangChain agent can be load tested without network access.
+The answer is deterministic and never contains tool calls.
+
+Usage:
+    python benchmarks/stubs/fake_azure_openai.py --port 9100 --ttft 0.2 --token-latency 0.01 --tokens 64
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+config = {"ttft": 0.2, "token_latency": 0.01, "tokens": 64}
+stats = {"requests": 0}
+
+app = FastAPI(title="Fake Azure OpenAI")
+
+
+def _answer_tokens(messages: list) -> list:
+    question = ""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            question = str(message.get("content", ""))
+            break
+    base = f"Respuesta simulada a: {question[:80]}".split()
+    words = (base * (config["tokens"] // max(len(base), 1) + 1))[:config["tokens"]]
+    return [f"{word} " for word in words]
+
+
+def _usage(messages: list, completion_tokens: int) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    tokens = _answer_tokens(messages)
+    stats["requests"] += 1
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if body.get("stream"):
+        async def events():
+            await asyncio.sleep(config["ttft"])
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(config["token_latency"])
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": deployment,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": deployment,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await asyncio.sleep(config["ttft"] + config["token_latency"] * max(len(tokens) - 1, 0))
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": deployment,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(tokens).strip()},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(messages, len(tokens)),
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, **config}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft", type=float, default=config["ttft"], help="Seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=config["token_latency"], help="Seconds per additional token")
+    parser.add_argument("--tokens", type=int, default=config["tokens"], help="Completion length in tokens")
+    args = parser.parse_args()
+    config.update(ttft=args.ttft, token_latency=args.token_latency, tokens=args.tokens)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Per-process memory of a pre-fork server (Linux only).
+
+Reads /proc/<pid>/smaps_rollup for the master and each of its children and
+reports RSS, PSS (shared pages split between the processes that map them)
+and USS (pages private to the process). With copy-on-write sharing the
+workers' USS stays small even though their RSS includes the whole model.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app.api.apiFast:app &
+    python benchmarks/worker_memory.py $(pgrep -f "gunicorn: master" || pgrep -of gunicorn)
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List
+
+
+def children(pid: int) -> List[int]:
+    result = []
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        try:
+            with open(os.path.join(task_dir, tid, "children")) as f:
+                result.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return sorted(set(result))
+
+
+def memory(pid: int) -> Dict[str, int]:
+    """RSS, PSS and USS in KiB"""
+    fields: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("master_pid", type=int)
+    args = parser.parse_args(argv)
+
+    pids = [args.master_pid] + children(args.master_pid)
+    print(f"{'pid':>8} {'role':<8}{'RSS MiB':>10}{'PSS MiB':>10}{'USS MiB':>10}")
+    total_pss = 0
+    for pid in pids:
+        stats = memory(pid)
+        total_pss += stats["pss"]
+        role = "master" if pid == args.master_pid else "worker"
+        print(f"{pid:>8} {role:<8}{stats['rss'] / 1024:>10.1f}{stats['pss'] / 1024:>10.1f}{stats['uss'] / 1024:>10.1f}")
+    print(f"Total PSS: {total_pss / 1024:.1f} MiB for {len(pids) - 1} workers")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
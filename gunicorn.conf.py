@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for the pre-fork deployment of the EcoMarket API
+
+    gunicorn -c gunicorn.conf.py app.api.apiFast:app
+
+The master loads the embedding model, the vector index and the orders index
+once (app/api/prefork.py) and then forks the workers, which share those pages
+copy-on-write. Each worker only creates its per-process resources (LLM client,
+chat sessions database) in the FastAPI lifespan.
+"""
+
+import os
+
+bind = os.environ.get("BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Importar la app en el master: los workers heredan los módulos ya cargados
+preload_app = True
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    from app.api.prefork import preload_shared_assets
+    preload_shared_assets()
+
+
+def post_fork(server, worker):
+    from app.api.prefork import post_fork as reset_worker
+    reset_worker()
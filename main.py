@@ -4,11 +4,6 @@ EcoMarket RAG Solution - Main Entry Point
 FastAPI application for RAG-based product queries and recommendations
 """
 
-import sys
-from pathlib import Path
-from contextlib import asynccontextmanager
-from app.api.apiFast import app
-from app.front.grad import launch_gradio
 #!/usr/bin/env python3
 """
 EcoMarket RAG Solution - Main Entry Point
@@ -18,17 +13,22 @@ if __name__ == "__main__":
     import threading
     import uvicorn
     from app.config.settings import get_settings
-    from app.langchain.lang import LangAgent
+    # Gradio y LangChain se importan solo al lanzar la aplicación
+    from app.front.grad import launch_gradio
+
+    from utils.logging_config import LoggingConfig
 
     settings = get_settings()
-    agent_executor = LangAgent().load_agent()
+    LoggingConfig.setup_logging()
 
     def run_uvicorn():
         uvicorn.run(
             "app.api.apiFast:app",
             host=settings.host,
             port=settings.port,
-            reload=settings.debug
+            reload=settings.debug,
+            # Conservar la configuración de logging: uvicorn también escribe por Loguru
+            log_config=None
         )
 
     # Lanzar FastAPI en un hilo
@@ -36,4 +36,4 @@ if __name__ == "__main__":
     uvicorn_thread.start()
 
     # Lanzar Gradio en el hilo principal
-    launch_gradio(agent_executor, share=True, server_port=7000)
\ No newline at end of file
+    launch_gradio(share=True, server_port=7000)
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+Unit Tests for admission control and load shedding
+"""
+
+import asyncio
+
+import pytest
+
+from app.api.admission import (PRIORITY_CHAT, PRIORITY_ORDERS, PRIORITY_RAG, AdmissionController,
+                               AdmissionRejected, request_priority)
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+    class response:
+        headers = {"retry-after": "7"}
+
+
+def controller(**kwargs):
+    options = {"endpoint_limits": {"query": 1, "chat": 1}, "max_limit": 2, "max_queue": 2, "queue_timeout": 1.0}
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+class TestAdmissionController:
+    """Tests for AdmissionController"""
+
+    def test_order_questions_are_prioritized(self):
+        assert request_priority("¿Dónde está ECO-2509-20001?", PRIORITY_RAG) == PRIORITY_ORDERS
+        assert request_priority("¿Cuál es la política de envíos?", PRIORITY_RAG) == PRIORITY_RAG
+
+    def test_freed_slot_goes_to_the_highest_priority_waiter(self):
+        admission = controller()
+        served = []
+
+        async def request(name, priority):
+            async with admission.admit("query", priority):
+                served.append(name)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            await admission.acquire("query", PRIORITY_RAG)
+            waiting = [asyncio.ensure_future(request("rag", PRIORITY_RAG)),
+                       asyncio.ensure_future(request("orden", PRIORITY_ORDERS))]
+            await asyncio.sleep(0)
+            admission.release("query")
+            await asyncio.gather(*waiting)
+
+        asyncio.run(main())
+        assert served == ["orden", "rag"]
+
+    def test_full_queue_and_queue_deadline_are_rejected_with_retry_after(self):
+        admission = controller(max_queue=1, queue_timeout=0.02)
+
+        async def main():
+            await admission.acquire("chat", PRIORITY_CHAT)
+            queued = asyncio.ensure_future(admission.acquire("chat", PRIORITY_CHAT))
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as full:
+                await admission.acquire("chat", PRIORITY_CHAT)
+            with pytest.raises(AdmissionRejected) as expired:
+                await queued
+            return full.value, expired.value
+
+        full, expired = asyncio.run(main())
+        assert (full.status_code, full.reason) == (429, "queue_full")
+        assert (expired.status_code, expired.reason) == (503, "queue_timeout")
+        assert full.retry_after >= 1
+
+    def test_throttling_lowers_the_limit_and_sheds_non_order_requests(self):
+        admission = controller(max_limit=8)
+        admission.record_llm_call(error=ThrottledError())
+
+        async def main():
+            with pytest.raises(AdmissionRejected) as rejected:
+                await admission.acquire("query", PRIORITY_RAG)
+            await admission.acquire("query", PRIORITY_ORDERS)
+            return rejected.value
+
+        rejected = asyncio.run(main())
+        assert admission.limit == 4
+        assert (rejected.status_code, rejected.reason) == (429, "llm_throttled")
+        assert 1 <= rejected.retry_after <= 7
+
+    def test_fast_calls_raise_the_limit_back(self):
+        admission = controller(max_limit=8, target_latency=1.0)
+        admission.limit = 2.0
+        for _ in range(10):
+            admission.record_llm_call(latency=0.2)
+        assert 2.0 < admission.limit <= 8
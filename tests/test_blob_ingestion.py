@@ -0,0 +1,112 @@
+"""
+Unit Tests for ETag-based container sync
+"""
+
+import asyncio
+import os
+
+from app.rag.blob_ingestion import BlobManifest, LocalFolderContainer, sync_container
+
+
+class RecordingRetriever:
+    """Stands in for DocumentRetriever: records which documents are indexed or removed"""
+
+    def __init__(self):
+        self.indexed = []
+        self.removed = []
+        self.status = {}
+
+    def index_pdf_bytes(self, filename, data, replace=False):
+        self.indexed.append((filename, data, replace))
+        return 1
+
+    def remove_document(self, filename):
+        self.removed.append(filename)
+        return 1
+
+    def _update_status(self, **changes):
+        self.status.update(changes)
+
+
+def write(folder, name, content: bytes, mtime_ns: int):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class TestSyncContainer:
+    """Tests for sync_container over a local folder container"""
+
+    def test_only_new_changed_and_removed_documents_are_processed(self, tmp_path):
+        folder = str(tmp_path / "docs")
+        os.makedirs(folder)
+        write(folder, "politica.pdf", b"v1", 1_000_000_000)
+        write(folder, "manual.pdf", b"manual", 1_000_000_000)
+        container = LocalFolderContainer(folder)
+        manifest = BlobManifest(str(tmp_path / "manifest.json"))
+        retriever = RecordingRetriever()
+
+        first = asyncio.run(sync_container(retriever, container, manifest, concurrency=2))
+        second = asyncio.run(sync_container(retriever, container, manifest, concurrency=2))
+        write(folder, "politica.pdf", b"v2", 2_000_000_000)
+        os.remove(os.path.join(folder, "manual.pdf"))
+        third = asyncio.run(sync_container(retriever, container, manifest, concurrency=2))
+
+        assert first["added"] == 2
+        assert second == {"added": 0, "updated": 0, "removed": 0, "unchanged": 2, "failed": 0}
+        assert third["updated"] == 1 and third["removed"] == 1
+        assert retriever.indexed[-1] == ("politica.pdf", b"v2", True)
+        assert retriever.removed == ["manual.pdf"]
+        assert BlobManifest(str(tmp_path / "manifest.json")).names() == ["politica.pdf"]
+
+
+class TestCorpusWatcher:
+    """Tests for the hot-reload polling loop"""
+
+    def test_poll_reindexes_only_the_changed_file_without_touching_readiness(self, tmp_path):
+        from app.rag.watcher import CorpusWatcher
+        write(str(tmp_path), "politica.pdf", b"v1", 1_000_000_000)
+        retriever = RecordingRetriever()
+        retriever.manifest = BlobManifest()
+        watcher = CorpusWatcher(retriever, LocalFolderContainer(str(tmp_path)), interval=0.01)
+
+        asyncio.run(watcher.poll())
+        write(str(tmp_path), "nueva.pdf", b"new", 1_000_000_000)
+        changes = asyncio.run(watcher.poll())
+
+        assert changes["added"] == 1 and changes["unchanged"] == 1
+        assert [name for name, _, _ in retriever.indexed] == ["politica.pdf", "nueva.pdf"]
+        assert retriever.status == {}
+
+    def test_after_change_runs_on_the_watchers_loop(self, tmp_path):
+        from app.rag.watcher import CorpusWatcher
+        retriever = RecordingRetriever()
+        retriever.manifest = BlobManifest()
+        loops = []
+
+        async def after_change():
+            loops.append(asyncio.get_running_loop())
+
+        watcher = CorpusWatcher(retriever, LocalFolderContainer(str(tmp_path)), interval=0.01,
+                                after_change=after_change)
+
+        async def poll_twice():
+            await watcher.poll()
+            write(str(tmp_path), "politica.pdf", b"v1", 1_000_000_000)
+            await watcher.poll()
+            return asyncio.get_running_loop()
+
+        loop = asyncio.run(poll_twice())
+        assert loops == [loop]
+
+    def test_one_watcher_per_process(self, monkeypatch):
+        from app.rag import services as rag_services
+        monkeypatch.setattr(rag_services, "_corpus_watcher", None)
+        monkeypatch.setattr(rag_services, "_retriever", RecordingRetriever())
+
+        first = rag_services.create_corpus_watcher()
+
+        assert first is not None
+        assert rag_services.create_corpus_watcher() is None
+        assert rag_services.get_corpus_watcher() is first
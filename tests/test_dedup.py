@@ -0,0 +1,40 @@
+"""
+Unit Tests for near-duplicate detection and MMR
+"""
+
+from app.rag.dedup import NearDuplicateIndex, hamming_distance, merge_sources, mmr_select, simhash
+
+# Un fragmento del tamaño de un chunk (~150 palabras)
+BOILERPLATE = " ".join(f"cláusula{i}" for i in range(150))
+
+
+class TestSimHash:
+    """Tests for fingerprints and the LSH index"""
+
+    def test_near_duplicates_are_close_and_different_texts_are_not(self):
+        variant = BOILERPLATE.replace("cláusula75 ", "anexo ").upper()
+        other = "Las devoluciones se aceptan dentro de los 30 días siguientes a la entrega del producto."
+
+        assert simhash(BOILERPLATE) == simhash(BOILERPLATE.upper().replace("á", "a"))
+        assert hamming_distance(simhash(BOILERPLATE), simhash(variant)) <= 6
+        assert hamming_distance(simhash(BOILERPLATE), simhash(other)) > 6
+
+    def test_index_finds_the_canonical_chunk(self):
+        index = NearDuplicateIndex(max_distance=6)
+        index.add(simhash(BOILERPLATE), "manual_chunk0")
+
+        assert index.find(simhash(BOILERPLATE.replace("cláusula75 ", "anexo "))) == "manual_chunk0"
+        assert index.find(simhash("Texto sin relación con el anterior, sobre envíos y transportistas.")) is None
+
+    def test_merge_sources(self):
+        assert merge_sources("a.pdf#0", ["b.pdf#3", "a.pdf#0"]) == "a.pdf#0;b.pdf#3"
+
+
+class TestMMR:
+    """Tests for maximal marginal relevance"""
+
+    def test_mmr_skips_a_redundant_candidate(self):
+        candidates = [[1.0, 0.0], [0.99, 0.01], [0.6, 0.8]]
+
+        assert mmr_select([1.0, 0.0], candidates, k=2, lambda_mult=0.3) == [0, 2]
+        assert mmr_select([1.0, 0.0], candidates, k=2, lambda_mult=1.0) == [0, 1]
@@ -0,0 +1,50 @@
+"""
+Unit Tests for document tags, the query classifier and metadata filters
+"""
+
+from app.rag.doc_types import build_where, classify_query, tag_document
+from app.rag.vector_store import NumpyCollection, matches_where
+
+
+class TestDocTypes:
+    """Tests for tagging and query classification"""
+
+    def test_tag_document_prefers_the_filename(self):
+        assert tag_document("FOR-034-MANUAL-DE-USUARIO-DE-MI-LICENCIA-CENTRO.pdf", "") == "manual"
+        assert tag_document("Politica_de_Devoluciones.pdf", "") == "policy"
+        assert tag_document("faq.pdf", "política de devolución") == "faq"
+
+    def test_tag_document_falls_back_to_the_text(self):
+        assert tag_document("doc1.pdf", "Política de devoluciones: plazo de 30 días") == "policy"
+        assert tag_document("Clean-Code-V2.4.pdf", "Meaningful names") == "general"
+
+    def test_classify_query(self):
+        assert classify_query("¿Puedo devolver un producto de Higiene?") == {"doc_type": ["policy", "faq"]}
+        assert classify_query("hola") is None
+
+    def test_build_where(self):
+        assert build_where(None) is None
+        assert build_where({"doc_type": "policy"}) == {"doc_type": "policy"}
+        assert build_where({"doc_type": ["policy", "faq"], "filename": "a.pdf"}) == {
+            "$and": [{"doc_type": {"$in": ["policy", "faq"]}}, {"filename": "a.pdf"}]
+        }
+
+
+class TestFilteredSearch:
+    """Tests for where clauses in the numpy vector store"""
+
+    def test_matches_where_operators(self):
+        metadata = {"doc_type": "policy", "chunk": 3}
+        assert matches_where(metadata, {"$and": [{"doc_type": {"$in": ["policy"]}}, {"chunk": {"$gte": 2}}]})
+        assert not matches_where(metadata, {"$or": [{"doc_type": "manual"}, {"chunk": {"$lt": 3}}]})
+
+    def test_query_searches_only_matching_rows(self):
+        collection = NumpyCollection("filtered")
+        collection.add(documents=["manual", "policy"], embeddings=[[1.0, 0.0], [0.0, 1.0]],
+                       metadatas=[{"doc_type": "manual"}, {"doc_type": "policy"}], ids=["m", "p"])
+
+        result = collection.query(query_embeddings=[[1.0, 0.0]], n_results=2, where={"doc_type": "policy"})
+
+        assert result["ids"] == [["p"]]
+        assert result["distances"][0][0] == 2.0
+        assert collection.query(query_embeddings=[[1.0, 0.0]], where={"doc_type": "faq"})["ids"] == [[]]
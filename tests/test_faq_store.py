@@ -0,0 +1,85 @@
+"""
+Unit Tests for the pre-built FAQ answer store
+"""
+
+import asyncio
+
+from app.rag.embeddings import HashingEmbeddingService
+from app.rag.faq_store import CANONICAL_QUESTIONS, FaqStore, build_store, store_version
+from app.rag.retriever import DocumentRetriever
+
+
+class FakeGenerator:
+    """Answers with the first retrieved chunk, recording the questions it was asked"""
+
+    def __init__(self):
+        self.questions = []
+
+    async def generate(self, query, documents, temperature=0.7, **kwargs):
+        self.questions.append(query)
+        return {"answer": documents[0]["content"] if documents else "", "sources": [], "confidence": 0.9}
+
+
+def indexed_retriever(name, text):
+    retriever = DocumentRetriever(HashingEmbeddingService(), collection_name=name, index_on_init=False)
+    retriever._index_document("politica.pdf", text)
+    return retriever
+
+
+class TestFaqStore:
+    """Tests for FaqStore"""
+
+    def test_serves_close_matches_but_not_order_questions(self):
+        retriever = indexed_retriever("faq_lookup", "Las devoluciones se aceptan durante 30 días.")
+        store = asyncio.run(build_store(FaqStore(threshold=0.9), retriever, FakeGenerator()))
+
+        entry = store.lookup("¿cuál es el plazo para devolver un producto?", retriever)
+        assert entry.question == CANONICAL_QUESTIONS[0]
+        assert "30 días" in entry.answer
+        assert store.lookup("Háblame de la historia de la empresa", retriever) is None
+        assert store.lookup("¿Cuál es el plazo para devolver ECO-2509-20001?", retriever) is None
+        assert {k: store.stats[k] for k in ("hits", "misses", "skipped")} == {"hits": 1, "misses": 1, "skipped": 1}
+
+    def test_changed_chunks_make_answers_stale_until_refreshed(self):
+        retriever = indexed_retriever("faq_refresh", "Las devoluciones se aceptan durante 30 días.")
+        generator = FakeGenerator()
+        store = asyncio.run(build_store(FaqStore(threshold=0.9), retriever, generator))
+        question = CANONICAL_QUESTIONS[0]
+
+        retriever._index_document("politica.pdf", "Las devoluciones se aceptan durante 60 días.", replace=True)
+        assert store.lookup(question, retriever) is None
+        assert store.stats["stale"] == 1
+
+        generator.questions.clear()
+        counts = asyncio.run(store.refresh(retriever, generator))
+        assert counts["regenerated"] == len(store.entries) and counts["failed"] == 0
+        assert "60 días" in store.lookup(question, retriever).answer
+        # Sin cambios en el índice no se vuelve a llamar al LLM
+        generator.questions.clear()
+        assert asyncio.run(store.refresh(retriever, generator))["regenerated"] == 0
+        assert generator.questions == []
+
+    def test_saved_store_is_reloaded_only_for_the_same_version(self, tmp_path):
+        retriever = indexed_retriever("faq_persist", "Las devoluciones se aceptan durante 30 días.")
+        path = str(tmp_path / "faq.json")
+        store = asyncio.run(build_store(FaqStore(path, threshold=0.9), retriever, FakeGenerator()))
+        store.save()
+
+        reloaded = FaqStore(path, threshold=0.9)
+        assert reloaded.load(store_version(retriever))
+        assert [entry.question for entry in reloaded.entries] == [entry.question for entry in store.entries]
+        assert reloaded.lookup(CANONICAL_QUESTIONS[1], retriever).question == CANONICAL_QUESTIONS[1]
+        assert not FaqStore(path).load({**store_version(retriever), "embedding_model": "otro-modelo"})
+
+    def test_lookup_reuses_the_callers_embedding(self):
+        retriever = indexed_retriever("faq_embedding", "Las devoluciones se aceptan durante 30 días.")
+        store = asyncio.run(build_store(FaqStore(threshold=0.9), retriever, FakeGenerator()))
+        question = CANONICAL_QUESTIONS[0]
+        embedding = retriever.embedding_service.embed_text(question)
+
+        def fail(text):
+            raise AssertionError("the question was embedded twice")
+
+        retriever.embedding_service.embed_text = fail
+        assert store.accepts(question) and not store.accepts("¿Dónde está ECO-2509-20001?")
+        assert store.lookup(question, retriever, embedding=embedding).question == question
@@ -0,0 +1,52 @@
+"""
+Unit Tests for CompletionCache
+"""
+
+from app.rag.llm_cache import CompletionCache
+
+
+class TestCompletionCache:
+    """Tests for CompletionCache"""
+
+    def test_key_is_content_addressed(self):
+        """Same request gives the same key; any field change gives a new one"""
+        messages = [{"role": "system", "content": "Política"}, {"role": "user", "content": "¿Plazo?"}]
+        key = CompletionCache.make_key("gpt-4.1-mini", messages, 0.0, "v1")
+
+        assert key == CompletionCache.make_key("gpt-4.1-mini", list(messages), 0.0, "v1")
+        assert key != CompletionCache.make_key("gpt-4.1", messages, 0.0, "v1")
+        assert key != CompletionCache.make_key("gpt-4.1-mini", messages, 0.0, "v2")
+
+    def test_persistent_tier_survives_restart(self, tmp_path):
+        """Entries written by one instance are served from disk by the next"""
+        db_path = str(tmp_path / "cache.sqlite")
+        CompletionCache(db_path=db_path).put("k", "respuesta", latency=1.5)
+
+        cache = CompletionCache(db_path=db_path)
+        assert cache.get("k") == "respuesta"
+        assert cache.get("k") == "respuesta"
+
+        stats = cache.snapshot()
+        assert stats["hits_disk"] == 1
+        assert stats["hits_memory"] == 1
+        assert stats["saved_latency_seconds"] == 3.0
+
+    def test_memory_tier_is_lru_bounded(self):
+        """The memory tier evicts the least recently used entry"""
+        cache = CompletionCache(max_memory_entries=2)
+        cache.put("a", "1", 0.1)
+        cache.put("b", "2", 0.1)
+        cache.get("a")
+        cache.put("c", "3", 0.1)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+
+    def test_bypass_rules(self):
+        """Sampled and order-specific prompts skip the cache"""
+        cache = CompletionCache()
+
+        assert cache.bypass_reason("¿Cuál es el plazo de devolución?", 0.0) is None
+        assert cache.bypass_reason("¿Cuál es el plazo de devolución?", 0.7) == "temperature"
+        assert cache.bypass_reason("Estado de ECO-2509-20001", 0.0) == "order_specific"
+        assert cache.snapshot()["bypassed"] == 2
@@ -0,0 +1,54 @@
+"""
+Unit Tests for the logging pipeline
+"""
+
+import json
+import logging
+
+from loguru import logger
+
+from utils.logging_config import InterceptHandler, configure_loguru, log_payload
+
+
+class TestLoggingPipeline:
+    """Tests for configure_loguru, log_payload and InterceptHandler"""
+
+    def test_payloads_go_to_json_sink_only(self, tmp_path):
+        """Payload records are JSON lines in their own sink and stay out of the main log"""
+        log_file = tmp_path / "app.log"
+        payload_file = tmp_path / "payloads.jsonl"
+        configure_loguru(level="INFO", log_file=str(log_file), payload_file=str(payload_file),
+                         payload_sample_rate=1.0, enqueue=False)
+
+        log_payload("generate.prompt", prompt="Contexto {con llaves}", query="¿Plazo?")
+        logger.info("Respuesta generada")
+
+        record = json.loads(payload_file.read_text(encoding="utf-8").strip())
+        assert record["event"] == "generate.prompt"
+        assert record["prompt"] == "Contexto {con llaves}"
+        main_log = log_file.read_text(encoding="utf-8")
+        assert "Respuesta generada" in main_log
+        assert "generate.prompt" not in main_log
+
+    def test_zero_sample_rate_disables_payloads(self, tmp_path):
+        payload_file = tmp_path / "payloads.jsonl"
+        configure_loguru(level="INFO", log_file="", payload_file=str(payload_file),
+                         payload_sample_rate=0.0, enqueue=False)
+
+        log_payload("generate.prompt", prompt="x")
+
+        assert not payload_file.exists()
+
+    def test_stdlib_records_are_intercepted(self, tmp_path):
+        """Stdlib loggers write through the Loguru sinks"""
+        log_file = tmp_path / "app.log"
+        configure_loguru(level="INFO", log_file=str(log_file), payload_file="", enqueue=False)
+        stdlib_logger = logging.getLogger("tests.intercept")
+        stdlib_logger.addHandler(InterceptHandler())
+        stdlib_logger.propagate = False
+        try:
+            stdlib_logger.warning("desde logging estándar")
+        finally:
+            stdlib_logger.handlers.clear()
+
+        assert "desde logging estándar" in log_file.read_text(encoding="utf-8")
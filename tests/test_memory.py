@@ -0,0 +1,62 @@
+"""
+Unit Tests for ConversationMemory
+"""
+
+from app.langchain.memory import ConversationMemory, extract_entities
+
+
+class TestConversationMemory:
+    """Tests for ConversationMemory"""
+
+    def test_extract_entities(self):
+        """Order and return codes are extracted once, in order"""
+        text = "Mi pedido ECO-2509-20001 y la devolución ECO-2509-20002-123456, otra vez ECO-2509-20001"
+        assert extract_entities(text) == ["ECO-2509-20001", "ECO-2509-20002-123456"]
+
+    def test_keeps_last_turns_verbatim(self):
+        """Only the last max_turns turns stay verbatim, older ones go to the summary"""
+        memory = ConversationMemory(max_turns=2)
+        for i in range(5):
+            memory.add_message("user", f"Pregunta {i}. Detalle extra")
+            memory.add_message("assistant", f"Respuesta {i}.")
+
+        assert len(memory.messages) == 4
+        assert memory.messages[0] == ("user", "Pregunta 3. Detalle extra")
+        assert "Usuario: Pregunta 0." in memory.summary
+        assert "Detalle extra" not in memory.summary
+
+    def test_prompt_size_is_bounded(self):
+        """Prompt length does not grow with the number of turns"""
+        memory = ConversationMemory(max_turns=2, max_summary_chars=300)
+        sizes = []
+        for i in range(50):
+            memory.add_message("user", f"Quiero saber sobre la política número {i} " * 3)
+            memory.add_message("assistant", "Claro, esta es la respuesta detallada. " * 5)
+            recent = sum(len(content) for _, content in memory.messages)
+            sizes.append(len(memory.history_prompt()) + recent)
+
+        assert max(sizes[10:]) - min(sizes[10:]) < 100
+        assert len(memory.summary) <= 300
+
+    def test_retrieval_query_adds_remembered_entities(self):
+        """Retrieval uses the latest message plus order codes from earlier turns"""
+        memory = ConversationMemory()
+        memory.add_message("user", "Estado de ECO-2509-20001")
+        memory.add_message("assistant", "Tu pedido está en camino.")
+
+        assert memory.retrieval_query("¿Puedo devolverlo?") == "¿Puedo devolverlo? ECO-2509-20001"
+        assert memory.retrieval_query("¿Y ECO-2509-20001?") == "¿Y ECO-2509-20001?"
+
+    def test_state_round_trip_and_compact(self):
+        """Memory survives serialization to a checkpoint and compacts into the summary"""
+        memory = ConversationMemory(max_turns=2)
+        memory.add_message("user", "Estado de ECO-2509-20001. Gracias")
+        memory.add_message("assistant", "En camino.")
+
+        restored = ConversationMemory.from_state(memory.to_state(), max_turns=2)
+        assert list(restored.messages) == list(memory.messages)
+        assert list(restored.entities) == ["ECO-2509-20001"]
+
+        restored.compact()
+        assert not restored.messages
+        assert "Usuario: Estado de ECO-2509-20001." in restored.summary
@@ -0,0 +1,41 @@
+"""
+Unit Tests for the Prometheus metrics helpers
+"""
+
+from utils.metrics import Counter, Histogram, MetricsRegistry
+
+
+class TestMetrics:
+    """Tests for Counter, Histogram and MetricsRegistry"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Each observation counts in its bucket and every larger one"""
+        histogram = Histogram("stage_seconds", "Stage duration", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="llm_call")
+        histogram.observe(0.5, stage="llm_call")
+        histogram.observe(5.0, stage="llm_call")
+
+        text = "\n".join(histogram.render())
+        assert 'stage_seconds_bucket{stage="llm_call",le="0.1"} 1' in text
+        assert 'stage_seconds_bucket{stage="llm_call",le="1"} 2' in text
+        assert 'stage_seconds_bucket{stage="llm_call",le="+Inf"} 3' in text
+        assert 'stage_seconds_count{stage="llm_call"} 3' in text
+        assert 'stage_seconds_sum{stage="llm_call"} 5.55' in text
+
+    def test_registry_renders_prometheus_text(self):
+        """Counters render with HELP/TYPE headers and escaped labels"""
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "Tool calls", ("tool",))
+        counter.inc(tool='get_"order"')
+        counter.inc(2, tool='get_"order"')
+
+        assert registry.counter("calls_total", "Tool calls", ("tool",)) is counter
+        text = registry.render()
+        assert "# TYPE calls_total counter" in text
+        assert 'calls_total{tool="get_\\"order\\""} 3' in text
+        assert text.endswith("\n")
+
+    def test_unlabelled_counter(self):
+        counter = Counter("events_total", "Events")
+        counter.inc()
+        assert counter.render()[-1] == "events_total 1"
@@ -0,0 +1,38 @@
+"""
+Unit Tests for confidence-based model routing
+"""
+
+from app.rag.model_router import ROUTE_LARGE, ROUTE_SMALL, ModelRouter
+
+
+def router():
+    return ModelRouter("gpt-4.1-nano", "gpt-4.1-mini", confidence_threshold=0.6,
+                       prices={ROUTE_SMALL: (0.10, 0.40), ROUTE_LARGE: (0.40, 1.60)})
+
+
+class TestModelRouter:
+    """Tests for ModelRouter"""
+
+    def test_simple_confident_questions_use_the_small_deployment(self):
+        decision = router().choose("¿Cuál es el plazo para una devolución?", confidence=0.8)
+        assert (decision.route, decision.deployment, decision.reason) == (ROUTE_SMALL, "gpt-4.1-nano", "simple_policy")
+        assert router().choose("Estado de ECO-2509-20001", confidence=0.7).reason == "simple_order"
+
+    def test_low_confidence_escalates(self):
+        decision = router().choose("¿Cuál es el plazo para una devolución?", confidence=0.3)
+        assert (decision.route, decision.reason) == (ROUTE_LARGE, "low_confidence")
+
+    def test_complex_or_open_questions_escalate(self):
+        for question in ("¿Por qué rechazaron mi devolución y qué diferencia hay con un cambio?",
+                         "Háblame de la empresa"):
+            assert router().choose(question, confidence=0.9).route == ROUTE_LARGE
+
+    def test_records_latency_and_cost_per_route(self):
+        model_router = router()
+        model_router.choose("¿Cuál es el plazo para una devolución?", confidence=0.8)
+        cost = model_router.record_call(ROUTE_SMALL, 0.5, {"prompt_tokens": 1_000_000, "completion_tokens": 0})
+
+        stats = model_router.stats.snapshot()
+        assert cost == 0.10
+        assert stats["routes"][ROUTE_SMALL]["avg_latency_seconds"] == 0.5
+        assert stats["small_ratio"] == 1.0
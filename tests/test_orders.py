@@ -0,0 +1,78 @@
+"""
+Unit Tests for the columnar orders table
+"""
+
+from app.api import orders
+from app.api.orders import OrderTable
+
+
+def make_row(order_id: str, status: str = "Entregado", delayed: bool = False, **extra) -> dict:
+    row = {
+        "tracking_number": 900001,
+        "order_id": order_id,
+        "customer_name": "Ana Pérez",
+        "city": "Bogotá",
+        "product": "Licuadora",
+        "category": "Hogar",
+        "status": status,
+        "carrier": "Servientrega",
+        "track_url": "https://tracking.example/900001",
+        "notes": "",
+        "delayed": delayed,
+        "eta": "2025-10-01",
+        "last_update": "2025-09-28",
+    }
+    row.update(extra)
+    return {"row_idx": 0, "row": row, "truncated_cells": []}
+
+
+class TestOrderTable:
+    """Tests for OrderTable"""
+
+    def test_get_roundtrips_the_row(self):
+        rows = [make_row("ECO-2509-20001"), make_row("ECO-2509-20002", status="Retrasado", delayed=True, notes="Lluvias")]
+        table = OrderTable.from_rows(rows)
+
+        assert len(table) == 2
+        assert table.get("ECO-2509-20002") == rows[1]["row"]
+        assert table.get("ECO-2509-99999") is None
+
+    def test_categorical_columns_store_each_value_once(self):
+        table = OrderTable.from_rows([make_row(f"ECO-2509-2000{i}", city="Cali" if i % 2 else "Bogotá") for i in range(6)])
+
+        assert table.columns["city"].values == ["Bogotá", "Cali"]
+        assert list(table.columns["status"].codes) == [0] * 6
+
+    def test_to_rows_keeps_the_dataset_shape(self):
+        table = OrderTable.from_rows([make_row("ECO-2509-20001")])
+        assert table.to_rows() == [{"row": make_row("ECO-2509-20001")["row"]}]
+
+
+class TestSharedOrders:
+    """Tests for the module-level order table"""
+
+    def test_load_orders_replaces_the_shared_table(self):
+        orders.load_orders([make_row("ECO-2509-20001")])
+        assert orders.get_order_row("ECO-2509-20001")["customer_name"] == "Ana Pérez"
+
+        orders.load_orders([])
+        assert orders.get_order_row("ECO-2509-20001") is None
+        assert orders.get_orders_dataset() == []
+
+    def test_returns_are_registered_from_the_shared_table(self, tmp_path, monkeypatch):
+        import asyncio
+        import json
+        from app.api import devoluciones
+        registry = tmp_path / "devoluciones_registradas.json"
+        registry.write_text("[]", encoding="utf-8")
+        monkeypatch.setattr(devoluciones, "glob", lambda pattern: [str(registry)])
+        orders.load_orders([make_row("ECO-2509-20001")])
+        generator = devoluciones.DevolutionsGenerator()
+
+        try:
+            assert asyncio.run(generator.registrar_devolucion_en_json("ECO-2509-20001-123456"))
+            assert not asyncio.run(generator.registrar_devolucion_en_json("ECO-2509-99999-123456"))
+        finally:
+            orders.load_orders([])
+        saved = json.loads(registry.read_text(encoding="utf-8"))
+        assert [(entry["order_id"], entry["devolution_code"]) for entry in saved] == [("ECO-2509-20001", "ECO-2509-20001-123456")]
@@ -7,7 +7,7 @@ import pytest
 from unittest.mock import Mock, patch
 import numpy as np
 
-from app.rag.embeddings import EmbeddingService
+from app.rag.embeddings import EmbeddingService, HashingEmbeddingService
 from app.rag.retriever import DocumentRetriever
 from app.rag.generator import ResponseGenerator
 
@@ -52,6 +52,29 @@ class TestEmbeddingService:
         assert 0.0 <= similarity <= 1.0
 
 
+class TestHashingEmbeddingService:
+    """Tests for HashingEmbeddingService (offline benchmark backend)"""
+
+    def test_embeddings_are_deterministic_and_normalized(self):
+        """Same text, same vector, across instances"""
+        service = HashingEmbeddingService(embedding_dim=64)
+        embedding = service.embed_text("Política de devoluciones")
+
+        assert embedding.shape == (64,)
+        assert np.array_equal(embedding, HashingEmbeddingService(embedding_dim=64).embed_text("Política de devoluciones"))
+        assert np.isclose(np.linalg.norm(embedding), 1.0)
+
+    def test_shared_words_increase_similarity(self):
+        """Texts sharing words are closer than unrelated texts"""
+        service = HashingEmbeddingService()
+        base = service.embed_text("plazo para devolver un producto")
+        related = service.embed_text("plazo para devolver una compra")
+        unrelated = service.embed_text("envío a Medellín")
+
+        assert service.similarity(base, related) > service.similarity(base, unrelated)
+        assert service.embed_batch(["a", "b"]).shape == (2, service.embedding_dim)
+
+
 class TestDocumentRetriever:
     """Tests for DocumentRetriever"""
     
@@ -97,14 +120,15 @@ class TestResponseGenerator:
             {'content': 'Eco product 2', 'metadata': {}, 'distance': 0.2}
         ]
         
-        with patch('openai.ChatCompletion.acreate') as mock_llm:
+        generator.cache = None
+        with patch.object(generator.client.chat.completions, 'create') as mock_llm:
             mock_llm.return_value.choices = [
                 Mock(message=Mock(content="We have various eco-friendly products"))
             ]
             
             response = await generator.generate(query, documents)
             
-            assert 'answer' in response
+            assert response['answer'] == "We have various eco-friendly products"
             assert 'sources' in response
             assert 'confidence' in response
             assert isinstance(response['sources'], list)
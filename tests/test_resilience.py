@@ -0,0 +1,123 @@
+"""
+Unit Tests for the resilient LLM call layer
+"""
+
+import asyncio
+
+import pytest
+
+from app.config.settings import get_settings
+from app.rag.resilience import (CircuitBreaker, CircuitOpenError, ResilientCaller, get_circuit_breaker, get_llm_caller,
+                                run_llm_call)
+
+
+class AzureError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after} if retry_after else {}})()
+
+
+def caller(**kwargs):
+    options = {"breaker": CircuitBreaker(failure_threshold=3, reset_timeout=60), "base_delay": 0.001,
+               "max_delay": 0.002, "attempt_timeout": 1.0}
+    options.update(kwargs)
+    return ResilientCaller("test", **options)
+
+
+def flaky(failures, result="ok", delay=0.0):
+    """Coroutine factory that raises the given errors first, then returns result"""
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return result
+
+    return factory, calls
+
+
+class TestResilientCaller:
+    """Tests for ResilientCaller and CircuitBreaker"""
+
+    def test_transient_errors_are_retried(self):
+        factory, calls = flaky([AzureError(503), AzureError(429, retry_after="0.01")])
+        assert asyncio.run(caller().call(factory)) == "ok"
+        assert len(calls) == 3
+
+    def test_client_errors_and_long_retry_after_are_not_retried(self):
+        for error in (AzureError(400), AzureError(429, retry_after="120")):
+            factory, calls = flaky([error])
+            with pytest.raises(AzureError):
+                asyncio.run(caller(max_retry_after=20).call(factory))
+            assert len(calls) == 1
+
+    def test_slow_attempts_time_out_and_are_retried(self):
+        attempts = []
+
+        async def factory():
+            attempts.append(1)
+            await asyncio.sleep(0.2 if len(attempts) == 1 else 0)
+            return "ok"
+
+        assert asyncio.run(caller(attempt_timeout=0.05).call(factory)) == "ok"
+        assert len(attempts) == 2
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        factory, calls = flaky([AzureError(500)] * 10)
+        with pytest.raises(AzureError):
+            asyncio.run(caller(breaker=breaker, max_attempts=3).call(factory))
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(caller(breaker=breaker).call(factory))
+        assert breaker.state == "open"
+        assert len(calls) == 3
+
+    def test_hedge_fires_after_the_latency_percentile_and_first_answer_wins(self):
+        resilient = caller(hedge_quantile=0.5, hedge_min_samples=1)
+        resilient._latencies.append(0.01)
+        attempts = []
+
+        async def factory():
+            attempts.append(1)
+            # La primera petición se queda colgada; la de respaldo responde enseguida
+            await asyncio.sleep(0.5 if len(attempts) == 1 else 0)
+            return f"respuesta {len(attempts)}"
+
+        assert asyncio.run(resilient.call(factory)) == "respuesta 2"
+        assert resilient.stats["hedges"] == 1 and resilient.stats["hedge_wins"] == 1
+
+    def test_first_requests_that_lose_to_the_hedge_still_count_for_the_percentile(self):
+        resilient = caller(hedge_quantile=0.5, hedge_min_samples=1)
+        resilient._latencies.append(0.05)
+        attempts = []
+
+        async def factory():
+            attempts.append(1)
+            await asyncio.sleep(0.5 if len(attempts) % 2 == 1 else 0)
+            return "ok"
+
+        for _ in range(3):
+            asyncio.run(resilient.call(factory))
+        # Las primeras peticiones canceladas se registran con lo que llevaban: el percentil no baja
+        assert len(resilient._latencies) == 4
+        assert resilient.hedge_delay() >= 0.05
+
+    def test_each_deployment_has_its_own_circuit(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "azure_openai_deployment_name", "principal")
+        monkeypatch.setattr(get_settings(), "azure_openai_small_deployment_name", "pequeno")
+        get_llm_caller.cache_clear()
+        get_circuit_breaker.cache_clear()
+        try:
+            assert get_llm_caller("generation").breaker is get_llm_caller("agent").breaker
+            assert get_llm_caller("generation_small").breaker is not get_llm_caller("generation").breaker
+        finally:
+            get_llm_caller.cache_clear()
+            get_circuit_breaker.cache_clear()
+
+    def test_blocking_calls_run_in_the_llm_executor(self):
+        import threading
+        name = asyncio.run(run_llm_call(lambda: threading.current_thread().name))
+        assert name.startswith("llm")
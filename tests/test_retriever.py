@@ -13,3 +13,89 @@ async def test_retrieve_documents():
     for doc in results:
         assert "content" in doc
         assert "metadata" in doc
+
+def test_deferred_indexing_reports_progress(tmp_path):
+    embedding_service = EmbeddingService()
+    retriever = DocumentRetriever(embedding_service, collection_name="deferred", index_on_init=False)
+    assert retriever.get_index_status()["state"] == "pending"
+    assert not retriever.has_documents
+
+    retriever.load_and_index_pdfs(docs_folder=str(tmp_path))
+    status = retriever.get_index_status()
+    assert status["state"] == "ready"
+    assert status["files_total"] == 0
+    assert retriever.is_ready
+
+def test_replacing_a_document_swaps_its_chunks():
+    from app.rag.embeddings import HashingEmbeddingService
+    retriever = DocumentRetriever(HashingEmbeddingService(), collection_name="hot_reload", index_on_init=False)
+    retriever._index_document("politica.pdf", "Las devoluciones se aceptan durante 30 días.")
+    retriever._index_document("politica.pdf", "Las devoluciones se aceptan durante 60 días.", replace=True)
+
+    assert retriever.collection.count() == 1
+    assert retriever.get_index_status()["chunks_indexed"] == 1
+    assert "60 días" in retriever.collection.get()["documents"][0]
+
+def test_retrieval_cache_is_invalidated_when_the_index_changes():
+    import asyncio
+    from app.rag.embeddings import HashingEmbeddingService
+    retriever = DocumentRetriever(HashingEmbeddingService(), collection_name="retrieval_cache", index_on_init=False)
+    retriever._index_document("politica.pdf", "Las devoluciones se aceptan durante 30 días.")
+
+    first = asyncio.run(retriever.retrieve("plazo de devolución", top_k=1))
+    again = asyncio.run(retriever.retrieve("  Plazo de   devolución", top_k=1))
+    retriever._index_document("politica.pdf", "Las devoluciones se aceptan durante 60 días.", replace=True)
+    after_change = asyncio.run(retriever.retrieve("plazo de devolución", top_k=1))
+
+    assert again == first
+    assert retriever.retrieval_cache_stats == {"hits": 1, "misses": 2}
+    assert "60 días" in after_change[0]["content"]
+
+def test_retrieval_runs_off_the_event_loop_so_gathered_lookups_overlap():
+    import asyncio
+    import time
+    from app.rag.embeddings import HashingEmbeddingService
+
+    class SlowEmbeddingService(HashingEmbeddingService):
+        def embed_text(self, text):
+            time.sleep(0.2)
+            return super().embed_text(text)
+
+    retriever = DocumentRetriever(HashingEmbeddingService(), collection_name="overlap", index_on_init=False)
+    retriever._index_document("politica.pdf", "Las devoluciones se aceptan durante 30 días.")
+    retriever.embedding_service = SlowEmbeddingService()
+    events = []
+
+    async def retrieval():
+        documents = await retriever.retrieve("plazo de devolución", top_k=1)
+        events.append("retrieval_done")
+        return documents
+
+    async def order_lookup():
+        # Como order_details en /query: arranca y termina mientras la búsqueda sigue en su hilo
+        events.append("order_started")
+        await asyncio.sleep(0.01)
+        events.append("order_done")
+
+    async def both():
+        return await asyncio.gather(retrieval(), order_lookup())
+
+    documents, _ = asyncio.run(both())
+    assert "30 días" in documents[0]["content"]
+    assert events == ["order_started", "order_done", "retrieval_done"]
+
+def test_reindexing_unchanged_text_keeps_its_chunks_on_chroma(monkeypatch):
+    from app.config.settings import get_settings
+    from app.rag.embeddings import HashingEmbeddingService
+    pytest.importorskip("chromadb")
+    monkeypatch.setattr(get_settings(), "vector_store_backend", "chroma")
+    retriever = DocumentRetriever(HashingEmbeddingService(), collection_name="reindex_same", index_on_init=False)
+    text = "\n\n".join(f"Sección {i}: " + " ".join(f"palabra{i * 97 + j}" for j in range(120)) for i in range(3))
+    retriever._index_document("politica.pdf", text)
+    chunks = retriever.collection.count()
+
+    retriever._index_document("politica.pdf", text, replace=True)
+    retriever._index_document("politica.pdf", text + "\n\nLos reembolsos tardan 5 días hábiles.", replace=True)
+
+    assert chunks > 1
+    assert retriever.collection.count() == retriever.get_index_status()["chunks_indexed"] >= chunks
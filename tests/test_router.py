@@ -0,0 +1,56 @@
+"""
+Unit Tests for IntentRouter
+"""
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.langchain.router import (
+    IntentRouter,
+    ROUTE_AGENT,
+    ROUTE_ELIGIBILITY,
+    ROUTE_ORDER_STATUS,
+)
+
+
+class TestIntentRouter:
+    """Tests for IntentRouter"""
+
+    @pytest.fixture
+    def router(self):
+        return IntentRouter()
+
+    @pytest.mark.parametrize("message, expected", [
+        ("¿Cuál es el estado de ECO-2509-20001?", (ROUTE_ORDER_STATUS, "ECO-2509-20001")),
+        ("ECO-2509-20001", (ROUTE_ORDER_STATUS, "ECO-2509-20001")),
+        ("¿Puedo devolver ECO-2509-20001?", (ROUTE_ELIGIBILITY, "ECO-2509-20001")),
+        ("Registra la devolución de ECO-2509-20001", (ROUTE_AGENT, None)),
+        ("Compara ECO-2509-20001 con ECO-2509-20002", (ROUTE_AGENT, None)),
+        ("ECO-2509-20001-123456", (ROUTE_AGENT, None)),
+        ("¿Cuál es la política de devoluciones?", (ROUTE_AGENT, None)),
+        ("¿Puedo devolver mi pedido ECO-2509-20001?", (ROUTE_ELIGIBILITY, "ECO-2509-20001")),
+        ("Estado general de ECO-2509-20001", (ROUTE_ORDER_STATUS, "ECO-2509-20001")),
+        ("Genera la etiqueta de ECO-2509-20001", (ROUTE_AGENT, None)),
+        ("¿Dónde está ECO-2509-20001? Quiero devolverlo", (ROUTE_AGENT, None)),
+        ("Mi pedido ECO-2509-20001 llegó roto, ¿qué hago?", (ROUTE_AGENT, None)),
+        ("¿Qué garantía tiene mi pedido ECO-2509-20001?", (ROUTE_AGENT, None)),
+        ("Quiero cambiar la dirección de mi orden ECO-2509-20001", (ROUTE_AGENT, None)),
+    ])
+    def test_classify(self, router, message, expected):
+        """Only unambiguous single-order questions take the fast path"""
+        assert router.classify(message) == expected
+
+    @pytest.mark.asyncio
+    async def test_route_counts_avoided_calls(self, router):
+        """Fast-path answers use the tool logic directly and are counted"""
+        router.get_order_tool = AsyncMock()
+        router.get_order_tool._arun = AsyncMock(return_value={"status": "Entregado", "product": "Botella"})
+
+        answer = await router.route("Estado de ECO-2509-20001")
+        assert "Entregado" in answer
+        assert await router.route("¿Qué políticas tienen?") is None
+
+        stats = router.stats.snapshot()
+        assert stats["routes"][ROUTE_ORDER_STATUS] == 1
+        assert stats["routes"][ROUTE_AGENT] == 1
+        assert stats["llm_calls_avoided"] == router.stats.agent_llm_calls_estimate
@@ -0,0 +1,76 @@
+"""
+Unit Tests for request coalescing (single-flight)
+"""
+
+import asyncio
+
+import pytest
+
+from app.api.single_flight import SingleFlight, make_key, normalize_query
+
+
+class TestNormalizeQuery:
+    """Tests for the coalescing key"""
+
+    def test_ignores_case_spacing_and_question_marks(self):
+        assert normalize_query("¿Dónde está   mi pedido?") == normalize_query("dónde está mi pedido")
+
+    def test_keeps_order_codes_in_upper_case(self):
+        assert "ECO-2509-20001" in normalize_query("Estado de ECO-2509-20001")
+
+    def test_parameters_are_part_of_the_key(self):
+        assert make_key("envíos", top_k=3) != make_key("envíos", top_k=5)
+
+
+class TestSingleFlight:
+    """Tests for SingleFlight"""
+
+    def test_concurrent_identical_requests_share_one_computation(self):
+        flight = SingleFlight("test")
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "respuesta"
+
+        async def main():
+            return await asyncio.gather(*(flight.do("k", compute) for _ in range(5)))
+
+        assert asyncio.run(main()) == ["respuesta"] * 5
+        assert len(calls) == 1
+        stats = flight.snapshot()
+        assert (stats["leaders"], stats["followers"], stats["in_flight"]) == (1, 4, 0)
+
+    def test_errors_reach_every_caller_and_are_not_kept(self):
+        flight = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("sin LLM")
+
+        async def main():
+            results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+            return results, await flight.do("k", lambda: asyncio.sleep(0, result="ok"))
+
+        results, retry = asyncio.run(main())
+        assert all(isinstance(result, ValueError) for result in results)
+        assert retry == "ok"
+
+    def test_a_cancelled_caller_does_not_cancel_the_others(self):
+        flight = SingleFlight("test")
+
+        async def compute():
+            await asyncio.sleep(0.02)
+            return 42
+
+        async def main():
+            first = asyncio.ensure_future(flight.do("k", compute))
+            second = asyncio.ensure_future(flight.do("k", compute))
+            await asyncio.sleep(0.005)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await second
+
+        assert asyncio.run(main()) == 42
@@ -0,0 +1,95 @@
+"""
+Unit Tests for memory-mapped index snapshots
+"""
+
+import os
+
+import numpy as np
+
+from app.rag.snapshot import open_snapshot, snapshot_version, write_snapshot
+from app.rag.vector_store import NumpyCollection
+
+VERSION = snapshot_version("all-MiniLM-L6-v2", chunk_size=1000, chunk_overlap=200, dedup_max_distance=6)
+
+
+def write(root, texts):
+    return write_snapshot(
+        str(root), VERSION,
+        ids=[f"doc_chunk{i}" for i in range(len(texts))],
+        documents=texts,
+        metadatas=[{"filename": "politica.pdf", "chunk": i, "doc_type": "policy"} for i in range(len(texts))],
+        embeddings=np.eye(len(texts), 4, dtype=np.float32),
+        fingerprints=[i + 1 for i in range(len(texts))],
+        documents_manifest={"politica.pdf": {"etag": "0x1"}},
+    )
+
+
+class TestIndexSnapshot:
+    """Tests for writing and opening snapshots"""
+
+    def test_roundtrip_maps_vectors_and_reads_texts_lazily(self, tmp_path):
+        write(tmp_path, ["Devoluciones en 30 días", "Envíos gratis"])
+
+        snapshot = open_snapshot(str(tmp_path), VERSION)
+        collection = NumpyCollection.from_snapshot("docs", snapshot)
+        result = collection.query(query_embeddings=[[0.0, 1.0, 0.0, 0.0]], n_results=1,
+                                  where={"doc_type": "policy"})
+
+        assert isinstance(snapshot.embeddings, np.memmap)
+        assert snapshot.blob_manifest == {"politica.pdf": {"etag": "0x1"}}
+        assert result["documents"] == [["Envíos gratis"]]
+        assert result["metadatas"][0][0]["chunk"] == 1
+
+    def test_other_versions_are_not_opened(self, tmp_path):
+        write(tmp_path, ["texto"])
+        other = snapshot_version("otro-modelo", chunk_size=1000, chunk_overlap=200, dedup_max_distance=6)
+        assert open_snapshot(str(tmp_path), other) is None
+
+    def test_new_generation_replaces_the_previous_one(self, tmp_path):
+        first = write(tmp_path, ["v1"])
+        second = write(tmp_path, ["v2", "v2b"])
+
+        assert not os.path.exists(first)
+        assert open_snapshot(str(tmp_path), VERSION).directory == second
+
+    def test_writes_after_opening_copy_into_memory(self, tmp_path):
+        write(tmp_path, ["a", "b"])
+        collection = NumpyCollection.from_snapshot("docs", open_snapshot(str(tmp_path), VERSION))
+
+        collection.apply_changes(delete_ids=["doc_chunk0"], updates={}, ids=["new"], documents=["c"],
+                                 embeddings=[[0.0, 0.0, 1.0, 0.0]], metadatas=[{"filename": "nuevo.pdf"}])
+
+        assert collection.get()["documents"] == ["b", "c"]
+
+
+def test_retriever_restores_index_and_manifest_from_snapshot(tmp_path):
+    from app.rag.embeddings import HashingEmbeddingService
+    from app.rag.retriever import DocumentRetriever
+    source = DocumentRetriever(HashingEmbeddingService(), collection_name="snapshot_src", index_on_init=False)
+    source._index_document("politica.pdf", "Las devoluciones se aceptan durante 30 días.")
+    source.manifest.record("politica.pdf", "0x1", 1)
+    source.save_snapshot(str(tmp_path))
+
+    restored = DocumentRetriever(HashingEmbeddingService(), collection_name="snapshot_dst", index_on_init=False)
+
+    assert restored.load_snapshot(str(tmp_path))
+    assert restored.is_ready
+    assert restored.manifest.etag("politica.pdf") == "0x1"
+    assert restored.collection.count() == 1
+    # El índice de duplicados se reconstruye al primer cambio: el mismo texto no se vuelve a indexar
+    assert restored._index_document("copia.pdf", "Las devoluciones se aceptan durante 30 días.") == 0
+
+
+def test_snapshot_keeps_the_chunk_count_of_each_document(tmp_path):
+    from app.rag.embeddings import HashingEmbeddingService
+    from app.rag.retriever import DocumentRetriever
+    source = DocumentRetriever(HashingEmbeddingService(), collection_name="snapshot_chunks_src", index_on_init=False)
+    source._index_document("politica.pdf", "Las devoluciones se aceptan durante 30 días.")
+    source.manifest.record("politica.pdf", "0x1", 3)
+    source.manifest.record("manual.pdf", "0x2", 7)
+    source.save_snapshot(str(tmp_path))
+
+    restored = DocumentRetriever(HashingEmbeddingService(), collection_name="snapshot_chunks_dst", index_on_init=False)
+
+    assert restored.load_snapshot(str(tmp_path))
+    assert {name: restored.manifest.chunks(name) for name in restored.manifest.names()} == {"politica.pdf": 3, "manual.pdf": 7}
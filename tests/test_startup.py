@@ -0,0 +1,30 @@
+"""
+Startup Tests: importing the package must not load the heavy ML stack
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "chromadb", "azure.ai.inference"]
+
+
+class TestLazyImports:
+    """Tests for lazy package imports"""
+
+    def test_package_import_is_light(self):
+        """``import app`` does not import torch, chromadb or the Azure SDK"""
+        code = (
+            "import sys, app; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == ""
+
+    def test_unknown_attribute_raises(self):
+        """Names outside the lazy table still raise AttributeError"""
+        import app
+
+        with pytest.raises(AttributeError):
+            app.NotAService
@@ -0,0 +1,43 @@
+"""
+Unit Tests for NumpyCollection
+"""
+
+import numpy as np
+
+from app.rag.vector_store import NumpyCollection
+
+
+class TestNumpyCollection:
+    """Tests for the numpy vector store"""
+
+    def test_query_returns_nearest_in_chroma_shape(self):
+        """Results are sorted by squared L2 distance and shaped like ChromaDB's"""
+        collection = NumpyCollection("test")
+        collection.add(documents=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]],
+                       metadatas=[{"chunk": 0}, {"chunk": 1}], ids=["a0", "b1"])
+        collection.add(documents=["c"], embeddings=[[0.9, 0.1]], metadatas=[{"chunk": 2}], ids=["c2"])
+
+        result = collection.query(query_embeddings=[[1.0, 0.0]], n_results=2)
+
+        assert collection.count() == 3
+        assert result["ids"] == [["a0", "c2"]]
+        assert result["documents"] == [["a", "c"]]
+        assert result["metadatas"][0][1] == {"chunk": 2}
+        assert np.isclose(result["distances"][0][0], 0.0)
+
+    def test_query_on_empty_collection(self):
+        result = NumpyCollection("empty").query(query_embeddings=[[1.0, 0.0]], n_results=3)
+        assert result["documents"] == [[]]
+
+    def test_apply_changes_swaps_entries_in_one_step(self):
+        collection = NumpyCollection("swap")
+        collection.add(documents=["old"], embeddings=[[1.0, 0.0]], metadatas=[{"filename": "a.pdf"}], ids=["a_old"])
+        collection.add(documents=["other"], embeddings=[[0.0, 1.0]], metadatas=[{"filename": "b.pdf"}], ids=["b"])
+
+        collection.apply_changes(delete_ids=["a_old"], updates={"b": {"sources": "b.pdf#0"}}, ids=["a_new"],
+                                 documents=["new"], embeddings=[[0.9, 0.1]], metadatas=[{"filename": "a.pdf"}])
+        result = collection.query(query_embeddings=[[1.0, 0.0]], n_results=2)
+
+        assert collection.count() == 2
+        assert result["ids"] == [["a_new", "b"]]
+        assert result["metadatas"][0][1] == {"filename": "b.pdf", "sources": "b.pdf#0"}
@@ -1,40 +1,118 @@
 
+import json
 import logging
 import os
+import random
+import sys
 import logging.config
+from loguru import logger
+
+LOG_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | {name}:{function}:{line} - {message}"
+
+# Estado del sink de payloads; sin setup_logging() log_payload no hace nada
+_payload_state = {"enabled": False, "sample_rate": 0.0}
+
+
+class InterceptHandler(logging.Handler):
+    """Route stdlib logging records (uvicorn, httpx, chromadb...) into the Loguru pipeline"""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        # Subir por la pila hasta salir del módulo logging para reportar el origen real
+        frame, depth = logging.currentframe(), 2
+        while frame and frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+        logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+def _is_payload(record) -> bool:
+    return "payload" in record["extra"]
+
+
+def _payload_line(record) -> str:
+    # Loguru aplica str.format al resultado: se escapan las llaves del JSON
+    line = json.dumps({
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "event": record["message"],
+        **record["extra"]["payload"],
+    }, ensure_ascii=False, default=str)
+    return line.replace("{", "{{").replace("}", "}}") + "\n"
+
+
+def configure_loguru(level: str = None, log_file: str = None, payload_file: str = None,
+                     payload_sample_rate: float = None, enqueue: bool = None):
+    """
+    Configure the single Loguru pipeline used by the application.
+
+    Console and file sinks write through a background queue (``enqueue=True``)
+    so request handlers never block on sink I/O. Verbose payloads (full
+    queries, contexts, prompts) go only to a separate JSON-lines sink and are
+    sampled by ``log_payload``. Defaults come from the settings.
+    """
+    from app.config.settings import get_settings
+    settings = get_settings()
+    level = level or settings.log_level
+    log_file = settings.log_file if log_file is None else log_file
+    payload_file = settings.log_payload_file if payload_file is None else payload_file
+    sample_rate = settings.log_payload_sample_rate if payload_sample_rate is None else payload_sample_rate
+    enqueue = settings.log_enqueue if enqueue is None else enqueue
+
+    logger.remove()
+    not_payload = lambda record: not _is_payload(record)
+    logger.add(sys.stderr, level=level, format=LOG_FORMAT, enqueue=enqueue, filter=not_payload)
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        logger.add(log_file, level=level, format=LOG_FORMAT, enqueue=enqueue, filter=not_payload,
+                   rotation="50 MB", retention=5, encoding="utf-8")
+    _payload_state.update(enabled=bool(payload_file) and sample_rate > 0, sample_rate=sample_rate)
+    if _payload_state["enabled"]:
+        os.makedirs(os.path.dirname(os.path.abspath(payload_file)), exist_ok=True)
+        logger.add(payload_file, level="DEBUG", format=_payload_line, enqueue=enqueue, filter=_is_payload,
+                   rotation="50 MB", retention=5, encoding="utf-8")
+
+
+def log_payload(event: str, **fields):
+    """
+    Log a verbose payload (query, context, prompt...) as structured JSON, sampled.
+
+    Returns immediately, before touching the fields, when the payload sink is
+    off or the record is not sampled, so it is safe on the request path.
+    """
+    if not _payload_state["enabled"] or random.random() >= _payload_state["sample_rate"]:
+        return
+    logger.bind(payload=fields).debug(event)
+
 
 class LoggingConfig:
     LOG_DIR = os.path.join(os.path.dirname(__file__), '..', 'logs')
-    os.makedirs(LOG_DIR, exist_ok=True)
-    LOG_FILE = os.path.join(LOG_DIR, 'execution.log')
 
+    # La librería estándar no escribe por su cuenta: todo pasa por los sinks de Loguru
     LOGGING_CONFIG = {
         'version': 1,
         'disable_existing_loggers': False,
-        'formatters': {
-            'default': {
-                'format': '[%(asctime)s] %(levelname)s %(name)s: %(message)s',
-            },
-        },
         'handlers': {
-            'file': {
-                'class': 'logging.FileHandler',
-                'filename': LOG_FILE,
-                'formatter': 'default',
-                'level': 'INFO',
-            },
-            'console': {
-                'class': 'logging.StreamHandler',
-                'formatter': 'default',
-                'level': 'INFO',
+            'loguru': {
+                '()': InterceptHandler,
+                'level': 'NOTSET',
             },
         },
         'root': {
-            'handlers': ['file', 'console'],
+            'handlers': ['loguru'],
             'level': 'INFO',
         },
+        'loggers': {
+            'uvicorn': {'handlers': ['loguru'], 'level': 'INFO', 'propagate': False},
+            'uvicorn.error': {'handlers': ['loguru'], 'level': 'INFO', 'propagate': False},
+            'uvicorn.access': {'handlers': ['loguru'], 'level': 'WARNING', 'propagate': False},
+        },
     }
 
     @staticmethod
     def setup_logging():
-        logging.config.dictConfig(LoggingConfig.LOGGING_CONFIG)
\ No newline at end of file
+        configure_loguru()
+        logging.config.dictConfig(LoggingConfig.LOGGING_CONFIG)